@@ -0,0 +1,142 @@
+"""
+Admission control for report generation.
+
+At most `max_active` generations run at once. Further requests wait in a
+bounded queue; waiting requests are grouped by client (session ID or IP) and
+slots are handed out round-robin between clients, so one client submitting
+many reports cannot starve everyone else. Requests beyond the queue are
+rejected with an estimate of when to retry.
+
+Background work (speculative preparations) asks for a slot with
+`background=True`. It waits in its own queue, also of up to `max_queued`
+entries and also round-robin per client, and is only given a slot while no
+report is waiting, so it never delays or sheds a report.
+
+Configuration (environment):
+    GENERATION_MAX_CONCURRENT   generations running at once (default 8)
+    GENERATION_MAX_QUEUE        generations allowed to wait (default 32)
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+import metrics
+
+ACTIVE = metrics.gauge("zap_generation_active", "Report generations holding an admission slot")
+QUEUED = metrics.gauge("zap_generation_queued", "Report generations waiting for an admission slot")
+BACKGROUND_QUEUED = metrics.gauge("zap_generation_background_queued", "Background jobs waiting for an admission slot")
+SHED = metrics.counter("zap_generation_shed_total", "Report generations rejected because the queue was full")
+QUEUE_WAIT = metrics.histogram("zap_generation_queue_wait_ms", "Time spent waiting for an admission slot")
+
+
+class QueueFullError(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("Server is busy generating other reports, please retry shortly")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_active: int, max_queued: int):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.active = 0
+        self.queued = 0
+        self.background_queued = 0
+        self._waiters = OrderedDict()  # client key -> deque of futures, in round-robin order
+        self._background = OrderedDict()  # the same for background jobs
+        self._durations = deque(maxlen=50)
+
+    def retry_after(self) -> float:
+        """Rough time until a new request would get a slot, from recent generation durations"""
+        average = sum(self._durations) / len(self._durations) if self._durations else 30.0
+        return average * math.ceil((self.queued + 1) / self.max_active)
+
+    async def acquire(self, key: str, background: bool = False):
+        """Wait for a slot; raises QueueFullError when the queue is full"""
+        if self.active < self.max_active and not self.queued and (not background or not self.background_queued):
+            self.active += 1
+            ACTIVE.set(self.active)
+            return
+        if (self.background_queued if background else self.queued) >= self.max_queued:
+            if not background:
+                SHED.inc()
+            raise QueueFullError(self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        (self._background if background else self._waiters).setdefault(key, deque()).append(waiter)
+        self._count_waiting(background, 1)
+        start = time.perf_counter()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.cancelled():
+                self._remove(key, waiter, background)
+            else:
+                # Granted a slot just as we were cancelled; hand it on
+                self.release()
+            raise
+        if not background:
+            QUEUE_WAIT.observe((time.perf_counter() - start) * 1000)
+
+    def release(self, duration: float = None):
+        if duration is not None:
+            self._durations.append(duration)
+        self.active -= 1
+        self._grant()
+        ACTIVE.set(self.active)
+
+    def _grant(self):
+        # Reports first; background jobs only get slots nobody is waiting for
+        while self.active < self.max_active and (self._waiters or self._background):
+            background = not self._waiters
+            queue = self._background if background else self._waiters
+            key, waiters = next(iter(queue.items()))
+            waiter = waiters.popleft()
+            # The client just served goes to the back of the rotation
+            if waiters:
+                queue.move_to_end(key)
+            else:
+                del queue[key]
+            self._count_waiting(background, -1)
+            if waiter.cancelled():
+                continue
+            self.active += 1
+            waiter.set_result(None)
+
+    def _count_waiting(self, background: bool, delta: int):
+        if background:
+            self.background_queued += delta
+            BACKGROUND_QUEUED.set(self.background_queued)
+        else:
+            self.queued += delta
+            QUEUED.set(self.queued)
+
+    def _remove(self, key: str, waiter, background: bool = False):
+        queue = self._background if background else self._waiters
+        waiters = queue.get(key)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            self._count_waiting(background, -1)
+            if not waiters:
+                del queue[key]
+
+    @asynccontextmanager
+    async def slot(self, key: str, background: bool = False):
+        """Hold a generation slot for the duration of the block"""
+        await self.acquire(key, background)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Only report durations feed the Retry-After estimate
+            self.release(None if background else time.perf_counter() - start)
+
+
+def open_default_controller() -> AdmissionController:
+    return AdmissionController(
+        max_active=int(os.getenv("GENERATION_MAX_CONCURRENT", "8")),
+        max_queued=int(os.getenv("GENERATION_MAX_QUEUE", "32")),
+    )
@@ -0,0 +1,190 @@
+"""
+On-disk store for finished report artifacts.
+
+Each artifact is a file named by its ID plus a small JSON sidecar holding its
+ETag (a content hash), size and creation time. Artifacts expire after a TTL,
+and when the store grows past its disk quota the oldest artifacts are evicted
+first. `cleanup()` is cheap enough to run periodically from a background task.
+
+Configuration (environment):
+    ARTIFACT_TTL_HOURS   how long a report stays downloadable (default 24)
+    ARTIFACT_QUOTA_MB    total disk budget for stored reports (default 500)
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 64 * 1024
+# Temp files of renders that never committed (e.g. the process died) are removed after this
+_STALE_TEMP_SECONDS = 3600
+
+
+class ArtifactStore:
+    def __init__(self, root: str, ttl_seconds: float, quota_bytes: int, extension: str = ".docx"):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.quota_bytes = quota_bytes
+        self.extension = extension
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, artifact_id: str) -> str:
+        return os.path.join(self.root, artifact_id + self.extension)
+
+    def new_temp_path(self, artifact_id: str) -> str:
+        """
+        A fresh file to write a new version to before `commit` swaps it in.
+        Each call gets its own name, so concurrent renders of one artifact
+        cannot overwrite or remove each other's output.
+        """
+        fd, path = tempfile.mkstemp(prefix=f"{artifact_id}.", suffix=".part", dir=self.root)
+        os.close(fd)
+        return path
+
+    def _meta_path(self, artifact_id: str) -> str:
+        return os.path.join(self.root, artifact_id + ".json")
+
+    def commit(self, artifact_id: str, temp_path: str, filename: str = None):
+        """Atomically publish the file written to `temp_path` (from new_temp_path)"""
+        digest = hashlib.sha256()
+        size = 0
+        with open(temp_path, "rb") as fh:
+            for chunk in iter(lambda: fh.read(_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                size += len(chunk)
+        meta = {
+            "id": artifact_id,
+            "etag": f'"{digest.hexdigest()[:32]}"',
+            "size": size,
+            "created_at": time.time(),
+            "filename": filename or f"{artifact_id}{self.extension}",
+        }
+        with self._lock:
+            os.replace(temp_path, self.path_for(artifact_id))
+            with open(self._meta_path(artifact_id), "w") as fh:
+                json.dump(meta, fh)
+        self.enforce_quota(keep=artifact_id)
+        return {**meta, "path": self.path_for(artifact_id)}
+
+    def get(self, artifact_id: str):
+        """Metadata (with "path") for a live artifact, or None if missing or expired"""
+        try:
+            with open(self._meta_path(artifact_id)) as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        path = self.path_for(artifact_id)
+        if not os.path.exists(path) or self._expired(meta, time.time()):
+            return None
+        return {**meta, "path": path}
+
+    def delete(self, artifact_id: str):
+        with self._lock:
+            for path in (self.path_for(artifact_id), self._meta_path(artifact_id)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _expired(self, meta, now):
+        return self.ttl_seconds > 0 and now - meta["created_at"] > self.ttl_seconds
+
+    def _all_meta(self):
+        entries = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.root, name)) as fh:
+                    entries.append(json.load(fh))
+            except (OSError, ValueError):
+                continue
+        return entries
+
+    def enforce_quota(self, keep: str = None):
+        """Evict the oldest artifacts until the store fits in its quota, never `keep`"""
+        entries = sorted(self._all_meta(), key=lambda m: m["created_at"])
+        total = sum(m["size"] for m in entries)
+        evicted = 0
+        for meta in entries:
+            if total <= self.quota_bytes:
+                break
+            if meta["id"] == keep:
+                continue
+            self.delete(meta["id"])
+            total -= meta["size"]
+            evicted += 1
+        if evicted:
+            logger.info(f"Evicted {evicted} artifacts to stay under the disk quota")
+        return evicted
+
+    def _remove_stale_temp_files(self, now):
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if name.endswith(".part") and now - os.path.getmtime(path) > _STALE_TEMP_SECONDS:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    def cleanup(self):
+        """Delete expired artifacts, then enforce the quota; returns the number removed"""
+        now = time.time()
+        self._remove_stale_temp_files(now)
+        expired = [m["id"] for m in self._all_meta() if self._expired(m, now)]
+        for artifact_id in expired:
+            self.delete(artifact_id)
+        if expired:
+            logger.info(f"Removed {len(expired)} expired artifacts")
+        return len(expired) + self.enforce_quota()
+
+
+def open_default_store(root: str) -> ArtifactStore:
+    return ArtifactStore(
+        root,
+        ttl_seconds=float(os.getenv("ARTIFACT_TTL_HOURS", "24")) * 3600,
+        quota_bytes=int(float(os.getenv("ARTIFACT_QUOTA_MB", "500")) * 1024 * 1024),
+    )
+
+
+def iter_file_range(path: str, start: int, end: int):
+    """Yield bytes start..end (inclusive) of a file in chunks"""
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = fh.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def parse_range(header: str, size: int):
+    """
+    Parse a single-range "bytes=" header into (start, end) inclusive.
+    Returns None to serve the full file (absent, malformed or multi-range)
+    and raises ValueError for an unsatisfiable range.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+    try:
+        start = int(start_text) if start_text else None
+        end = int(end_text) if end_text else None
+    except ValueError:
+        return None
+    if start is None:
+        # Suffix range: the last N bytes
+        if not end:
+            raise ValueError("Range not satisfiable")
+        return max(0, size - end), size - 1
+    if end is None:
+        end = size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
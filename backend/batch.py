@@ -0,0 +1,219 @@
+"""
+Offline batch report generation.
+
+    python batch.py records.jsonl --out batch_output
+
+Each input line is a ProjectData object, optionally with an "id" field (the
+line number is used otherwise). Reports are written to <out>/<id>.docx with
+the id reduced to letters, digits, "_" and "-"; lines that are not valid JSON
+or repeat an earlier id are recorded as failed and skipped. LLM calls for all
+records share one global rate limit, documents are rendered in a process
+pool, and every finished record is appended to <out>/manifest.jsonl. Re-running the same command skips
+records that already completed, so an interrupted batch resumes where it
+stopped.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+
+import generation
+import memory
+import report
+import routing
+from models import ProjectData, apply_report_defaults
+from tracing import configure_logging, start_request, span
+
+logger = logging.getLogger("batch")
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate project reports for every record in a JSONL file")
+    parser.add_argument("input", help="JSONL file with one ProjectData record per line")
+    parser.add_argument("--out", default="batch_output", help="Output directory for reports and the manifest")
+    parser.add_argument("--concurrency", type=int, default=4, help="Records generating LLM content at once")
+    parser.add_argument("--rpm", type=float, default=60, help="Global LLM requests per minute (0 = unlimited)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Render processes")
+    parser.add_argument("--images-dir", default=report.uploads_dir, help="Directory holding resultImages files")
+    parser.add_argument("--model", default=None, help="Gemini model name (default LLM_MODEL, or the draft model for quality=draft records)")
+    parser.add_argument("--optimize", action="store_true", help="Shrink each report after rendering (see docx_optimizer.py)")
+    return parser.parse_args(argv)
+
+
+def output_name(record_id: str) -> str:
+    """File name for a record's report; ids cannot point outside the output directory"""
+    return (re.sub(r"[^A-Za-z0-9_-]", "_", record_id)[:64] or "record") + ".docx"
+
+
+def load_records(path):
+    """
+    Return (records, failures): (record_id, line_number, raw_dict) for each
+    usable non-empty line, and a failed manifest entry for each line that is
+    not a JSON object or whose id (or output file name) was already used.
+    """
+    records = []
+    failures = []
+    seen = {}  # output file name -> line number that claimed it
+    with open(path, encoding="utf-8") as fh:
+        for line_number, line in enumerate(fh, 1):
+            if not line.strip():
+                continue
+            failure = {"id": f"line-{line_number:05d}", "line": line_number, "status": "error"}
+            try:
+                raw = json.loads(line)
+            except json.JSONDecodeError as e:
+                failures.append({**failure, "error": f"Invalid JSON: {e}"})
+                continue
+            if not isinstance(raw, dict):
+                failures.append({**failure, "error": "Record is not a JSON object"})
+                continue
+            record_id = str(raw.pop("id", None) or f"record-{line_number:05d}")
+            name = output_name(record_id)
+            if name in seen:
+                failures.append({**failure, "record": record_id,
+                                 "error": f"Duplicate id (same output file as line {seen[name]})"})
+                continue
+            seen[name] = line_number
+            records.append((record_id, line_number, raw))
+    return records, failures
+
+
+def load_manifest(path):
+    """Latest manifest entry per record ID (later lines win)"""
+    entries = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn write from an interrupted run
+                entries[entry["id"]] = entry
+    return entries
+
+
+def _init_worker(images_dir):
+    report.uploads_dir = images_dir
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def render_record(data_dict, sections, output_path, optimize=False):
+    """
+    Render one report in a worker process; writes atomically via a .part file.
+    Returns (render ms, bytes saved by the optimizer or None).
+    """
+    data = ProjectData(**data_dict)
+    partial_path = output_path + ".part"
+    start = time.perf_counter()
+    report.create_project_report(data, sections, partial_path)
+    saved = None
+    if optimize:
+        from docx_optimizer import optimize_docx
+
+        saved = optimize_docx(partial_path)["saved"]
+    os.replace(partial_path, output_path)
+    return (time.perf_counter() - start) * 1000, saved
+
+
+class Manifest:
+    """Append-only results log, flushed after every record"""
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def write(self, entry):
+        self._fh.write(json.dumps(entry) + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def close(self):
+        self._fh.close()
+
+
+async def process_record(record_id, line_number, raw, args, model, pool, semaphore, manifest):
+    output_path = os.path.join(args.out, output_name(record_id))
+    entry = {"id": record_id, "line": line_number, "output": output_path}
+    # Logged under its (sanitized) output name, which is unique within the batch
+    start_request(os.path.splitext(output_name(record_id))[0])
+    try:
+        data = apply_report_defaults(ProjectData(**raw))
+        memory.check_inputs(data, args.images_dir)
+        record_model = model or generation.get_model_for(data.quality)
+
+        async with semaphore:
+            llm_start = time.perf_counter()
+            generation.start_report_deadline()
+            with span("batch.generate", record=record_id):
+                if data.result and isinstance(data.result.aiGeneratedContent, bool) and data.result.aiGeneratedContent:
+                    data.result.aiGeneratedContent = await generation.generate_code_analysis(data, record_model)
+                sections = await generation.generate_sections(data, record_model)
+            entry["llm_ms"] = round((time.perf_counter() - llm_start) * 1000, 1)
+
+        loop = asyncio.get_running_loop()
+        render_ms, saved = await loop.run_in_executor(pool, render_record, data.model_dump(), sections, output_path, args.optimize)
+        entry.update(status="ok", render_ms=round(render_ms, 1))
+        if saved is not None:
+            entry["bytes_saved"] = saved
+        logger.info(f"Generated {output_path}")
+    except Exception as e:
+        entry.update(status="error", error=f"{type(e).__name__}: {e}")
+        logger.error(f"Record {record_id} (line {line_number}) failed: {e}")
+    manifest.write(entry)
+    return entry
+
+
+async def run(args):
+    if not routing.configured_keys():
+        raise SystemExit("GEMINI_API_KEYS or GEMINI_API_KEY environment variable is not set")
+
+    os.makedirs(args.out, exist_ok=True)
+    manifest_path = os.path.join(args.out, MANIFEST_NAME)
+    done = {
+        record_id for record_id, entry in load_manifest(manifest_path).items()
+        if entry.get("status") == "ok" and os.path.exists(entry.get("output", ""))
+    }
+
+    records, failures = load_records(args.input)
+    pending = [r for r in records if r[0] not in done]
+    logger.info(f"{len(records)} records, {len(records) - len(pending)} already done, {len(pending)} to generate")
+    for failure in failures:
+        logger.error(f"Skipping line {failure['line']}: {failure['error']}")
+
+    generation.rate_limiter = generation.RateLimiter(args.rpm)
+    model = generation.get_model(args.model) if args.model else None
+    semaphore = asyncio.Semaphore(args.concurrency)
+    manifest = Manifest(manifest_path)
+    for failure in failures:
+        manifest.write(failure)
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args.images_dir,)) as pool:
+            results = await asyncio.gather(*(
+                process_record(record_id, line_number, raw, args, model, pool, semaphore, manifest)
+                for record_id, line_number, raw in pending
+            ))
+    finally:
+        manifest.close()
+
+    failed = [r for r in results if r["status"] != "ok"] + failures
+    logger.info(f"Finished: {len(results)} processed, {len(failed)} failed")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    load_dotenv()
+    configure_logging(logging.INFO)
+    return asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,360 @@
+"""
+End-to-end load test for the backend.
+
+    python bench/loadtest.py --users 20 --duration 60            # spawn a server with the fake LLM
+    python bench/loadtest.py --users 20 --llm-latency-ms 3000     # slower fake LLM
+    python bench/loadtest.py --url http://host:8000 --users 5     # drive an already running server
+    python bench/loadtest.py --compare bench/results/loadtest-20240101-120000.json
+
+Each virtual user repeats the frontend's flow: start a session, upload
+--images images, generate a report that uses them and end the session.
+Unless --url is given the server is spawned with LLM_BACKEND=fake (see
+routing.FakeHandle) and its peak RSS and CPU are sampled from /proc.
+
+Prints throughput, p50/p95/p99 latency and error rate per endpoint and saves
+the run (configuration included) under bench/results/ so runs can be
+compared with --compare.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import zlib
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(backend_dir, "bench", "results")
+ENDPOINTS = ["start-session", "upload-image", "generate-report", "end-session"]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_png(width: int = 320, height: int = 240) -> bytes:
+    """A valid, mostly incompressible RGB PNG"""
+    raw = b"".join(b"\x00" + os.urandom(width * 3) for _ in range(height))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+def project_body(user: int, iteration: int, images) -> dict:
+    # Unique descriptions so identical-call coalescing does not flatter the numbers
+    return {
+        "projectDescription": f"Load test project {user}-{iteration}: a web app that tracks attendance from photos.",
+        "projectCode": "import cv2\n\ndef detect(frame):\n    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)\n" * 5,
+        "department": "Computer Science & Engineering",
+        "mainProfessor": "Dr. Load Test",
+        "mainProfessor_designation": "Professor",
+        "professorDepartment": "Computer Science & Engineering",
+        "course": "Software Engineering",
+        "teamMembers": [
+            {"name": f"Student {user}A", "rollNumber": f"1601{user:04d}1", "gender": "male"},
+            {"name": f"Student {user}B", "rollNumber": f"1601{user:04d}2", "gender": "female"},
+        ],
+        "result": {"resultImages": images, "codeOutput": "frames: 120\nfaces: 34", "aiGeneratedContent": True},
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {name: [] for name in ENDPOINTS}  # endpoint -> [(ms, status)]
+        self.flows = 0
+        self.report_ids = []
+        self.uploads = []
+        self._lock = threading.Lock()
+
+    def add(self, endpoint: str, ms: float, status: int):
+        with self._lock:
+            self.samples[endpoint].append((ms, status))
+
+
+def call(recorder: Recorder, endpoint: str, request: urllib.request.Request, timeout: float):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read()
+            status, headers = response.status, response.headers
+    except urllib.error.HTTPError as e:
+        body, status, headers = e.read(), e.code, e.headers
+    except OSError:
+        body, status, headers = b"", 0, {}  # connection error or timeout
+    recorder.add(endpoint, (time.perf_counter() - start) * 1000, status)
+    return status, headers, body
+
+
+def multipart(filename: str, content: bytes, content_type: str):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def run_flow(base: str, recorder: Recorder, user: int, iteration: int, images: int, timeout: float) -> bool:
+    status, _, body = call(recorder, "start-session", urllib.request.Request(f"{base}/api/start-session", method="POST"), timeout)
+    if status != 200:
+        return False
+    session_id = json.loads(body)["sessionId"]
+
+    names = []
+    for i in range(images):
+        data, content_type = multipart(f"result{i}.png", make_png(), "image/png")
+        request = urllib.request.Request(f"{base}/api/upload-image?session_id={session_id}", data=data,
+                                         headers={"Content-Type": content_type}, method="POST")
+        status, _, body = call(recorder, "upload-image", request, timeout)
+        if status == 200:
+            names.append(json.loads(body)["filename"])
+
+    request = urllib.request.Request(
+        f"{base}/api/generate-report?session_id={session_id}",
+        data=json.dumps(project_body(user, iteration, names)).encode(),
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+    status, headers, _ = call(recorder, "generate-report", request, timeout)
+    report_id = headers.get("X-Report-ID") if status == 200 else None
+
+    call(recorder, "end-session", urllib.request.Request(f"{base}/api/end-session/{session_id}", method="POST"), timeout)
+    with recorder._lock:
+        recorder.uploads.extend(names)
+        if report_id:
+            recorder.report_ids.append(report_id)
+    return status == 200
+
+
+class ProcessSampler(threading.Thread):
+    """Samples RSS and CPU of a local process from /proc (Linux only)"""
+
+    def __init__(self, pid: int, interval: float = 0.25):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss_mb = None
+        self.cpu_samples = []
+        self._done = threading.Event()
+
+    def _read(self):
+        with open(f"/proc/{self.pid}/status") as fh:
+            rss_kb = next(int(line.split()[1]) for line in fh if line.startswith("VmRSS:"))
+        with open(f"/proc/{self.pid}/stat") as fh:
+            fields = fh.read().rsplit(")", 1)[1].split()
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        return rss_kb / 1024, cpu_seconds
+
+    def run(self):
+        try:
+            _, last_cpu = self._read()
+        except (OSError, StopIteration):
+            return
+        last = time.perf_counter()
+        while not self._done.wait(self.interval):
+            try:
+                rss_mb, cpu = self._read()
+            except (OSError, StopIteration):
+                return
+            now = time.perf_counter()
+            self.peak_rss_mb = max(self.peak_rss_mb or 0, rss_mb)
+            self.cpu_samples.append(100 * (cpu - last_cpu) / (now - last))
+            last, last_cpu = now, cpu
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def start_server(args):
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({
+        "LLM_BACKEND": "fake",
+        "LLM_FAKE_LATENCY_MS": str(args.llm_latency_ms),
+        "LLM_FAKE_JITTER_MS": str(args.llm_jitter_ms),
+        "LLM_FAKE_ERROR_RATE": str(args.llm_error_rate),
+        "DRAFTS_DB": os.path.join(tempfile.mkdtemp(prefix="zap_loadtest_"), "drafts.sqlite3"),
+        "LOG_FORMAT": "text",
+    })
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"{base}/api/health", timeout=1):
+                return proc, base
+        except OSError:
+            time.sleep(0.05)
+    proc.terminate()
+    raise RuntimeError("Server did not become healthy within 30s")
+
+
+def remove_local_artifacts(recorder: Recorder):
+    """Delete the reports and uploads a spawned server wrote into the backend directory"""
+    for report_id in recorder.report_ids:
+        for ext in (".docx", ".json"):
+            try:
+                os.remove(os.path.join(backend_dir, "reports", report_id + ext))
+            except OSError:
+                pass
+    for name in recorder.uploads:
+        try:
+            os.remove(os.path.join(backend_dir, "uploads", name))
+        except OSError:
+            pass
+
+
+def percentile(values, q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    for name, samples in recorder.samples.items():
+        latencies = [ms for ms, _ in samples]
+        errors = sum(1 for _, status in samples if status != 200)
+        statuses = {}
+        for _, status in samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        endpoints[name] = {
+            "requests": len(samples),
+            "throughput_rps": round(len(samples) / elapsed, 2),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "mean_ms": statistics.fmean(latencies) if latencies else None,
+            "error_rate": round(errors / len(samples), 4) if samples else None,
+            "statuses": statuses,
+        }
+    return endpoints
+
+
+def print_summary(result: dict, baseline: dict = None):
+    print(f"{result['flows_completed']} flows in {result['elapsed_s']:.1f}s "
+          f"({result['flows_per_minute']:.1f} reports/min, {result['config']['users']} users)")
+    print(f"{'endpoint':16s} {'req':>6s} {'rps':>7s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'errors':>7s}")
+    for name, row in result["endpoints"].items():
+        if not row["requests"]:
+            continue
+        fmt = lambda v: f"{v:7.0f}ms" if v is not None else "      -"
+        line = (f"{name:16s} {row['requests']:6d} {row['throughput_rps']:7.2f} {fmt(row['p50_ms'])} "
+                f"{fmt(row['p95_ms'])} {fmt(row['p99_ms'])} {row['error_rate'] * 100:6.1f}%")
+        old = baseline and baseline["endpoints"].get(name)
+        if old and old.get("p95_ms") and row["p95_ms"] is not None:
+            line += f"   p95 {100 * (row['p95_ms'] - old['p95_ms']) / old['p95_ms']:+.0f}% vs baseline"
+        print(line)
+    server = result["server"]
+    if server["peak_rss_mb"] is not None:
+        print(f"server: peak RSS {server['peak_rss_mb']:.0f} MB, CPU mean {server['cpu_mean_pct']:.0f}% "
+              f"peak {server['cpu_peak_pct']:.0f}%")
+        if baseline and baseline["server"].get("peak_rss_mb"):
+            print(f"        baseline peak RSS {baseline['server']['peak_rss_mb']:.0f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to keep starting new flows")
+    parser.add_argument("--ramp", type=float, default=5, help="seconds over which users start")
+    parser.add_argument("--images", type=int, default=2, help="images uploaded per flow")
+    parser.add_argument("--timeout", type=float, default=300, help="per-request timeout (s)")
+    parser.add_argument("--url", help="drive an already running server instead of spawning one")
+    parser.add_argument("--llm-latency-ms", type=float, default=1000)
+    parser.add_argument("--llm-jitter-ms", type=float, default=250)
+    parser.add_argument("--llm-error-rate", type=float, default=0)
+    parser.add_argument("--out", help="where to save the results (default bench/results/loadtest-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    proc = None
+    if args.url:
+        base = args.url.rstrip("/")
+    else:
+        proc, base = start_server(args)
+    sampler = ProcessSampler(proc.pid) if proc else None
+    if sampler:
+        sampler.start()
+
+    recorder = Recorder()
+    start = time.perf_counter()
+    stop_at = start + args.duration
+
+    def user_loop(user: int):
+        time.sleep(args.ramp * user / max(1, args.users))
+        iteration = 0
+        while time.perf_counter() < stop_at:
+            if run_flow(base, recorder, user, iteration, args.images, args.timeout):
+                with recorder._lock:
+                    recorder.flows += 1
+            iteration += 1
+            time.sleep(random.uniform(0, 0.5))  # think time
+
+    threads = [threading.Thread(target=user_loop, args=(i,), daemon=True) for i in range(args.users)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        elapsed = time.perf_counter() - start
+        if sampler:
+            sampler.stop()
+        if proc:
+            proc.terminate()
+            proc.wait()
+            remove_local_artifacts(recorder)
+
+    cpu = sampler.cpu_samples if sampler else []
+    result = {
+        "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "elapsed_s": round(elapsed, 2),
+        "flows_completed": recorder.flows,
+        "flows_per_minute": round(60 * recorder.flows / elapsed, 2),
+        "endpoints": summarize(recorder, elapsed),
+        "server": {
+            "peak_rss_mb": round(sampler.peak_rss_mb, 1) if sampler and sampler.peak_rss_mb else None,
+            "cpu_mean_pct": round(statistics.fmean(cpu), 1) if cpu else None,
+            "cpu_peak_pct": round(max(cpu), 1) if cpu else None,
+        },
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+    print_summary(result, baseline)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"loadtest-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as fh:
+        json.dump(result, fh, indent=2)
+    print(f"saved {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
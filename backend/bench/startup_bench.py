@@ -0,0 +1,138 @@
+"""
+Cold-start benchmark for the backend.
+
+    python bench/startup_bench.py                 # check against bench/startup_budget.json
+    python bench/startup_bench.py --importtime    # also print the slowest imports
+
+Three checks, each run in a fresh interpreter:
+  1. `import main` must not pull in any of the budget's forbidden (heavy) modules.
+  2. The median time to `import main` must stay under import_main_ms.
+  3. The median time from spawning uvicorn to the first 200 from /api/health
+     must stay under cold_start_ms.
+Exits non-zero if any check fails, so it can gate CI.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(backend_dir, "bench", "startup_budget.json")
+
+
+def _env():
+    env = dict(os.environ)
+    # Keep benchmark runs away from the real draft database
+    env.setdefault("DRAFTS_DB", os.path.join(tempfile.gettempdir(), "zap_startup_bench.sqlite3"))
+    env.setdefault("LOG_FORMAT", "text")
+    return env
+
+
+def loaded_modules(forbidden):
+    """Which of the forbidden modules are in sys.modules after `import main`"""
+    code = (
+        "import json, sys, main; "
+        f"print(json.dumps([m for m in {forbidden!r} if m in sys.modules]))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=backend_dir, env=_env(),
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def import_time_ms():
+    code = "import time; t = time.perf_counter(); import main; print((time.perf_counter() - t) * 1000)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=backend_dir, env=_env(),
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def import_profile(top: int):
+    """Parse `-X importtime` output into (cumulative_us, module) sorted slowest first"""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=backend_dir,
+                         env=_env(), capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), module.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def cold_start_ms(timeout: float = 30.0):
+    """Spawn uvicorn and time until /api/health first answers 200"""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/api/health"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"No healthy response within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", default=BUDGET_PATH)
+    parser.add_argument("--importtime", action="store_true", help="Print the slowest imports of `import main`")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    with open(args.budget) as fh:
+        budget = json.load(fh)
+    failures = []
+
+    if args.importtime:
+        print("Slowest imports (cumulative):")
+        for cumulative_us, module in import_profile(args.top):
+            print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+    heavy = loaded_modules(budget["forbidden_modules"])
+    print(f"heavy modules loaded by `import main`: {heavy or 'none'}")
+    if heavy:
+        failures.append(f"`import main` eagerly imports {', '.join(heavy)}")
+
+    import_ms = statistics.median(import_time_ms() for _ in range(args.runs))
+    print(f"import main: {import_ms:.0f} ms (budget {budget['import_main_ms']} ms)")
+    if import_ms > budget["import_main_ms"]:
+        failures.append(f"import main took {import_ms:.0f} ms")
+
+    start_ms = statistics.median(cold_start_ms() for _ in range(args.runs))
+    print(f"cold start to healthy: {start_ms:.0f} ms (budget {budget['cold_start_ms']} ms)")
+    if start_ms > budget["cold_start_ms"]:
+        failures.append(f"cold start took {start_ms:.0f} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
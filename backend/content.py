@@ -0,0 +1,124 @@
+"""
+Section content model shared by the docx renderer and the HTML preview.
+
+`parse_text_content` turns the markdown-ish text the LLM returns into a list
+of Paragraph blocks (style, alignment and runs); the renderers only decide how
+to emit them. `report_outline` gives the chapters and their page numbers in
+document order. Nothing here imports python-docx.
+"""
+from typing import List, NamedTuple, Optional
+
+# The first chapter starts after the title, certificate, declaration,
+# acknowledgement and table-of-contents pages
+FIRST_CHAPTER_PAGE = 5
+
+
+class Run(NamedTuple):
+    text: str
+    bold: bool = False
+    size: Optional[int] = None  # points
+
+
+class Paragraph(NamedTuple):
+    runs: List[Run]
+    style: Optional[str] = None  # "List Bullet", "List Bullet 2", "Heading 3" or None
+    justify: bool = False
+
+
+def _bold_runs(text: str):
+    """Split on ** markers; odd parts are bold (empty parts are kept as empty runs)"""
+    return [Run(part, bold=i % 2 == 1) for i, part in enumerate(text.split("**"))]
+
+
+def _text_or_bold_runs(text: str):
+    return _bold_runs(text) if "**" in text else _plain_runs(text)
+
+
+def _plain_runs(text: str):
+    return [Run(text)] if text else []
+
+
+def parse_text_content(text_content: str) -> List[Paragraph]:
+    """Parse generated text into paragraphs for bullets, bold text and headers"""
+    blocks = []
+    if not text_content:
+        return blocks
+
+    for line in text_content.splitlines():
+        # Skip empty lines
+        if not line.strip():
+            continue
+
+        # Bold section titles (if they start and end with **)
+        if line.startswith("**") and line.endswith("**"):
+            blocks.append(Paragraph([Run(line.strip("**"), bold=True)]))
+
+        # Section titles with asterisks (e.g., *Video Processing:*)
+        elif line.startswith("*") and line.endswith("*") and ":" in line:
+            blocks.append(Paragraph([Run(line.strip("*"), bold=True, size=12)]))
+
+        # Top-level bullet points (e.g., `•`)
+        elif line.startswith("•"):
+            blocks.append(Paragraph(_text_or_bold_runs(line.lstrip("• ").strip()), "List Bullet"))
+
+        # Sub-bullet points with asterisks at beginning (e.g., `* Extract frames`)
+        elif line.strip().startswith("* "):
+            blocks.append(Paragraph(_text_or_bold_runs(line.strip().lstrip("* ").strip()), "List Bullet 2"))
+
+        # Numbered lists (e.g., `1.`); the number is not bold
+        elif line[0].isdigit() and len(line) > 1 and line[1] == ".":
+            parts = line.split(". ", 1)
+            if len(parts) > 1:
+                number, rest_of_line = parts
+                runs = [Run(number + ". ")]
+                runs += _bold_runs(rest_of_line) if "**" in rest_of_line else [Run(rest_of_line)]
+                blocks.append(Paragraph(runs))
+
+        # Regular top-level bullet points
+        elif line.startswith("- "):
+            blocks.append(Paragraph(_text_or_bold_runs(line.lstrip("- ").strip()), "List Bullet"))
+
+        # Sub-bullet points indented by four spaces or a tab (bold markers are kept as text)
+        elif line.startswith("    - ") or line.startswith("\t- "):
+            blocks.append(Paragraph(_plain_runs(line.lstrip("\t ").lstrip("- ").strip()), "List Bullet 2"))
+        elif line.startswith("  - "):
+            blocks.append(Paragraph(_text_or_bold_runs(line.lstrip("  - ").strip()), "List Bullet 2"))
+        elif line.startswith("        -"):
+            blocks.append(Paragraph(_text_or_bold_runs(line.lstrip("        -").strip()), "List Bullet 2"))
+
+        # Level 3 headers (`###`)
+        elif line.startswith("###"):
+            blocks.append(Paragraph([Run(line.lstrip("###").strip(), bold=True)], "Heading 3"))
+
+        # Regular plain text (non-bulleted)
+        else:
+            blocks.append(Paragraph([Run(line)], justify=True))
+
+    return blocks
+
+
+def has_results(result) -> bool:
+    return bool(result and (
+        (result.resultImages and len(result.resultImages) > 0) or
+        result.codeOutput or
+        result.aiGeneratedContent
+    ))
+
+
+def report_outline(data, sections: dict):
+    """
+    Chapters in document order as (name, content, page). Content is the section
+    text, the project code for "Code" and the ProjectResult for "Results"
+    (only present when there is something to show).
+    """
+    chapters = [
+        ("Abstract", sections["abstract"]),
+        ("Introduction", sections["introduction"]),
+        ("Objectives", sections["objectives"]),
+        ("Methodology", sections["methodology"]),
+        ("Code", data.projectCode),
+    ]
+    if has_results(data.result):
+        chapters.append(("Results", data.result))
+    chapters.append(("Conclusion", sections["conclusion"]))
+    return [(name, content, FIRST_CHAPTER_PAGE + i) for i, (name, content) in enumerate(chapters)]
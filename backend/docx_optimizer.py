@@ -0,0 +1,344 @@
+"""
+Size optimisation pass for rendered .docx files.
+
+python-docx's default template carries a lot of weight a generated report
+never uses, and the renderer writes some markup redundantly. `optimize_docx`
+rewrites a finished file in place:
+
+  - keeps one <w:pgBorders> per section (add_page_border appends another one
+    every time it is called for the same section)
+  - drops run properties that only repeat what the paragraph style already
+    sets (e.g. 12pt runs in Normal text, bold runs in Title paragraphs)
+  - removes styles nothing refers to, and the latent style table
+  - removes parts a report does not need (stylesWithEffects, customXml, the
+    template's thumbnail) and any part no relationship reaches any more
+  - makes duplicate media parts share one copy
+  - downsizes images to `image_dpi` at the size they are displayed at
+  - rewrites the zip at `compresslevel`
+
+It returns the sizes before and after so callers can report the saving.
+"""
+import hashlib
+import io
+import logging
+import math
+import os
+import posixpath
+import zipfile
+
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+WP = "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"
+A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+EMU_PER_INCH = 914400
+CONTENT_TYPES = "http://schemas.openxmlformats.org/package/2006/content-types"
+
+_W = f"{{{W}}}"
+
+# Relationship types a generated report does not need (matched by suffix so
+# both the transitional and Office 2010 namespaces are covered)
+_DROPPABLE_REL_TYPES = ("/stylesWithEffects", "/customXml", "/metadata/thumbnail")
+
+# Run properties that are compared against the paragraph style
+_RUN_PROPS = ("b", "sz", "szCs", "color", "rFonts", "i")
+
+# XML parts whose styles/relationship IDs are referenced from their content
+_CONTENT_PARTS = ("word/document.xml", "word/numbering.xml")
+
+
+def _rels_path(part: str) -> str:
+    directory, name = posixpath.split(part)
+    return posixpath.join(directory, "_rels", name + ".rels")
+
+
+def _resolve(part: str, target: str) -> str:
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(posixpath.dirname(part), target))
+
+
+def _parse(data: bytes):
+    return etree.fromstring(data, etree.XMLParser(remove_blank_text=False, resolve_entities=False))
+
+
+def _serialize(root) -> bytes:
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+
+class _Package:
+    """The zip's parts in their original order, with parsed XML cached while editing"""
+
+    def __init__(self, path: str):
+        with zipfile.ZipFile(path) as archive:
+            self.names = archive.namelist()
+            self.data = {name: archive.read(name) for name in self.names}
+        self._xml = {}
+
+    def xml(self, name: str):
+        if name not in self._xml:
+            self._xml[name] = _parse(self.data[name])
+        return self._xml[name]
+
+    def has(self, name: str) -> bool:
+        return name in self.data
+
+    def remove(self, name: str):
+        self.data.pop(name, None)
+        self._xml.pop(name, None)
+
+    def rels(self, part: str):
+        """(rels part name, root) for `part`, or (name, None) when it has no relationships"""
+        name = "_rels/.rels" if part == "" else _rels_path(part)
+        return name, (self.xml(name) if self.has(name) else None)
+
+    def write(self, path: str, compresslevel: int):
+        for name, root in self._xml.items():
+            if name in self.data:
+                self.data[name] = _serialize(root)
+        temp_path = path + ".opt"
+        with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as archive:
+            # [Content_Types].xml must stay the first entry
+            for name in self.names:
+                if name in self.data:
+                    archive.writestr(name, self.data[name])
+        os.replace(temp_path, path)
+
+
+def _dedupe_page_borders(pkg: _Package):
+    document = pkg.xml("word/document.xml")
+    for sect_pr in document.iter(f"{_W}sectPr"):
+        borders = sect_pr.findall(f"{_W}pgBorders")
+        # The last one appended is the one that was meant to apply
+        for extra in borders[:-1]:
+            sect_pr.remove(extra)
+
+
+def _prop_key(element):
+    """Comparable value of a run property element (tag and attributes)"""
+    return element.tag, tuple(sorted(element.attrib.items()))
+
+
+def _style_run_props(styles):
+    """styleId -> (basedOn, {prop: value}) plus the default paragraph style and doc defaults"""
+    table = {}
+    default_paragraph = None
+    for style in styles.iter(f"{_W}style"):
+        style_id = style.get(f"{_W}styleId")
+        based_on = style.find(f"{_W}basedOn")
+        props = {}
+        r_pr = style.find(f"{_W}rPr")
+        if r_pr is not None:
+            for child in r_pr:
+                props[etree.QName(child).localname] = _prop_key(child)
+        table[style_id] = (based_on.get(f"{_W}val") if based_on is not None else None, props)
+        if style.get(f"{_W}type") == "paragraph" and style.get(f"{_W}default") in ("1", "true"):
+            default_paragraph = style_id
+
+    defaults = {}
+    doc_r_pr = styles.find(f"{_W}docDefaults/{_W}rPrDefault/{_W}rPr")
+    if doc_r_pr is not None:
+        for child in doc_r_pr:
+            defaults[etree.QName(child).localname] = _prop_key(child)
+    return table, default_paragraph, defaults
+
+
+def _effective(table, defaults, style_id, prop):
+    seen = set()
+    while style_id and style_id in table and style_id not in seen:
+        seen.add(style_id)
+        based_on, props = table[style_id]
+        if prop in props:
+            return props[prop]
+        style_id = based_on
+    return defaults.get(prop)
+
+
+def _drop_redundant_run_props(pkg: _Package):
+    if not pkg.has("word/styles.xml"):
+        return
+    table, default_paragraph, defaults = _style_run_props(pkg.xml("word/styles.xml"))
+    document = pkg.xml("word/document.xml")
+    for paragraph in document.iter(f"{_W}p"):
+        # Table styles can contribute run formatting too; leave table content alone
+        if any(etree.QName(a).localname == "tbl" for a in paragraph.iterancestors()):
+            continue
+        p_style = paragraph.find(f"{_W}pPr/{_W}pStyle")
+        style_id = p_style.get(f"{_W}val") if p_style is not None else default_paragraph
+        for run in paragraph.findall(f"{_W}r"):
+            r_pr = run.find(f"{_W}rPr")
+            if r_pr is None or r_pr.find(f"{_W}rStyle") is not None:
+                continue
+            for child in list(r_pr):
+                prop = etree.QName(child).localname
+                if prop in _RUN_PROPS and _effective(table, defaults, style_id, prop) == _prop_key(child):
+                    r_pr.remove(child)
+            if len(r_pr) == 0:
+                run.remove(r_pr)
+
+
+def _strip_unused_styles(pkg: _Package):
+    if not pkg.has("word/styles.xml"):
+        return
+    styles = pkg.xml("word/styles.xml")
+    used = set()
+    for part in _CONTENT_PARTS + tuple(n for n in pkg.data if n.startswith("word/footer") or n.startswith("word/header")):
+        if not pkg.has(part) or not part.endswith(".xml"):
+            continue
+        for tag in ("pStyle", "rStyle", "tblStyle", "numStyleLink", "styleLink"):
+            for element in pkg.xml(part).iter(f"{_W}{tag}"):
+                used.add(element.get(f"{_W}val"))
+
+    by_id = {style.get(f"{_W}styleId"): style for style in styles.iter(f"{_W}style")}
+    defaults = {sid for sid, style in by_id.items() if style.get(f"{_W}default") in ("1", "true")}
+    # Keep used and default styles plus everything they are based on or link to
+    keep = set()
+    pending = list(used | defaults)
+    while pending:
+        style_id = pending.pop()
+        if style_id in keep:
+            continue
+        keep.add(style_id)
+        style = by_id.get(style_id)
+        if style is None:
+            continue
+        for tag in ("basedOn", "next", "link"):
+            ref = style.find(f"{_W}{tag}")
+            if ref is not None:
+                pending.append(ref.get(f"{_W}val"))
+
+    for style_id, style in by_id.items():
+        if style_id not in keep:
+            styles.remove(style)
+    latent = styles.find(f"{_W}latentStyles")
+    if latent is not None:
+        styles.remove(latent)
+
+
+def _drop_optional_relationships(pkg: _Package):
+    for part in ("", "word/document.xml"):
+        name, rels = pkg.rels(part)
+        if rels is None:
+            continue
+        for rel in list(rels):
+            if rel.get("Type", "").endswith(_DROPPABLE_REL_TYPES):
+                rels.remove(rel)
+
+
+def _reachable_parts(pkg: _Package):
+    reached = set()
+    pending = [""]
+    while pending:
+        part = pending.pop()
+        rels_name, rels = pkg.rels(part)
+        if rels is None:
+            continue
+        reached.add(rels_name)
+        for rel in rels:
+            if rel.get("TargetMode") == "External":
+                continue
+            target = _resolve(part, rel.get("Target"))
+            if target not in reached and pkg.has(target):
+                reached.add(target)
+                pending.append(target)
+    return reached
+
+
+def _drop_unreachable_parts(pkg: _Package):
+    reached = _reachable_parts(pkg)
+    content_types = pkg.xml("[Content_Types].xml")
+    for name in list(pkg.data):
+        if name == "[Content_Types].xml" or name in reached:
+            continue
+        pkg.remove(name)
+        for override in content_types.findall(f"{{{CONTENT_TYPES}}}Override"):
+            if override.get("PartName") == "/" + name:
+                content_types.remove(override)
+
+
+def _dedupe_media(pkg: _Package):
+    """Point every relationship to identical media at one copy; the others become unreachable"""
+    first_by_hash = {}
+    for name in sorted(n for n in pkg.data if n.startswith("word/media/")):
+        first_by_hash.setdefault(hashlib.sha256(pkg.data[name]).hexdigest(), name)
+    canonical = {name: first_by_hash[hashlib.sha256(pkg.data[name]).hexdigest()]
+                 for name in pkg.data if name.startswith("word/media/")}
+    if len(set(canonical.values())) == len(canonical):
+        return
+    for name in [n for n in pkg.data if n.endswith(".rels")]:
+        source = name.replace("_rels/", "")[:-len(".rels")]
+        for rel in pkg.xml(name):
+            if rel.get("TargetMode") == "External":
+                continue
+            target = _resolve(source, rel.get("Target"))
+            if canonical.get(target, target) != target:
+                rel.set("Target", posixpath.relpath(canonical[target], posixpath.dirname(source)))
+
+
+def _display_sizes(pkg: _Package):
+    """Media part -> largest (width, height) in inches it is displayed at in the document body"""
+    _, rels = pkg.rels("word/document.xml")
+    if rels is None:
+        return {}
+    targets = {rel.get("Id"): _resolve("word/document.xml", rel.get("Target"))
+               for rel in rels if rel.get("TargetMode") != "External"}
+    sizes = {}
+    for extent in pkg.xml("word/document.xml").iter(f"{{{WP}}}extent"):
+        drawing = extent.getparent()
+        blip = next(drawing.iter(f"{{{A}}}blip"), None)
+        target = targets.get(blip.get(f"{{{R}}}embed")) if blip is not None else None
+        if target is None:
+            continue
+        width, height = int(extent.get("cx")) / EMU_PER_INCH, int(extent.get("cy")) / EMU_PER_INCH
+        previous = sizes.get(target, (0, 0))
+        sizes[target] = (max(previous[0], width), max(previous[1], height))
+    return sizes
+
+
+def _shrink_images(pkg: _Package, image_dpi: int, jpeg_quality: int):
+    from PIL import Image
+
+    for name, (width_in, height_in) in _display_sizes(pkg).items():
+        original = pkg.data.get(name)
+        if original is None:
+            continue
+        target = (math.ceil(width_in * image_dpi), math.ceil(height_in * image_dpi))
+        try:
+            with Image.open(io.BytesIO(original)) as img:
+                image_format = img.format
+                if image_format not in ("JPEG", "PNG") or (img.width <= target[0] and img.height <= target[1]):
+                    continue
+                exif = img.info.get("exif")
+                img.thumbnail(target)
+                out = io.BytesIO()
+                if image_format == "JPEG":
+                    if img.mode not in ("RGB", "L"):
+                        img = img.convert("RGB")
+                    img.save(out, format="JPEG", quality=jpeg_quality, optimize=True, **({"exif": exif} if exif else {}))
+                else:
+                    img.save(out, format="PNG", optimize=True)
+        except Exception as e:
+            logger.warning(f"Could not downsize {name}: {e}")
+            continue
+        if out.tell() < len(original):
+            pkg.data[name] = out.getvalue()
+
+
+def optimize_docx(path: str, image_dpi: int = 220, jpeg_quality: int = 85, compresslevel: int = 9) -> dict:
+    """Shrink the .docx at `path` in place; returns {"before", "after", "saved"} in bytes"""
+    before = os.path.getsize(path)
+    pkg = _Package(path)
+    _dedupe_page_borders(pkg)
+    _drop_redundant_run_props(pkg)
+    _strip_unused_styles(pkg)
+    _drop_optional_relationships(pkg)
+    _dedupe_media(pkg)
+    if image_dpi:
+        _shrink_images(pkg, image_dpi, jpeg_quality)
+    _drop_unreachable_parts(pkg)
+    pkg.write(path, compresslevel)
+    after = os.path.getsize(path)
+    return {"before": before, "after": after, "saved": before - after}
@@ -0,0 +1,165 @@
+"""
+Persistent draft store for generated reports.
+
+Each report keeps its input ProjectData, the text of every section (with the
+model and prompt version that produced it), the images it references and
+per-stage timings, so it can be fetched, edited and re-rendered later without
+calling the LLM again. Backed by SQLite; the database path comes from the
+DRAFTS_DB environment variable.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from models import ProjectData
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    session_id TEXT,
+    data_json TEXT NOT NULL,
+    images_json TEXT NOT NULL DEFAULT '[]',
+    timings_json TEXT NOT NULL DEFAULT '{}',
+    report_path TEXT
+);
+CREATE TABLE IF NOT EXISTS sections (
+    report_id TEXT NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    text TEXT NOT NULL,
+    model TEXT,
+    prompt_version TEXT,
+    edited INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (report_id, name)
+);
+CREATE INDEX IF NOT EXISTS reports_created_at ON reports(created_at);
+"""
+
+
+class DraftStore:
+    """SQLite-backed store; safe to share between threads"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+
+    def create_report(self, report_id: str, data: ProjectData, sections: dict, *, model: str = None,
+                      prompt_version: str = None, images=None, timings=None, report_path: str = None,
+                      session_id: str = None):
+        """Insert a new report with all of its generated sections"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO reports (id, created_at, updated_at, session_id, data_json, images_json, timings_json, report_path)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (report_id, now, now, session_id, data.model_dump_json(), json.dumps(images or []),
+                 json.dumps(timings or {}), report_path),
+            )
+            self._conn.executemany(
+                "INSERT INTO sections (report_id, name, text, model, prompt_version, edited, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, 0, ?)",
+                [(report_id, name, text or "", model, prompt_version, now) for name, text in sections.items()],
+            )
+
+    def get_report(self, report_id: str):
+        """Return the stored report as a dict, or None if it does not exist"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM reports WHERE id = ?", (report_id,)).fetchone()
+            if row is None:
+                return None
+            section_rows = self._conn.execute(
+                "SELECT * FROM sections WHERE report_id = ?", (report_id,)
+            ).fetchall()
+        return {
+            "id": row["id"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "session_id": row["session_id"],
+            "data": ProjectData.model_validate_json(row["data_json"]),
+            "images": json.loads(row["images_json"]),
+            "timings": json.loads(row["timings_json"]),
+            "report_path": row["report_path"],
+            "sections": {
+                s["name"]: {
+                    "text": s["text"],
+                    "model": s["model"],
+                    "prompt_version": s["prompt_version"],
+                    "edited": bool(s["edited"]),
+                    "updated_at": s["updated_at"],
+                }
+                for s in section_rows
+            },
+        }
+
+    def update_section(self, report_id: str, name: str, text: str, *, model: str = None,
+                       prompt_version: str = None, edited: bool = False) -> bool:
+        """Insert or replace one section's text; returns False if the report does not exist"""
+        now = time.time()
+        with self._lock, self._conn:
+            updated = self._conn.execute("UPDATE reports SET updated_at = ? WHERE id = ?", (now, report_id))
+            if updated.rowcount == 0:
+                return False
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sections (report_id, name, text, model, prompt_version, edited, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (report_id, name, text, model, prompt_version, int(edited), now),
+            )
+        return True
+
+    def update_timings(self, report_id: str, timings: dict):
+        """Merge new stage timings into a report's stored timings"""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT timings_json FROM reports WHERE id = ?", (report_id,)).fetchone()
+            if row is None:
+                return
+            merged = {**json.loads(row["timings_json"]), **timings}
+            self._conn.execute("UPDATE reports SET timings_json = ? WHERE id = ?", (json.dumps(merged), report_id))
+
+    def delete_report(self, report_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM reports WHERE id = ?", (report_id,))
+
+    def evict_oldest(self, keep: int):
+        """Delete all but the newest `keep` reports and return the deleted rows"""
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id, images_json, report_path FROM reports ORDER BY created_at DESC LIMIT -1 OFFSET ?",
+                (keep,),
+            ).fetchall()
+            self._conn.executemany("DELETE FROM reports WHERE id = ?", [(r["id"],) for r in rows])
+        return [
+            {"id": r["id"], "images": json.loads(r["images_json"]), "report_path": r["report_path"]}
+            for r in rows
+        ]
+
+    def images_in_use(self, filenames) -> set:
+        """Those of `filenames` that a stored report still references"""
+        filenames = list(filenames)
+        if not filenames:
+            return set()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT images.value FROM reports, json_each(reports.images_json) AS images"
+                f" WHERE images.value IN ({', '.join('?' * len(filenames))})",
+                filenames,
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_default_store() -> DraftStore:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return DraftStore(os.getenv("DRAFTS_DB", os.path.join(current_dir, "drafts.sqlite3")))
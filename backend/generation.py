@@ -0,0 +1,647 @@
+"""
+LLM prompts and section generation for project reports.
+
+The title is generated first and then passed into the remaining section
+prompts, which run concurrently. All calls go through `ask`, which applies the
+shared rate limit, enforces deadlines and records a span per call.
+
+Deadlines (environment, 0 disables):
+    LLM_SECTION_DEADLINE_SECONDS   limit for a single call (default 60)
+    REPORT_DEADLINE_SECONDS        limit for all calls of one report (default 180)
+
+With LLM_HEDGE=1 a call that runs past its section's observed p95 latency
+(once LLM_HEDGE_MIN_SAMPLES calls have been seen) is duplicated and the first
+response wins.
+
+A circuit breaker shared by every call stops sending requests while the
+backend is failing or very slow (see CircuitBreaker for its settings).
+
+Identical calls (same model, section and whitespace-normalised prompt) that
+overlap share one pending request. The code/output analysis is also kept for
+ANALYSIS_REUSE_SECONDS (default 600) so /api/generate-ai-content followed by
+/api/generate-report for the same code and output asks the model only once.
+
+Reports requested with quality="draft" use shorter prompts and a digest of
+the code (at most DRAFT_CODE_CHARS, default 6000) on the draft model
+(LLM_DRAFT_MODEL, default the router's fast model). Only the sections in
+LLM_DRAFT_SECTIONS (default abstract,objectives,methodology) are generated;
+the others get a placeholder. Prompt/response token counts per mode are
+exported as zap_llm_tokens_total.
+"""
+import asyncio
+import contextvars
+import hashlib
+import logging
+import math
+import os
+import re
+import time
+from collections import OrderedDict, deque
+
+import metrics
+import routing
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Used when LLM_MODEL is not set (see routing.py for the fast model and key pool)
+DEFAULT_MODEL = "gemini-1.5-flash"
+
+# Bump whenever a prompt changes so stored drafts record which prompts produced them
+PROMPT_VERSION = "3"
+
+# Body sections in document order (the title is generated separately)
+SECTION_NAMES = ["abstract", "introduction", "objectives", "methodology", "conclusion"]
+
+# Sections that can be regenerated on their own ("analysis" is the code & output analysis)
+REGENERABLE_SECTIONS = ["title", *SECTION_NAMES, "analysis"]
+
+TITLE_PROMPT = "Using the provided description and code, get me a title for the code with Uppercase letters. Description: {description}. Code: {code}"
+
+SECTION_PROMPTS = {
+    "abstract": "Using the provided description and code, write a concise 400-word abstract summarizing the project. Do not include any titles or headings in your response. Replace any generic terms like 'the project'  with the specific project title wherever applicable. Don't include any conclusion. Description: {description}. Code: {code}",
+
+    "introduction": """"Compose a compelling and informative project overview of approximately 350 words, designed to immediately engage the reader and provide a comprehensive understanding of the project's scope and significance. This overview should be structured as follows:
+
+1. **Context and Motivation:** Begin by establishing the context of the research or problem being addressed. Clearly explain the motivation behind the project and why it is important.
+2. **Objectives and Goals:** Explicitly state the project's objectives and the intended outcomes. What specific goals are you trying to achieve?
+3. **Methodology and Approach:** Describe the key methodologies, techniques, or technologies that will be used to achieve the project's objectives. Provide a high-level overview of the project's workflow or stages.
+4. **Potential Impact and Contributions:** Discuss the potential impact of the project on the relevant field or area of study. What new knowledge, solutions, or insights are expected to emerge?
+5. **Concluding Statement:** Briefly summarize the project's overall significance and reiterate its potential contributions.
+
+Crucially, this overview must *not* include the word "Introduction" as a heading, or any other section headings. It should flow seamlessly as a single, cohesive piece of text.
+
+Base your response on the following description and code:
+
+Description: {description}
+Code: {code}""",
+
+    "objectives": "Analyze the following code and provide a concise, bullet-point summary of its objectives, targeting approximately 20 bullet points. Prioritize clarity, conciseness, and the use of short, direct sentences. Group related objectives under short, descriptive *side headings* if it improves readability and organization. Absolutely *do not* use a main heading for the entire summary. Description: {description}, Code: {code}",
+
+    "methodology": """Provide a detailed explanation of the methodology employed in this project, based on the provided description and code. This explanation should cover:
+
+*   The specific steps or stages involved in the project.
+*   The processes and procedures used at each stage.
+*   The techniques, algorithms, or tools applied.
+*   The overall approach or strategy adopted.
+
+Use side headings to organize the explanation into logical sections, but do *not* use a main heading for the entire response.
+
+Description: {description}
+Code: {code}""",
+
+    "conclusion": """Compose a compelling and informative concluding summary of approximately 300 words, designed to provide a strong sense of closure and highlight the project's overall impact. This summary should be structured as follows:
+
+1. **Summary of Outcomes:** Briefly recap the project's main objectives and summarize the key results or outcomes achieved.
+2. **Significance of Findings:** Discuss the significance of these findings in the context of the research area or problem being addressed. What new insights or knowledge have been gained?
+3. **Implications and Impact:** Explore the broader implications of the project's outcomes. What are the potential applications, real-world impacts, or future research directions that stem from this work?
+4. **Limitations and Future Work (Optional):** Briefly acknowledge any limitations of the project and suggest potential avenues for future research or improvement.
+5. **Concluding Remarks:** Offer a concise concluding statement that reinforces the project's overall contribution and significance.
+
+Crucially, this summary must *not* include the word "Conclusion" as a heading, or any other section headings. It should flow seamlessly as a single, cohesive piece of text.
+
+Base your response on the following description and code:
+
+Description: {description}
+Code: {code}""",
+}
+
+ANALYSIS_PROMPT = """Analyze the following code and its output, providing insights about:
+1. The code's functionality and performance
+2. Key patterns or interesting aspects in the output
+3. Potential improvements or optimizations
+4. Any notable technical achievements
+
+Code: {code}
+Output: {output}
+"""
+
+# Shorter variants for quality="draft"; the code is passed as a digest
+DRAFT_SECTION_PROMPTS = {
+    "abstract": "Using the provided description and code, write a concise 120-word abstract summarizing the project. Do not include any titles or headings. Description: {description}. Code: {code}",
+    "introduction": "Write a 120-word overview of this project covering its motivation, goals and approach, as a single piece of text without headings. Description: {description}. Code: {code}",
+    "objectives": "Summarize the objectives of this project as about 6 short bullet points, without a main heading. Description: {description}, Code: {code}",
+    "methodology": "Explain the methodology of this project in about 150 words, using at most three side headings and no main heading. Description: {description}. Code: {code}",
+    "conclusion": "Write a 100-word concluding summary of this project's outcomes and significance, as a single piece of text without headings. Description: {description}. Code: {code}",
+}
+
+DRAFT_ANALYSIS_PROMPT = """In about 120 words, analyze the following code and its output: what it does, what the output shows and one possible improvement.
+
+Code: {code}
+Output: {output}
+"""
+
+DRAFT_SECTIONS = [s.strip() for s in os.getenv("LLM_DRAFT_SECTIONS", "abstract,objectives,methodology").split(",") if s.strip()]
+DRAFT_CODE_CHARS = int(os.getenv("DRAFT_CODE_CHARS", "6000"))
+DRAFT_OUTPUT_CHARS = 2000
+DRAFT_PLACEHOLDER = "This section is not generated for drafts. Regenerate it, or generate the report in final quality."
+
+# Lines kept in a code digest: imports and definitions in common languages
+_OUTLINE_LINE = re.compile(
+    r"^\s*(?:(?:async\s+)?def\s|class\s|import\s|from\s+\S+\s+import\s|#include|using\s|package\s"
+    r"|(?:public|private|protected|static|export|func|fn|function)\b)"
+)
+
+
+def code_digest(code: str, limit: int = None) -> str:
+    """
+    Code shortened to about `limit` characters for draft prompts: the start of
+    the file, then the import and definition lines of the rest.
+    Code that already fits is returned unchanged.
+    """
+    limit = DRAFT_CODE_CHARS if limit is None else limit
+    if len(code) <= limit:
+        return code
+    lines = code.splitlines()
+    outline = [line.rstrip() for line in lines if _OUTLINE_LINE.match(line)]
+    budget = max(limit // 2, limit - sum(len(line) + 1 for line in outline))
+    head, used = [], 0
+    for line in lines:
+        if used + len(line) + 1 > budget:
+            break
+        head.append(line)
+        used += len(line) + 1
+    rest = [line.rstrip() for line in lines[len(head):] if _OUTLINE_LINE.match(line)]
+    digest = "\n".join(head + ["# ... (remaining code shortened to its definitions)"] + rest)
+    return digest[:limit]
+
+
+def quality_of(data) -> str:
+    return getattr(data, "quality", None) or "final"
+
+
+def prompt_code(data) -> str:
+    """The code as it is sent in prompts for this report's quality"""
+    return code_digest(data.projectCode) if quality_of(data) == "draft" else data.projectCode
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every LLM call in the process.
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, burst: int = None):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst or 1
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        # Created lazily so the limiter can be built before an event loop exists
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+rate_limiter = RateLimiter(float(os.getenv("LLM_RATE_LIMIT_RPM", "0")))
+
+
+class LatencyTracker:
+    """Recent successful call latencies per section, used to pick the hedge delay"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+
+    def record(self, section: str, ms: float):
+        self._samples.setdefault(section, deque(maxlen=self.window)).append(ms)
+
+    def p95(self, section: str):
+        """Observed p95 in ms, or None until enough calls have been seen"""
+        samples = self._samples.get(section)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the LLM while the circuit breaker is open"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM backend unavailable, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Fails LLM calls fast while the backend is unhealthy.
+
+    closed:    calls go through; outcomes over the last `window` seconds are kept and
+               the breaker opens once at least `min_calls` were seen and the error rate
+               (or the share of calls slower than `slow_ms`) reaches its threshold.
+    open:      calls raise CircuitOpenError until `cooldown` seconds have passed.
+    half_open: up to `trial_calls` probes go through; if all succeed the breaker
+               closes, any failure opens it again.
+    """
+
+    def __init__(self, window: float = 60, min_calls: int = 10, error_rate: float = 0.5,
+                 slow_ms: float = 0, slow_rate: float = 0.8, cooldown: float = 30, trial_calls: int = 2):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_ms = slow_ms
+        self.slow_rate = slow_rate
+        self.cooldown = cooldown
+        self.trial_calls = trial_calls
+        self.state = "closed"
+        self._outcomes = deque()  # (time, ok, slow)
+        self._opened_at = 0.0
+        self._trials_in_flight = 0
+        self._trial_successes = 0
+
+    def retry_after(self) -> float:
+        return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def check(self):
+        """Raise CircuitOpenError if calls are currently being rejected, without reserving a call"""
+        if self.state == "open" and self.retry_after() > 0:
+            BREAKER_REJECTIONS.inc()
+            raise CircuitOpenError(self.retry_after())
+
+    def acquire(self) -> bool:
+        """Admit one call or raise CircuitOpenError; returns True if the call is a half-open probe"""
+        if self.state == "open":
+            if self.retry_after() > 0:
+                BREAKER_REJECTIONS.inc()
+                raise CircuitOpenError(self.retry_after())
+            self._transition("half_open")
+        if self.state == "half_open":
+            if self._trials_in_flight + self._trial_successes >= self.trial_calls:
+                BREAKER_REJECTIONS.inc()
+                raise CircuitOpenError(1)
+            self._trials_in_flight += 1
+            return True
+        return False
+
+    def record(self, trial: bool, ok: bool, latency_ms: float):
+        """Record the outcome of a call admitted by acquire()"""
+        if trial:
+            self._trials_in_flight -= 1
+            if not ok:
+                self._transition("open")
+                return
+            self._trial_successes += 1
+            if self._trial_successes >= self.trial_calls:
+                self._transition("closed")
+            return
+        if self.state != "closed":
+            return  # a call that started before the breaker opened
+
+        now = time.monotonic()
+        self._outcomes.append((now, ok, self.slow_ms > 0 and latency_ms >= self.slow_ms))
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+        total = len(self._outcomes)
+        if total < self.min_calls:
+            return
+        errors = sum(1 for _, ok, _ in self._outcomes if not ok)
+        slow = sum(1 for _, _, slow in self._outcomes if slow)
+        if errors / total >= self.error_rate or (self.slow_ms > 0 and slow / total >= self.slow_rate):
+            self._transition("open")
+
+    def release(self, trial: bool):
+        """Forget a call that was cancelled before it finished"""
+        if trial:
+            self._trials_in_flight -= 1
+
+    def _transition(self, state: str):
+        previous, self.state = self.state, state
+        if state == "open":
+            self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self._trials_in_flight = 0
+        self._trial_successes = 0
+        BREAKER_TRANSITIONS.inc(state=state)
+        for name in ("closed", "half_open", "open"):
+            BREAKER_STATE.set(1 if name == state else 0, state=name)
+        log = logger.warning if state == "open" else logger.info
+        log(f"LLM circuit breaker {previous} -> {state}")
+
+
+SECTION_DEADLINE = float(os.getenv("LLM_SECTION_DEADLINE_SECONDS", "60"))
+REPORT_DEADLINE = float(os.getenv("REPORT_DEADLINE_SECONDS", "180"))
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "0") == "1"
+latency_tracker = LatencyTracker(min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")))
+
+# Absolute (monotonic) deadline shared by every call made for the current report
+_report_deadline = contextvars.ContextVar("report_deadline", default=None)
+
+LLM_LATENCY = metrics.histogram("zap_llm_latency_ms", "Successful LLM call latency", ["section"])
+LLM_DEADLINE_EXPIRIES = metrics.counter(
+    "zap_llm_deadline_expiries_total", "LLM calls abandoned at a deadline", ["section", "scope"]
+)
+LLM_HEDGES = metrics.counter(
+    "zap_llm_hedges_total", "Hedged LLM calls by which request answered first", ["section", "winner"]
+)
+BREAKER_STATE = metrics.gauge("zap_llm_breaker_state", "1 for the circuit breaker's current state", ["state"])
+BREAKER_TRANSITIONS = metrics.counter("zap_llm_breaker_transitions_total", "Circuit breaker state changes", ["state"])
+BREAKER_REJECTIONS = metrics.counter("zap_llm_breaker_rejections_total", "LLM calls rejected by the open circuit breaker")
+LLM_COALESCED = metrics.counter(
+    "zap_llm_coalesced_total", "LLM calls answered by an identical call already in flight", ["section"]
+)
+ANALYSIS_REUSED = metrics.counter("zap_llm_analysis_reused_total", "Code analyses served from a recent identical request")
+LLM_TOKENS = metrics.counter(
+    "zap_llm_tokens_total",
+    "LLM tokens by section, report quality and direction (estimated at 4 characters per token when the response has no usage data)",
+    ["section", "quality", "direction"],
+)
+
+# Quality of the report the current task is generating, for the token metrics
+_quality = contextvars.ContextVar("quality", default="final")
+
+llm_breaker = CircuitBreaker(
+    window=float(os.getenv("LLM_BREAKER_WINDOW_SECONDS", "60")),
+    min_calls=int(os.getenv("LLM_BREAKER_MIN_CALLS", "10")),
+    error_rate=float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5")),
+    slow_ms=float(os.getenv("LLM_BREAKER_SLOW_MS", "0")),
+    slow_rate=float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.8")),
+    cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30")),
+    trial_calls=int(os.getenv("LLM_BREAKER_TRIAL_CALLS", "2")),
+)
+BREAKER_STATE.set(1, state="closed")
+
+# Calls in flight by flight_key: {"task": asyncio.Task, "waiters": int, "deadline", "scope"}.
+# The shared call runs until the latest deadline among its waiters.
+_in_flight = {}
+
+ANALYSIS_REUSE_SECONDS = float(os.getenv("ANALYSIS_REUSE_SECONDS", "600"))
+_recent_analyses = OrderedDict()  # flight key -> (expires at, text), oldest first
+MAX_RECENT_ANALYSES = 256
+
+
+def start_report_deadline(seconds: float = None):
+    """Start the overall deadline for the calls made from the current task (and its children)"""
+    seconds = REPORT_DEADLINE if seconds is None else seconds
+    _report_deadline.set(time.monotonic() + seconds if seconds > 0 else None)
+
+
+def _call_timeout():
+    """Seconds left for the next call and which deadline bounds it ("section" or "report")"""
+    timeout, scope = (SECTION_DEADLINE, "section") if SECTION_DEADLINE > 0 else (None, None)
+    deadline = _report_deadline.get()
+    if deadline is not None:
+        remaining = max(0.0, deadline - time.monotonic())
+        if timeout is None or remaining < timeout:
+            timeout, scope = remaining, "report"
+    return timeout, scope
+
+
+_router = None
+
+
+def get_router():
+    """The process-wide key/model router, built on first use so .env has been loaded"""
+    global _router
+    if _router is None:
+        _router = routing.open_default_router(DEFAULT_MODEL)
+    return _router
+
+
+def get_model(model_name: str = None):
+    """Handle for `model_name` (LLM_MODEL by default) whose calls are routed across the key pool"""
+    router = get_router()
+    return routing.RoutedModel(router, model_name or router.default_model)
+
+
+def get_model_for(quality: str):
+    """The model reports of this quality are generated with"""
+    if quality == "draft":
+        return get_model(os.getenv("LLM_DRAFT_MODEL") or get_router().fast_model)
+    return get_model()
+
+
+def _count_tokens(response, prompt: str, text: str):
+    """(prompt, response) token counts from the response's usage data, else estimated"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None and getattr(usage, "prompt_token_count", None):
+        return usage.prompt_token_count, getattr(usage, "candidates_token_count", 0) or 0
+    return math.ceil(len(prompt) / 4), math.ceil(len(text) / 4)
+
+
+async def _generate(model, section: str, prompt: str, attrs: dict):
+    """One rate-limited model call, hedged with a duplicate once it passes the section's p95"""
+    await rate_limiter.acquire()
+    calls = [asyncio.ensure_future(model.generate_content_async(prompt, section=section))]
+    try:
+        hedge_after = latency_tracker.p95(section) if HEDGE_ENABLED else None
+        if hedge_after is not None:
+            done, _ = await asyncio.wait(calls, timeout=hedge_after / 1000)
+            if not done:
+                await rate_limiter.acquire()
+            if not calls[0].done():
+                calls.append(asyncio.ensure_future(model.generate_content_async(prompt, section=section)))
+                attrs["hedged_after_ms"] = round(hedge_after, 1)
+
+        pending = set(calls)
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((call for call in calls if call in done and call.exception() is None), None)
+            if winner is not None or not pending:
+                break
+        if len(calls) > 1:
+            label = "none" if winner is None else ("hedge" if winner is calls[1] else "primary")
+            LLM_HEDGES.inc(section=section, winner=label)
+            attrs["hedge_winner"] = label
+        if winner is None:
+            raise calls[0].exception()
+        return winner.result()
+    finally:
+        for call in calls:
+            call.cancel()
+
+
+def flight_key(model_name: str, section: str, prompt: str) -> str:
+    """Identity of a call: model, section and the prompt with whitespace collapsed"""
+    normalized = " ".join(prompt.split())
+    return hashlib.sha256(f"{model_name}\0{section}\0{normalized}".encode("utf-8", "surrogatepass")).hexdigest()
+
+
+async def ask(model, section: str, prompt: str, timings: dict = None) -> str:
+    """
+    Send a single prompt to the model under the shared rate limit, the
+    per-call deadline and the current report deadline (raises TimeoutError).
+    Raises CircuitOpenError without calling the model while the breaker is open.
+    If a timings dict is given, the call's duration (ms) is stored under `section`.
+
+    A call identical to one already in flight waits for that call's response
+    instead. Every caller waits only until its own deadline, while the shared
+    request runs until the latest deadline of the callers waiting on it, so a
+    caller with more time left is not failed by an earlier one's deadline. The
+    shared request is cancelled only once every caller waiting on it has gone.
+    """
+    key = flight_key(model.model_name, section, prompt)
+    start = time.perf_counter()
+    timeout, scope = _call_timeout()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    flight = _in_flight.get(key)
+    if flight is None:
+        flight = _in_flight[key] = {"waiters": 0, "deadline": deadline, "scope": scope}
+        task = flight["task"] = asyncio.ensure_future(_ask(model, section, prompt, flight))
+        task.add_done_callback(lambda _: _in_flight.pop(key, None) if _in_flight.get(key) is flight else None)
+    else:
+        LLM_COALESCED.inc(section=section)
+        logger.info(f"Joining in-flight {section} call")
+        if flight["deadline"] is not None and (deadline is None or deadline > flight["deadline"]):
+            flight["deadline"], flight["scope"] = deadline, scope
+    flight["waiters"] += 1
+    try:
+        try:
+            text = await asyncio.wait_for(asyncio.shield(flight["task"]), timeout)
+        except asyncio.TimeoutError:
+            # The shared call counts its own expiry; this is only this caller giving up
+            if not flight["task"].done():
+                LLM_DEADLINE_EXPIRIES.inc(section=section, scope=scope)
+            raise
+    finally:
+        flight["waiters"] -= 1
+        if flight["waiters"] == 0 and not flight["task"].done():
+            flight["task"].cancel()
+    if timings is not None:
+        timings[section] = round((time.perf_counter() - start) * 1000, 1)
+    return text
+
+
+async def _until_flight_deadline(coro, flight: dict):
+    """Await `coro`, giving up at flight["deadline"], which callers joining later may push back"""
+    call = asyncio.ensure_future(coro)
+    try:
+        while True:
+            deadline = flight["deadline"]
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, _ = await asyncio.wait({call}, timeout=timeout)
+            if done:
+                return call.result()
+            if flight["deadline"] == deadline:
+                raise asyncio.TimeoutError()
+    finally:
+        call.cancel()
+
+
+async def _ask(model, section: str, prompt: str, flight: dict) -> str:
+    trial = llm_breaker.acquire()
+    start = time.perf_counter()
+    with span(f"llm.{section}", model=model.model_name, prompt_chars=len(prompt)) as attrs:
+        try:
+            response = await _until_flight_deadline(_generate(model, section, prompt, attrs), flight)
+            text = response.text if response.text else ""
+        except asyncio.CancelledError:
+            llm_breaker.release(trial)
+            raise
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                LLM_DEADLINE_EXPIRIES.inc(section=section, scope=flight["scope"])
+                attrs["deadline_expired"] = flight["scope"]
+            llm_breaker.record(trial, False, (time.perf_counter() - start) * 1000)
+            raise
+        attrs["response_chars"] = len(text)
+        prompt_tokens, response_tokens = _count_tokens(response, prompt, text)
+        attrs["prompt_tokens"], attrs["response_tokens"] = prompt_tokens, response_tokens
+    quality = _quality.get()
+    LLM_TOKENS.inc(prompt_tokens, section=section, quality=quality, direction="prompt")
+    LLM_TOKENS.inc(response_tokens, section=section, quality=quality, direction="response")
+    elapsed = (time.perf_counter() - start) * 1000
+    llm_breaker.record(trial, True, elapsed)
+    latency_tracker.record(section, elapsed)
+    LLM_LATENCY.observe(elapsed, section=section)
+    return text
+
+
+async def analyse_code(data, model, timings: dict = None, reuse: bool = True) -> str:
+    """
+    Ask for the code/output analysis. With `reuse`, an analysis of the same
+    code and output produced in the last ANALYSIS_REUSE_SECONDS is returned
+    without calling the model.
+    """
+    output = data.result.codeOutput if data.result and data.result.codeOutput else 'No output provided'
+    _quality.set(quality_of(data))
+    if quality_of(data) == "draft":
+        prompt = DRAFT_ANALYSIS_PROMPT.format(code=prompt_code(data), output=output[:DRAFT_OUTPUT_CHARS])
+    else:
+        prompt = ANALYSIS_PROMPT.format(code=data.projectCode, output=output)
+    key = flight_key(model.model_name, "analysis", prompt)
+    now = time.monotonic()
+    while _recent_analyses and next(iter(_recent_analyses.values()))[0] <= now:
+        _recent_analyses.popitem(last=False)
+    if reuse and key in _recent_analyses:
+        ANALYSIS_REUSED.inc()
+        if timings is not None:
+            timings["analysis"] = 0.0
+        return _recent_analyses[key][1]
+
+    text = await ask(model, "analysis", prompt, timings)
+    if text and ANALYSIS_REUSE_SECONDS > 0:
+        _recent_analyses.pop(key, None)
+        _recent_analyses[key] = (time.monotonic() + ANALYSIS_REUSE_SECONDS, text)
+        if len(_recent_analyses) > MAX_RECENT_ANALYSES:
+            _recent_analyses.popitem(last=False)
+    return text
+
+
+async def generate_code_analysis(data, model, timings: dict = None, reuse: bool = True) -> str:
+    """Analyse the project code and its output for the Results section"""
+    try:
+        text = await analyse_code(data, model, timings, reuse)
+        return text if text else "AI analysis could not be generated."
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        logger.exception(f"Error generating AI content: {e}")
+        return "Error generating code and output analysis."
+
+
+async def generate_section(data, model, name: str, title: str, timings: dict = None) -> str:
+    """Generate one body section; failures leave the section empty unless the breaker is open"""
+    _quality.set(quality_of(data))
+    prompts = DRAFT_SECTION_PROMPTS if quality_of(data) == "draft" else SECTION_PROMPTS
+    prompt = prompts[name].format(description=data.projectDescription, code=prompt_code(data))
+    try:
+        return await ask(model, name, f"Project title: {title}\n\n{prompt}", timings)
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        logger.exception(f"Error generating {name}: {e}")
+        return ""
+
+
+async def generate_title(data, model, timings: dict = None) -> str:
+    _quality.set(quality_of(data))
+    return await ask(model, "title", TITLE_PROMPT.format(description=data.projectDescription, code=prompt_code(data)), timings)
+
+
+async def generate_sections(data, model, timings: dict = None) -> dict:
+    """
+    Generate the title and every body section for a report (for drafts, only
+    DRAFT_SECTIONS; the rest are set to DRAFT_PLACEHOLDER).
+
+    Returns:
+        dict keyed by "title" and each name in SECTION_NAMES
+    """
+    title = await generate_title(data, model, timings)
+    names = [name for name in SECTION_NAMES if quality_of(data) == "final" or name in DRAFT_SECTIONS]
+    texts = await asyncio.gather(*(generate_section(data, model, name, title, timings) for name in names))
+    sections = {"title": title, **{name: DRAFT_PLACEHOLDER for name in SECTION_NAMES}}
+    sections.update(zip(names, texts))
+    return sections
+
+
+async def regenerate_section(data, model, name: str, sections: dict, timings: dict = None) -> str:
+    """Generate a fresh version of one section, reusing the stored title for context"""
+    if name == "title":
+        return await generate_title(data, model, timings)
+    if name == "analysis":
+        return await generate_code_analysis(data, model, timings, reuse=False)
+    return await generate_section(data, model, name, sections["title"], timings)
@@ -0,0 +1,90 @@
+"""
+Result images prepared while the LLM calls run.
+
+Reading, hashing and parsing the uploaded result images does not depend on
+any generated text, so report generation starts it in worker threads as soon
+as the report gets its admission slot (not while it is queued, so waiting
+reports hold no image data). The renderer then embeds the prepared in-memory
+images (see report.add_prepared_picture) instead of opening each file after
+every LLM call has finished. Images that could not be prepared are left to the renderer,
+which reads them from disk as before and logs the failure.
+
+Prepared images are held in memory until the report is rendered, so only the
+first `memory_budget` bytes of a report's images (see
+memory.REPORT_IMAGE_MEMORY_BYTES) are prepared. The rest stay in their files
+and are read while rendering.
+"""
+import asyncio
+import logging
+import os
+from typing import NamedTuple
+
+import metrics
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Result images are shown 2.5 inches wide (in EMU)
+RESULT_IMAGE_WIDTH = 2286000
+
+LEFT_ON_DISK = metrics.counter(
+    "zap_report_image_bytes_left_on_disk_total",
+    "Result image bytes not prepared in memory because the report's image memory budget was used",
+)
+
+
+class PreparedImage(NamedTuple):
+    image: object  # docx.image.image.Image with its blob loaded and hashed
+    cx: int
+    cy: int
+
+
+def prepare_image(path: str) -> PreparedImage:
+    """Load and parse one image and compute its embedded size; blocking"""
+    # python-docx is only imported once a report with images is generated
+    from docx.image.image import Image
+
+    with span("image.prepare", filename=os.path.basename(path)) as attrs:
+        image = Image.from_file(path)
+        image.sha1  # lazily computed; hashed here so the renderer does not have to
+        attrs["bytes"] = len(image.blob)
+        cx, cy = image.scaled_dimensions(RESULT_IMAGE_WIDTH)
+    return PreparedImage(image, cx, cy)
+
+
+def start_preparing(filenames, images_dir: str, memory_budget: int = None) -> dict:
+    """
+    Start preparing each image in a worker thread, skipping images that would
+    take the total over `memory_budget` bytes; returns filename -> task
+    """
+    tasks = {}
+    used = 0
+    for name in dict.fromkeys(filenames or []):
+        path = os.path.join(images_dir, name)
+        if memory_budget is not None:
+            size = os.path.getsize(path) if os.path.isfile(path) else 0
+            if used + size > memory_budget:
+                LEFT_ON_DISK.inc(size)
+                continue
+            used += size
+        tasks[name] = asyncio.ensure_future(asyncio.to_thread(prepare_image, path))
+    return tasks
+
+
+async def collect(tasks: dict) -> dict:
+    """Prepared images by filename, leaving out any that failed"""
+    prepared = {}
+    for name, task in tasks.items():
+        try:
+            prepared[name] = await task
+        except Exception as e:
+            logger.warning(f"Could not prepare image {name}: {e}")
+    return prepared
+
+
+def cancel(tasks: dict):
+    """Drop preparations that are no longer needed (threads already running finish on their own)"""
+    for task in tasks.values():
+        task.cancel()
+        # Their results and errors are not wanted any more
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
@@ -1,33 +1,35 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request
+from typing import List
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-from typing import List, Optional, Union
-import google.generativeai as genai
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
 import os
-from docx import Document
-from docx.shared import Pt, RGBColor, Inches
-from docx.enum.table import WD_ALIGN_VERTICAL, WD_TABLE_ALIGNMENT
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn, nsdecls
-from docx.oxml import ns
-import datetime
 import shutil
 from dotenv import load_dotenv
-from fastapi.staticfiles import StaticFiles
-import pymongo
-from pymongo.server_api import ServerApi
-from collections import OrderedDict
 import uuid
-import imghdr
-from PIL import Image
+import time
 import asyncio
+import hmac
 import logging
-import json
+import math
+from email.utils import parsedate_to_datetime
+from tracing import configure_logging, start_request, bind_session, current_request_id, session_id_var, span
+import metrics
+from models import ProjectResult, ProjectData, SectionUpdate, PrepareRequest, apply_report_defaults
+from generation import PROMPT_VERSION, REGENERABLE_SECTIONS, get_model_for, start_report_deadline, llm_breaker, CircuitOpenError, analyse_code, generate_code_analysis, generate_sections, regenerate_section
+from drafts import open_default_store
+from artifacts import open_default_store as open_artifact_store, parse_range, iter_file_range
+from professors import ProfessorDirectory
+from thumbnails import ThumbnailCache, cache_control_for
+from admission import QueueFullError, open_default_controller
+from routing import configured_keys
+from preparation import PreparationLimitError, inputs_key, open_default_store as open_preparation_store
+from preview import render_preview_html
+import image_prep
+import memory
+from profiling import open_default_profiler
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+configure_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
@@ -41,8 +43,93 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Report-ID", "X-Profile-ID", "ETag", "Content-Range", "Accept-Ranges"],
 )
 
+class LimitBodySize:
+    """
+    Refuse request bodies over the memory budget (see memory.py) with 413:
+    up front from Content-Length when it is sent, otherwise as soon as the
+    bytes received pass the limit, so chunked bodies cannot grow unbounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = Request(scope).headers
+        content_type = headers.get("content-type", "")
+        content_length = headers.get("content-length", "")
+        try:
+            memory.check_body_size(content_type, int(content_length) if content_length.isdigit() else 0)
+        except memory.InputTooLargeError as e:
+            return await JSONResponse(status_code=413, content={"detail": str(e)})(scope, receive, send)
+
+        received = 0
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                try:
+                    memory.check_body_size(content_type, received)
+                except memory.InputTooLargeError as e:
+                    # Raised while the handler reads its body; FastAPI turns it into the response
+                    raise HTTPException(status_code=413, detail=str(e))
+            return message
+
+        await self.app(scope, counting_receive, send)
+
+app.add_middleware(LimitBodySize)
+
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """Assign a request ID, bind the session and time the whole request"""
+    request_id = start_request(
+        request.headers.get("X-Request-ID"),
+        request.query_params.get("session_id"),
+    )
+    with span("http.request", method=request.method, path=request.url.path) as attrs:
+        response = await call_next(request)
+        attrs["status_code"] = response.status_code
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+# Opt-in request profiling (see profiling.py). The middleware is only
+# registered when enabled; added after request_context, it wraps it and reads
+# the request ID from the response.
+profiler = open_default_profiler()
+
+if profiler is not None:
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        """Sample the stacks of requests sent with a valid X-Profile token"""
+        if not profiler.authorized(request.headers.get("X-Profile", "")):
+            return await call_next(request)
+        sampler = profiler.start()
+        if sampler is None:
+            logger.warning(f"Not profiling {request.url.path}: another profile is in progress")
+            return await call_next(request)
+        started = time.perf_counter()
+        try:
+            response = await call_next(request)
+        except BaseException:
+            await asyncio.to_thread(profiler.abort, sampler)
+            raise
+        profile_id = await asyncio.to_thread(
+            profiler.finish,
+            sampler,
+            response.headers.get("X-Request-ID", uuid.uuid4().hex),
+            request.method,
+            request.url.path,
+            (time.perf_counter() - started) * 1000,
+        )
+        response.headers["X-Profile-ID"] = profile_id
+        return response
+
 # Get the absolute path to the current directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -51,6 +138,7 @@ reports_dir = os.path.join(current_dir, "reports")
 uploads_dir = os.path.join(current_dir, "uploads")
 os.makedirs(reports_dir, exist_ok=True)
 os.makedirs(uploads_dir, exist_ok=True)
+logo_path = os.path.join(current_dir, "logo.jpg")
 
 # Constants for file validation
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
@@ -59,23 +147,361 @@ MAX_IMAGES_PER_USER = 10
 
 # Session tracking
 active_sessions = {}
+# Image slots held by uploads still being validated, per session
+pending_uploads = {}
+
+# Generated reports are kept in the draft store so sections can be fetched,
+# edited, regenerated and re-rendered. Each report records the result images it
+# embeds; an upload is deleted once neither its session nor any stored report uses it.
+MAX_STORED_REPORTS = int(os.getenv("MAX_STORED_REPORTS", "500"))
+draft_store = open_default_store()
+
+# Rendered .docx files, downloadable by report ID until they expire or are
+# evicted to stay under the disk quota (a draft can always be re-rendered)
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+ARTIFACT_CLEAN_INTERVAL = float(os.getenv("ARTIFACT_CLEAN_INTERVAL_SECONDS", "300"))
+
+# Optional size optimisation of rendered reports (see docx_optimizer.py)
+DOCX_OPTIMIZE = os.getenv("DOCX_OPTIMIZE", "0") == "1"
+DOCX_IMAGE_DPI = int(os.getenv("DOCX_IMAGE_DPI", "220"))
+DOCX_BYTES_SAVED = metrics.counter("zap_docx_optimize_bytes_saved_total", "Bytes removed from rendered reports by the optimizer")
+artifact_store = open_artifact_store(reports_dir)
+background_tasks = set()
+
+# Resized previews of uploads, generated on demand and kept under a size limit
+thumbnail_cache = ThumbnailCache(
+    uploads_dir,
+    os.path.join(current_dir, "thumbnails"),
+    int(float(os.getenv("THUMBNAIL_CACHE_MB", "200")) * 1024 * 1024),
+)
 
-# Add this after your app initialization
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# In-flight report generations by request ID, so they can be cancelled when
+# the client disconnects or explicitly asks for it. Each job waits for an
+# admission slot first; slots are shared fairly between sessions/clients.
+generation_jobs = {}
+admission = open_default_controller()
+GENERATION_CANCELLATIONS = metrics.counter(
+    "zap_generation_cancellations_total",
+    "Report generations cancelled before completion",
+    ["reason", "stage"],
+)
+GENERATION_JOBS_IN_FLIGHT = metrics.gauge("zap_generation_jobs_in_flight", "Report generations currently running")
+GENERATION_LLM_MS = metrics.histogram("zap_generation_llm_ms", "Time a report spends on LLM calls, by quality", ["quality"])
+
+# Sections generated speculatively from the description and code while the
+# rest of the form is filled in (see preparation.py)
+preparations = open_preparation_store()
+
+def cancel_job(job, reason: str) -> bool:
+    """Cancel a generation job; returns False if it already finished or was cancelled"""
+    if job["task"].done() or job["reason"] is not None:
+        return False
+    job["reason"] = reason
+    job["task"].cancel()
+    return True
+
+async def watch_disconnect(request: Request, job):
+    """
+    Cancel the job as soon as the client that started it goes away. The body
+    has already been read, so the only message left to receive is the disconnect;
+    waiting on it (rather than polling) also keeps the server reading the socket.
+    """
+    while not job["task"].done():
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            cancel_job(job, "client_disconnect")
+            return
+
+# Reverse proxies (comma-separated IPs) whose X-Forwarded-For is believed when
+# telling clients apart; without them the socket's peer address is used
+TRUSTED_PROXIES = {ip.strip() for ip in os.getenv("TRUSTED_PROXIES", "").split(",") if ip.strip()}
+
+def client_ip(request: Request) -> str:
+    """
+    The client's address. X-Forwarded-For is only honoured when the request
+    comes from a trusted proxy, taking the nearest hop the proxies did not add,
+    so clients cannot pick their own address by sending the header.
+    """
+    host = request.client.host if request.client else "unknown"
+    if host not in TRUSTED_PROXIES:
+        return host
+    for hop in reversed(request.headers.get("x-forwarded-for", "").split(",")):
+        hop = hop.strip()
+        if hop and hop not in TRUSTED_PROXIES:
+            return hop
+    return host
+
+def client_key(request: Request) -> str:
+    """Who a request is scheduled as: its session if it has a live one, otherwise its IP"""
+    session_id = session_id_var.get()
+    if session_id and session_id in active_sessions:
+        return f"session:{session_id}"
+    return f"ip:{client_ip(request)}"
+
+async def run_admitted(job, work):
+    async with admission.slot(job["client"]):
+        return await work(job)
+
+async def run_cancellable(request: Request, work):
+    """
+    Run `work(job)` as a cancellable job keyed by the request ID, once an
+    admission slot is free. The work updates job["stage"] as it goes so
+    cancellations can be attributed. Cancelled jobs (queued or running) stop
+    their pending LLM calls, skip rendering and answer 499; when the queue is
+    full the request is shed with 503.
+    """
+    job = {"id": current_request_id(), "session_id": session_id_var.get(), "client": client_key(request),
+           "cancel_token": request.headers.get("X-Cancel-Token"), "stage": "queued", "reason": None}
+    if job["id"] in generation_jobs:
+        # The ID is the handle for cancelling; a second job must not take it over
+        raise HTTPException(status_code=409, detail="A generation with this X-Request-ID is already running")
+    job["task"] = asyncio.create_task(run_admitted(job, work))
+    generation_jobs[job["id"]] = job
+    GENERATION_JOBS_IN_FLIGHT.inc()
+    watcher = asyncio.create_task(watch_disconnect(request, job))
+    try:
+        return await job["task"]
+    except asyncio.CancelledError:
+        if job["reason"] is None:
+            raise
+        GENERATION_CANCELLATIONS.inc(reason=job["reason"], stage=job["stage"])
+        logger.info(f"Generation {job['id']} cancelled ({job['reason']}) during {job['stage']}")
+        raise HTTPException(status_code=499, detail="Report generation cancelled")
+    except QueueFullError as e:
+        logger.warning(f"Shedding generation {job['id']} from {job['client']}: queue full")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+    finally:
+        watcher.cancel()
+        GENERATION_JOBS_IN_FLIGHT.dec()
+        if generation_jobs.get(job["id"]) is job:
+            del generation_jobs[job["id"]]
+
+def llm_unavailable(error: CircuitOpenError):
+    """503 telling the client when the LLM circuit breaker will let calls through again"""
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))},
+    )
+
+def remove_uploaded_images(filenames):
+    """Delete uploaded images from disk"""
+    for filename in filenames:
+        file_path = os.path.join(uploads_dir, filename)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+            logger.info(f"Cleaned up session image: {filename}")
+        thumbnail_cache.discard(filename)
+
+def remove_unowned_images(filenames):
+    """
+    Delete the given uploads unless an active session or a stored report still
+    owns them. An image can be shared by its session and any number of reports
+    generated from it; it is removed once the last of them lets go.
+    """
+    filenames = set(filenames)
+    filenames -= {name for images in active_sessions.values() for name in images}
+    filenames -= draft_store.images_in_use(filenames)
+    remove_uploaded_images(filenames)
 
 def cleanup_session_images(session_id: str):
     """Clean up images for a specific session"""
     try:
         if session_id in active_sessions:
-            for filename in active_sessions[session_id]:
-                file_path = os.path.join(uploads_dir, filename)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    logger.info(f"Cleaned up session image: {filename}")
-            del active_sessions[session_id]
+            remove_unowned_images(active_sessions.pop(session_id))
     except Exception as e:
         logger.error(f"Error cleaning up session images: {str(e)}")
 
+def store_generated_report(report_id: str, data: ProjectData, sections: dict, artifact: dict,
+                           session_id: str = None, timings: dict = None, model_name: str = None):
+    """Persist a report's inputs and section text, evicting the oldest reports"""
+    # The report owns the result images it embeds, shared with the session that
+    # uploaded them; the session keeps tracking its uploads (and its limit) until it ends
+    images = list(dict.fromkeys(data.result.resultImages or [])) if data.result else []
+    sections = dict(sections)
+    if data.result and isinstance(data.result.aiGeneratedContent, str) and data.result.aiGeneratedContent:
+        sections["analysis"] = data.result.aiGeneratedContent
+    draft_store.create_report(
+        report_id, data, sections,
+        model=model_name, prompt_version=PROMPT_VERSION,
+        images=images, timings=timings, report_path=artifact["path"], session_id=session_id,
+    )
+    for evicted in draft_store.evict_oldest(MAX_STORED_REPORTS):
+        try:
+            remove_unowned_images(evicted["images"])
+            artifact_store.delete(evicted["id"])
+        except Exception as e:
+            logger.error(f"Error evicting stored report: {str(e)}")
+
+def get_draft_or_404(report_id: str):
+    draft = draft_store.get_report(report_id)
+    if draft is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return draft
+
+def draft_render_inputs(draft):
+    """Rebuild the renderer inputs (data with analysis applied, section texts) from a stored draft"""
+    data = draft["data"]
+    sections = {name: section["text"] for name, section in draft["sections"].items()}
+    if "analysis" in sections and data.result:
+        data.result.aiGeneratedContent = sections["analysis"]
+    return data, sections
+
+def check_section_name(section_name: str):
+    if section_name not in REGENERABLE_SECTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown section. Choose one of: {', '.join(REGENERABLE_SECTIONS)}"
+        )
+
+def check_input_limits(data, images_dir: str = None):
+    """413 for inputs over the per-report memory budget (see memory.py)"""
+    try:
+        memory.check_inputs(data, images_dir)
+    except memory.InputTooLargeError as e:
+        logger.warning(f"Rejected oversized input ({e.limit}): {e}")
+        raise HTTPException(status_code=413, detail=str(e))
+
+def render_docx(data: ProjectData, sections: dict, path: str, images: dict = None):
+    """Render (and with DOCX_OPTIMIZE=1, shrink) a report; blocking, runs in a worker thread"""
+    # python-docx/lxml are only imported once the first report is rendered
+    from report import create_project_report
+
+    with memory.track("render"):
+        create_project_report(data, sections, path, images)
+    if DOCX_OPTIMIZE:
+        from docx_optimizer import optimize_docx
+
+        with span("docx.optimize") as attrs:
+            result = optimize_docx(path, image_dpi=DOCX_IMAGE_DPI)
+            attrs.update(result)
+        DOCX_BYTES_SAVED.inc(result["saved"])
+        logger.info(f"Optimized report: {result['before']} -> {result['after']} bytes ({result['saved']} saved)")
+
+async def render_report(report_id: str, data: ProjectData, sections: dict, images: dict = None):
+    """
+    Render in a worker thread so the event loop keeps serving other requests,
+    then publish the result to the artifact store. Returns (artifact, render ms).
+    `images` are result images already prepared by image_prep.
+    """
+    temp_path = artifact_store.new_temp_path(report_id)
+    with span("docx.render"):
+        start = time.perf_counter()
+        render = asyncio.ensure_future(asyncio.to_thread(render_docx, data, sections, temp_path, images))
+        try:
+            await asyncio.shield(render)
+        except BaseException:
+            # The worker thread cannot be interrupted; drop its output once it finishes
+            render.add_done_callback(lambda _: os.path.exists(temp_path) and os.remove(temp_path))
+            raise
+        artifact = await asyncio.to_thread(artifact_store.commit, report_id, temp_path, "output-report.docx")
+        return artifact, round((time.perf_counter() - start) * 1000, 1)
+
+def artifact_headers(artifact: dict):
+    return {
+        "X-Report-ID": artifact["id"],
+        "ETag": artifact["etag"],
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-cache",
+    }
+
+def report_response(artifact: dict):
+    return FileResponse(
+        artifact["path"],
+        media_type=DOCX_MEDIA_TYPE,
+        filename=artifact["filename"],
+        headers=artifact_headers(artifact),
+    )
+
+async def clean_artifacts_periodically():
+    """Expire old artifacts and enforce the disk quota in the background"""
+    while True:
+        await asyncio.sleep(ARTIFACT_CLEAN_INTERVAL)
+        try:
+            await asyncio.to_thread(artifact_store.cleanup)
+        except Exception as e:
+            logger.error(f"Error cleaning report artifacts: {str(e)}")
+
+@app.on_event("startup")
+async def start_artifact_cleaner():
+    task = asyncio.create_task(clean_artifacts_periodically())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+def not_modified(request: Request, headers) -> bool:
+    """Whether the request's If-None-Match / If-Modified-Since validators match the response headers"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or headers.get("etag") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    last_modified = headers.get("last-modified")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+@app.api_route("/uploads/{filename}", methods=["GET", "HEAD"])
+async def get_upload(filename: str, request: Request, w: int = None):
+    """
+    Serve an uploaded image, or a cached thumbnail variant with ?w=<width>.
+    UUID-named uploads never change, so they are served as immutable.
+    Conditional requests get 304 from the ETag / Last-Modified validators.
+    """
+    if filename != os.path.basename(filename) or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="Not found")
+    path = os.path.join(uploads_dir, filename)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    if w is not None:
+        if w <= 0:
+            raise HTTPException(status_code=400, detail="Width must be positive")
+        try:
+            with span("image.thumbnail", filename=filename, width=w):
+                path = await thumbnail_cache.get(filename, w)
+        except Exception as e:
+            logger.error(f"Error creating thumbnail for {filename}: {str(e)}")
+            raise HTTPException(status_code=400, detail="Could not create thumbnail")
+
+    response = FileResponse(path, stat_result=os.stat(path), headers={"Cache-Control": cache_control_for(filename)})
+    if not_modified(request, response.headers):
+        validators = ("etag", "last-modified", "cache-control")
+        return Response(status_code=304, headers={k: v for k, v in response.headers.items() if k in validators})
+    return response
+
+@app.get("/api/health")
+async def health():
+    """Liveness check; does not touch the LLM, the renderer or any heavy imports"""
+    return {"status": "ok"}
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Counters and histograms in Prometheus text format"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def may_cancel(job, request: Request, session_id: str = None) -> bool:
+    """Only the job's session, or a caller with the X-Cancel-Token it was started with, may cancel it"""
+    if job["session_id"] and session_id and hmac.compare_digest(job["session_id"].encode(), session_id.encode()):
+        return True
+    token = request.headers.get("X-Cancel-Token")
+    return bool(job["cancel_token"] and token) and hmac.compare_digest(job["cancel_token"].encode(), token.encode())
+
+@app.post("/api/jobs/{request_id}/cancel")
+async def cancel_generation(request_id: str, request: Request, session_id: str = None):
+    """
+    Cancel a queued or running generation by the X-Request-ID it was started
+    with. Requires its session_id, or the X-Cancel-Token sent with it.
+    """
+    job = generation_jobs.get(request_id)
+    if job is None or not may_cancel(job, request, session_id):
+        raise HTTPException(status_code=404, detail="No running generation with this request ID")
+    if not cancel_job(job, "explicit"):
+        return {"status": "finished"}
+    return {"status": "cancelled", "stage": job["stage"]}
+
 @app.post("/api/start-session")
 async def start_session():
     """Start a new session and return session ID"""
@@ -86,6 +512,7 @@ async def start_session():
 @app.post("/api/end-session/{session_id}")
 async def end_session(session_id: str):
     """End a session and cleanup its images"""
+    bind_session(session_id)
     cleanup_session_images(session_id)
     return {"status": "success"}
 
@@ -106,309 +533,244 @@ def validate_image(file: UploadFile):
     if size > MAX_FILE_SIZE:
         raise HTTPException(status_code=400, detail="File too large. Maximum size is 5MB.")
 
-@app.post("/api/upload-image")
-async def upload_image(file: UploadFile = File(...), session_id: str = None):
-    try:
-        # Validate image
-        validate_image(file)
+def save_uploaded_image(file: UploadFile) -> str:
+    """Validate, store and verify one uploaded image (blocking); returns the stored file name"""
+    validate_image(file)
 
-        # Generate unique filename
-        unique_filename = generate_unique_filename(file.filename)
-        file_path = os.path.join(uploads_dir, unique_filename)
+    # Generate unique filename
+    unique_filename = generate_unique_filename(file.filename)
+    file_path = os.path.join(uploads_dir, unique_filename)
 
-        # Save the uploaded file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+    # Save the uploaded file
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
 
-        # Verify the saved image is valid
-        try:
+    # Verify the saved image is valid
+    try:
+        from PIL import Image
+
+        with span("image.verify", filename=unique_filename):
             with Image.open(file_path) as img:
                 img.verify()  # Verify it's a valid image
-        except Exception as e:
-            os.remove(file_path)  # Remove invalid image
-            raise HTTPException(status_code=400, detail="Invalid or corrupted image file")
+    except Exception:
+        os.remove(file_path)  # Remove invalid image
+        raise HTTPException(status_code=400, detail="Invalid or corrupted image file")
+    return unique_filename
 
-        # Track the image in the session
-        if session_id and session_id in active_sessions:
-            active_sessions[session_id].append(unique_filename)
+def reserve_image_slots(session_id: str, wanted: int) -> int:
+    """
+    Reserve up to `wanted` of the session's MAX_IMAGES_PER_USER image slots and
+    return how many were granted. Runs without awaiting, so concurrent uploads
+    for one session cannot both see the same free slots.
+    """
+    if not session_id or session_id not in active_sessions:
+        return wanted
+    used = len(active_sessions[session_id]) + pending_uploads.get(session_id, 0)
+    granted = max(0, min(wanted, MAX_IMAGES_PER_USER - used))
+    if granted:
+        pending_uploads[session_id] = pending_uploads.get(session_id, 0) + granted
+    return granted
+
+def release_image_slots(session_id: str, count: int, stored_names: List[str]):
+    """Give back reserved slots, tracking the images that were stored in the session"""
+    if session_id and session_id in pending_uploads:
+        pending_uploads[session_id] -= count
+        if pending_uploads[session_id] <= 0:
+            del pending_uploads[session_id]
+    if session_id and session_id in active_sessions:
+        active_sessions[session_id].extend(stored_names)
 
+@app.post("/api/upload-image")
+async def upload_image(file: UploadFile = File(...), session_id: str = None):
+    if not reserve_image_slots(session_id, 1):
+        raise HTTPException(status_code=400, detail=f"Image limit reached ({MAX_IMAGES_PER_USER} per session)")
+    stored = []
+    try:
+        unique_filename = await asyncio.to_thread(save_uploaded_image, file)
+        stored.append(unique_filename)
         return {"filename": unique_filename}
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error uploading image: {str(e)}")
+        logger.exception(f"Error uploading image: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # Track the image in the session
+        release_image_slots(session_id, 1, stored)
 
-class TeamMember(BaseModel):
-    name: str
-    rollNumber: str
-    gender: str
-
-class ProjectResult(BaseModel):
-    resultImages: Optional[List[str]] = None
-    codeOutput: Optional[str] = None
-    aiGeneratedContent: Optional[Union[str, bool]] = None
-
-class ProjectData(BaseModel):
-    projectDescription: str
-    projectCode: str
-    department: str
-    mainProfessor: str
-    mainProfessor_designation: str
-    professorDepartment: str
-    secondaryProfessor: Optional[str] = None
-    secondaryProfessor_designation: Optional[str] = None
-    course: str
-    teamMembers: List[TeamMember]
-    result: Optional[ProjectResult] = None
-
-# Function to fetch professor details from MongoDB
-'''def get_professor_details_from_db(professor_name: str):
-    professor_document = professor_collection.find_one({"name": professor_name})
-    if professor_document:
-        return professor_document.get("designation")
-    else:
-        return None '''
-
-def add_page_border(section):
-    """
-    Add a border around the page by modifying the section's XML.
-    """
-    sectPr = section._sectPr
-    if sectPr is None:
-        sectPr = OxmlElement('w:sectPr')
-        section._element.append(sectPr)
-
-    pgBorders = OxmlElement("w:pgBorders")
-    pgBorders.set(ns.qn('w:offsetFrom'), 'page')  # Ensure border is relative to page edge
-
-    # Set border attributes
-    for border in ["top", "left", "bottom", "right"]:
-        border_element = OxmlElement(f"w:{border}")
-        border_element.set(ns.qn("w:val"), "single")  # Single line border
-        border_element.set(ns.qn("w:sz"), "6")  # Border size (in eighths of a point)
-        border_element.set(ns.qn("w:space"), "24")  # Space between border and content in points
-        border_element.set(ns.qn("w:color"), "000000")  # Black color
-        pgBorders.append(border_element)
-
-    sectPr.append(pgBorders)
-
-def add_page_number(paragraph):
+@app.post("/api/upload-images")
+async def upload_images(files: List[UploadFile] = File(...), session_id: str = None):
     """
-    Add a centered page number to a paragraph.
+    Upload several images in one request. Files are validated and verified in
+    parallel; each gets its own result, so one bad file does not fail the rest.
+    Files beyond the session's remaining image slots are rejected.
     """
-    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-    page_num_run = paragraph.add_run()
-    fldChar1 = OxmlElement('w:fldChar')
-    fldChar1.set(qn('w:fldCharType'), 'begin')
-    instrText = OxmlElement('w:instrText')
-    instrText.set(qn('xml:space'), 'preserve')
-    instrText.text = 'PAGE'
-    fldChar2 = OxmlElement('w:fldChar')
-    fldChar2.set(qn('w:fldCharType'), 'end')
-    page_num_run._r.append(fldChar1)
-    page_num_run._r.append(instrText)
-    page_num_run._r.append(fldChar2)
-
-def format_text_content(doc, text_content):
+    granted = reserve_image_slots(session_id, min(len(files), MAX_IMAGES_PER_USER))
+    accepted = files[:granted]
+    results = []
+    stored = []
+    try:
+        outcomes = await asyncio.gather(
+            *(asyncio.to_thread(save_uploaded_image, file) for file in accepted),
+            return_exceptions=True,
+        )
+        for file, outcome in zip(accepted, outcomes):
+            if isinstance(outcome, HTTPException):
+                results.append({"name": file.filename, "status": "error", "error": outcome.detail})
+            elif isinstance(outcome, Exception):
+                logger.error(f"Error uploading image {file.filename}: {outcome}")
+                results.append({"name": file.filename, "status": "error", "error": "Could not store the image"})
+            else:
+                stored.append(outcome)
+                results.append({"name": file.filename, "status": "ok", "filename": outcome})
+    finally:
+        release_image_slots(session_id, granted, stored)
+    for file in files[granted:]:
+        results.append({
+            "name": file.filename,
+            "status": "error",
+            "error": f"Image limit reached ({MAX_IMAGES_PER_USER} per session)",
+        })
+
+    return {"uploaded": len(stored), "failed": len(results) - len(stored), "results": results}
+
+# Professor directory used for autocomplete and to fill in designations
+professor_directory = ProfessorDirectory()
+
+# Secret for admin endpoints (sent as X-Admin-Token); they are disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def require_admin(request: Request):
+    """404 while admin endpoints are disabled, 403 without a matching X-Admin-Token"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    supplied = request.headers.get("X-Admin-Token", "")
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.on_event("startup")
+async def load_professor_directory():
+    try:
+        professor_directory.reload()
+    except Exception as e:
+        logger.error(f"Error loading professor directory: {str(e)}")
+
+@app.get("/api/professors/search")
+async def search_professors(q: str, limit: int = 10):
+    """Autocomplete professor names by prefix, falling back to fuzzy matches"""
+    return {"results": professor_directory.search(q, max(1, min(limit, 50)))}
+
+@app.get("/api/professors/lookup")
+async def lookup_professor(name: str):
+    """Exact lookup used to auto-fill designation and department"""
+    professor = professor_directory.lookup(name)
+    if professor is None:
+        raise HTTPException(status_code=404, detail="Professor not found")
+    return professor
+
+@app.post("/api/professors/reload")
+async def reload_professors(request: Request, source: str = None):
+    """Hot-reload the directory from its file, or from Mongo with ?source=mongo; admin only"""
+    require_admin(request)
+    try:
+        if source == "mongo":
+            count = await asyncio.to_thread(professor_directory.sync_from_mongo)
+        else:
+            count = await asyncio.to_thread(professor_directory.reload)
+        return {"count": count, "source": professor_directory.source}
+    except Exception as e:
+        logger.exception(f"Error reloading professor directory: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to reload professors: {str(e)}")
+
+async def claim_prepared_sections(token: str, data: ProjectData, model, timings: dict):
+    """Sections from a matching preparation (waiting for it if still running), or None"""
+    task = preparations.claim(token, inputs_key(data.projectDescription, data.projectCode, data.quality), model.model_name)
+    if task is None:
+        return None
+    start = time.perf_counter()
+    try:
+        sections, prepared_timings = await task
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        logger.warning(f"Prepared sections unusable, generating again: {e!r}")
+        return None
+    timings.update(prepared_timings)
+    timings["prepared_wait"] = round((time.perf_counter() - start) * 1000, 1)
+    return sections
+
+@app.post("/api/prepare")
+async def prepare_report(data: PrepareRequest, request: Request, session_id: str = None):
     """
-    Format text content with proper styling for bullets, bold text, and headers.
-    
-    Args:
-        doc: The Document object
-        text_content: The text content to format
+    Start generating the title and sections for a description and code before
+    the rest of the form is submitted. Pass the returned token to
+    /api/generate-report as `prepare_token`.
     """
-    if not text_content:
-        return
-    
+    bind_session(session_id)
+    if not configured_keys():
+        raise HTTPException(status_code=500, detail="GEMINI_API_KEYS or GEMINI_API_KEY not set")
+    if not data.projectDescription.strip() or not data.projectCode.strip():
+        raise HTTPException(status_code=400, detail="projectDescription and projectCode are required")
+    check_input_limits(data)
+    try:
+        llm_breaker.check()
+    except CircuitOpenError as e:
+        raise llm_unavailable(e)
+
+    model = get_model_for(data.quality)
+    # Only the fields the prompts use are known at this point
+    project = ProjectData.model_construct(
+        projectDescription=data.projectDescription,
+        projectCode=data.projectCode,
+        result=ProjectResult(codeOutput=data.codeOutput),
+        quality=data.quality,
+    )
+
+    async def work():
+        timings = {}
+        start_report_deadline()
+        calls = [generate_sections(project, model, timings)]
+        if data.codeOutput:
+            # Warms the analysis reuse cache for reports that ask for it
+            calls.append(analyse_code(project, model))
+        sections, *_ = await asyncio.gather(*calls)
+        return sections, timings
 
-        
-    for line in text_content.splitlines():
-        # Skip empty lines
-        if not line.strip():
-            continue
-
-        # Bold section titles (if they start and end with **)
-        if line.startswith("**") and line.endswith("**"):
-            paragraph = doc.add_paragraph()
-            bold_text = paragraph.add_run(line.strip("**"))
-            bold_text.bold = True
-            
-        # Handle section titles with asterisks (e.g., *Video Processing:*)
-        elif line.startswith("*") and line.endswith("*") and ":" in line:
-            paragraph = doc.add_paragraph()
-            title_text = line.strip("*")
-            run = paragraph.add_run(title_text)
-            run.bold = True
-            run.font.size = Pt(12)
-
-        # Handle top-level bullet points (e.g., `•`)
-        elif line.startswith("•"):
-            clean_line = line.lstrip("• ").strip()
-
-            # Check for bold text within bullet points
-            if "**" in clean_line:
-                paragraph = doc.add_paragraph(style="List Bullet")
-                parts = clean_line.split("**")
-                for i, part in enumerate(parts):
-                    run = paragraph.add_run(part)
-                    if i % 2 == 1:  # Apply bold to parts between `**`
-                        run.bold = True
-            else:
-                doc.add_paragraph(clean_line, style="List Bullet")
-
-        # Handle sub-bullet points with asterisks at beginning (e.g., `* Extract frames`)
-        elif line.strip().startswith("* "):
-            clean_line = line.strip().lstrip("* ").strip()
-
-            # Check for bold text within sub-bullets
-            if "**" in clean_line:
-                paragraph = doc.add_paragraph(style="List Bullet 2")
-                parts = clean_line.split("**")
-                for i, part in enumerate(parts):
-                    run = paragraph.add_run(part)
-                    if i % 2 == 1:  # Apply bold to parts between `**`
-                        run.bold = True
-            else:
-                doc.add_paragraph(clean_line, style="List Bullet 2")
-
-        # Handle numbered lists (e.g., `1.`)
-        elif line[0].isdigit() and len(line) > 1 and line[1] == ".":
-            parts = line.split(". ", 1)  # Split at ". "
-            if len(parts) > 1:
-                number = parts[0]
-                rest_of_line = parts[1]
-
-                paragraph = doc.add_paragraph()
-                paragraph.add_run(number + ". ")  # Number is NOT bold
-
-                # Handle bolding within the description
-                if "**" in rest_of_line:
-                    bold_parts = rest_of_line.split("**")
-                    for i, part in enumerate(bold_parts):
-                        run = paragraph.add_run(part)
-                        if i % 2 == 1:  # Odd indices are the bold parts
-                            run.bold = True
-                else:
-                    paragraph.add_run(rest_of_line)
-
-        # Handle regular top-level bullet points
-        elif line.startswith("- "):
-            clean_line = line.lstrip("- ").strip()
-
-            # Check for bold text within the bullet point
-            if "**" in clean_line:
-                paragraph = doc.add_paragraph(style="List Bullet")
-                parts = clean_line.split("**")
-                for i, part in enumerate(parts):
-                    run = paragraph.add_run(part)
-                    if i % 2 == 1:  # Apply bold to parts between `**`
-                        run.bold = True
-            else:
-                doc.add_paragraph(clean_line, style="List Bullet")
-
-        # Handle sub-bullet points (indented bullets)
-        elif line.startswith("    - ") or line.startswith("\t- "):  # Four spaces or tab for indentation
-            clean_line = line.lstrip("\t ").lstrip("- ").strip()
-            paragraph = doc.add_paragraph(clean_line, style="List Bullet 2")
-        elif line.startswith("  - "):  # Sub-bullets
-            clean_line = line.lstrip("  - ").strip()
-
-            # Check for bold text within the sub-bullet
-            if "**" in clean_line:
-                paragraph = doc.add_paragraph(style="List Bullet 2")
-                parts = clean_line.split("**")
-                for i, part in enumerate(parts):
-                    run = paragraph.add_run(part)
-                    if i % 2 == 1:  # Apply bold to parts between `**`
-                        run.bold = True
-            else:
-                doc.add_paragraph(clean_line, style="List Bullet 2")
-
-        elif line.startswith("        -"):  # Sub-bullets
-            clean_line = line.lstrip("        -").strip()
-
-            # Check for bold text within the sub-bullet
-            if "**" in clean_line:
-                paragraph = doc.add_paragraph(style="List Bullet 2")
-                parts = clean_line.split("**")
-                for i, part in enumerate(parts):
-                    run = paragraph.add_run(part)
-                    if i % 2 == 1:  # Apply bold to parts between `**`
-                        run.bold = True
-            else:
-                doc.add_paragraph(clean_line, style="List Bullet 2")
-
-        # Handle section titles (e.g., `###` for level 3 headers)
-        elif line.startswith("###"):
-            # Create a new paragraph for the header
-            paragraph = doc.add_paragraph()
-            header_text = line.lstrip("###").strip()
-            run = paragraph.add_run(header_text)
-            run.bold = True  # You can adjust this to apply a different style (e.g., font size)
-            paragraph.style = "Heading 3"
-            
-        # Regular plain text (non-bulleted)
-        else:
-            paragraph = doc.add_paragraph(line)
-            paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
+    try:
+        token = preparations.start(
+            inputs_key(data.projectDescription, data.projectCode, data.quality), model.model_name, work, session_id,
+            # Runs only in admission slots no report is waiting for
+            slot=admission.slot(client_key(request), background=True),
+        )
+    except PreparationLimitError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    return {"token": token, "expiresIn": preparations.ttl}
+
+@app.delete("/api/prepare/{token}")
+async def cancel_preparation(token: str):
+    """Cancel an unclaimed preparation"""
+    if not preparations.cancel(token):
+        raise HTTPException(status_code=404, detail="Preparation not found or already used")
+    return {"status": "cancelled"}
 
 @app.post("/api/generate-report")
-async def generate_report(data: ProjectData, session_id: str = None):
+async def generate_report(data: ProjectData, request: Request, session_id: str = None, prepare_token: str = None):
+    bind_session(session_id)
     try:
-        # Add default values for required fields if they're empty
-        if not data.department or data.department == "":
-            data.department = "Computer Science"
-            
-        if not data.professorDepartment or data.professorDepartment == "":
-            data.professorDepartment = "Computer Science & Engineering"
-            
-        if not data.course or data.course == "":
-            data.course = "Technical Course"
-        
-        # Check if GEMINI_API_KEY is set
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
+        # Refuse inputs that would blow the per-report memory budget before any work starts
+        check_input_limits(data, uploads_dir)
+
+        # Fill professor details from the directory, then defaults for anything still empty
+        professor_directory.autofill(data)
+        apply_report_defaults(data)
+
+        # Check that at least one API key is configured
+        if not configured_keys():
             raise HTTPException(
                 status_code=500,
-                detail="GEMINI_API_KEY environment variable is not set"
+                detail="GEMINI_API_KEYS or GEMINI_API_KEY environment variable is not set"
             )
 
-        # Configure Gemini API
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        chat = model.start_chat(history=[])
-        
-        # Generate AI content if needed
-        if data.result and isinstance(data.result.aiGeneratedContent, bool) and data.result.aiGeneratedContent:
-            try:
-                # Generate AI analysis of the code and output
-                prompt = f"""Analyze the following code and its output, providing insights about:
-                1. The code's functionality and performance
-                2. Key patterns or interesting aspects in the output
-                3. Potential improvements or optimizations
-                4. Any notable technical achievements
-
-                Code: {data.projectCode}
-                Output: {data.result.codeOutput if data.result.codeOutput else 'No output provided'}
-                """
-                
-                ai_response = chat.send_message(prompt)
-                # Replace the boolean with the generated text
-                data.result.aiGeneratedContent = ai_response.text if ai_response.text else "AI analysis could not be generated."
-            except Exception as e:
-                print(f"Error generating AI content: {e}")
-                data.result.aiGeneratedContent = "Error generating code and output analysis."
-        
-        # Get the absolute path to the current directory
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-
-        # Create reports directory if it doesn't exist
-        reports_dir = os.path.join(current_dir, "reports")
-        os.makedirs(reports_dir, exist_ok=True)
-
-        # Define paths
-        report_path = os.path.join(reports_dir, "report.docx")
-        logo_path = os.path.join(current_dir, "logo.jpg")
-
         # Verify logo exists
         if not os.path.exists(logo_path):
             raise HTTPException(
@@ -416,956 +778,221 @@ async def generate_report(data: ProjectData, session_id: str = None):
                 detail="Logo file not found"
             )
 
-        # Your existing Python script logic here
-        #### Date
-        # Get the current year and format it as "YYYY-YYYY+1"
-        current_year = datetime.datetime.now().year
-        formatted_year = f"{current_year}-{current_year + 1}"
-
-        # Extract data from the request payload
-        team_members = data.teamMembers
-        project_code = data.projectCode
-        project_description = data.projectDescription
-        department = data.department
-        main_professor = data.mainProfessor
-        main_professor_designation = data.mainProfessor_designation
-        professor_department = data.professorDepartment
-        secondary_professor = data.secondaryProfessor
-        secondary_professor_designation = data.secondaryProfessor_designation
-        course = data.course
-
-        # Combine into lists for easier processing
-        n_s = [member.name for member in team_members]
-        r_s = [member.rollNumber for member in team_members]
-        g_s = [member.gender for member in team_members]
-
-        chat = model.start_chat(history=[])
-
-        def get_text(response):
-            return response.text if response.text else ""
-
-        ##for title
-        title_text = get_text(chat.send_message(
-            f"Using the provided description and code, get me a title for the code with Uppercase letters. Description: {project_description}. Code: {project_code}"))
-
-        try:
-            abstract = get_text(chat.send_message(f"Using the provided description and code, write a concise 400-word abstract summarizing the project. Do not include any titles or headings in your response. Replace any generic terms like 'the project'  with the specific project title wherever applicable. Don't include any conclusion. Description: {project_description}. Code: {project_code}"))
-            introduction = get_text(chat.send_message(f""""Compose a compelling and informative project overview of approximately 350 words, designed to immediately engage the reader and provide a comprehensive understanding of the project's scope and significance. This overview should be structured as follows:
-
-            1. **Context and Motivation:** Begin by establishing the context of the research or problem being addressed. Clearly explain the motivation behind the project and why it is important.
-            2. **Objectives and Goals:** Explicitly state the project's objectives and the intended outcomes. What specific goals are you trying to achieve?
-            3. **Methodology and Approach:** Describe the key methodologies, techniques, or technologies that will be used to achieve the project's objectives. Provide a high-level overview of the project's workflow or stages.
-            4. **Potential Impact and Contributions:** Discuss the potential impact of the project on the relevant field or area of study. What new knowledge, solutions, or insights are expected to emerge?
-            5. **Concluding Statement:** Briefly summarize the project's overall significance and reiterate its potential contributions.
-
-            Crucially, this overview must *not* include the word "Introduction" as a heading, or any other section headings. It should flow seamlessly as a single, cohesive piece of text.
-
-            Base your response on the following description and code:
-
-            Description: {project_description}
-            Code: {project_code}"""))
-
-            conclusion = get_text(chat.send_message(f"""Compose a compelling and informative concluding summary of approximately 300 words, designed to provide a strong sense of closure and highlight the project's overall impact. This summary should be structured as follows:
-
-            1. **Summary of Outcomes:** Briefly recap the project's main objectives and summarize the key results or outcomes achieved.
-            2. **Significance of Findings:** Discuss the significance of these findings in the context of the research area or problem being addressed. What new insights or knowledge have been gained?
-            3. **Implications and Impact:** Explore the broader implications of the project's outcomes. What are the potential applications, real-world impacts, or future research directions that stem from this work?
-            4. **Limitations and Future Work (Optional):** Briefly acknowledge any limitations of the project and suggest potential avenues for future research or improvement.
-            5. **Concluding Remarks:** Offer a concise concluding statement that reinforces the project's overall contribution and significance.
-
-            Crucially, this summary must *not* include the word "Conclusion" as a heading, or any other section headings. It should flow seamlessly as a single, cohesive piece of text.
-
-            Base your response on the following description and code:
-
-            Description: {project_description}
-            Code: {project_code}"""))
-
-            objectives = get_text(chat.send_message(f"Analyze the following code and provide a concise, bullet-point summary of its objectives, targeting approximately 20 bullet points. Prioritize clarity, conciseness, and the use of short, direct sentences. Group related objectives under short, descriptive *side headings* if it improves readability and organization. Absolutely *do not* use a main heading for the entire summary. Description: {project_description}, Code: {project_code}"))
-        
-            methodology = get_text(chat.send_message(f"""Provide a detailed explanation of the methodology employed in this project, based on the provided description and code. This explanation should cover:
-
-            *   The specific steps or stages involved in the project.
-            *   The processes and procedures used at each stage.
-            *   The techniques, algorithms, or tools applied.
-            *   The overall approach or strategy adopted.
+        # Fail fast while the LLM backend is known to be down
+        llm_breaker.check()
 
-            Use side headings to organize the explanation into logical sections, but do *not* use a main heading for the entire response.
+        model = get_model_for(data.quality)
+        report_id = uuid.uuid4().hex
 
-            Description: {project_description}
-            Code: {project_code}"""))
-            
-        except Exception as e:
-            print(f"Error generating content: {e}")
-            abstract = introduction = conclusion = objectives = methodology = ""
-
-        def make_table_invisible(table):
-            """Helper function to make table borders invisible"""
-            tbl = table._element
-            tblPr = tbl.xpath('w:tblPr')
-            if not tblPr:
-                tblPr = OxmlElement('w:tblPr')
-                tbl.insert(0, tblPr)
-            else:
-                tblPr = tblPr[0]
-
-            # Create border element
-            tblBorders = OxmlElement('w:tblBorders')
-
-            # Add all border types
-            for border_type in ['top', 'left', 'bottom', 'right', 'insideH', 'insideV']:
-                border = OxmlElement(f'w:{border_type}')
-                border.set(qn('w:val'), 'none')
-                border.set(qn('w:sz'), '0')
-                border.set(qn('w:space'), '0')
-                border.set(qn('w:color'), 'auto')
-                tblBorders.append(border)
-
-            # Remove any existing borders
-            existing_borders = tblPr.find(qn('w:tblBorders'))
-            if existing_borders is not None:
-                tblPr.remove(existing_borders)
-
-            # Add new border settings
-            tblPr.append(tblBorders)
-
-        def _add_results_section(doc, result, title_style, project_code):
-            """Helper function to add the Results section to the document"""
-            section = doc.sections[-1]
-            add_page_border(section)
-
-            # Add Results title
-            paragraph = doc.add_paragraph()
-            paragraph.style = title_style
-            paragraph.add_run("RESULTS").bold = True
-
-            # Add result images if they exist
-            if result and result.resultImages and len(result.resultImages) > 0:
-                # Create a table for images with 2 columns
-                image_table = doc.add_table(rows=0, cols=2)
-                image_table.autofit = False
-                image_table.columns[0].width = Inches(3)
-                image_table.columns[1].width = Inches(3)
-                
-                # Add images in pairs
-                for i in range(0, len(result.resultImages), 2):
-                    row = image_table.add_row()
-                    # First image
-                    try:
-                        img_path = os.path.join(uploads_dir, result.resultImages[i])
-                        cell = row.cells[0]
-                        paragraph = cell.paragraphs[0]
-                        paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-                        run = paragraph.add_run()
-                        run.add_picture(img_path, width=Inches(2.5))
-                    except Exception as e:
-                        print(f"Error adding image {result.resultImages[i]}: {str(e)}")
-                    
-                    # Second image (if exists)
-                    if i + 1 < len(result.resultImages):
-                        try:
-                            img_path = os.path.join(uploads_dir, result.resultImages[i + 1])
-                            cell = row.cells[1]
-                            paragraph = cell.paragraphs[0]
-                            paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-                            run = paragraph.add_run()
-                            run.add_picture(img_path, width=Inches(2.5))
-                        except Exception as e:
-                            print(f"Error adding image {result.resultImages[i + 1]}: {str(e)}")
-                
-                # Add space after images
-                doc.add_paragraph()
-
-            # Add code output if it exists
-            if result and result.codeOutput:
-                # Add a heading for code output
-                output_heading = doc.add_paragraph()
-                output_heading.add_run("Code Output:").bold = True
-                
-                # Add the code output
-                code_output = doc.add_paragraph()
-                code_output.add_run(result.codeOutput)
-
-            # Add AI content if it exists
-            if result and result.aiGeneratedContent:
-                # Add a heading for AI analysis
-                ai_heading = doc.add_paragraph()
-                ai_heading.add_run("Code & Output Analysis:").bold = True
-                
-                # Format the AI content using our new function
-                format_text_content(doc, str(result.aiGeneratedContent))
-
-            # Add page break after Results section
-            doc.add_page_break()
-
-        def create_project_report(
-            abstract,
-            introduction,
-            objectives,
-            methodology,
-            project_code,
-            result,
-            conclusion,
-            department,
-        ):
-            from docx.shared import Inches
-
-            # Create a new document
-            doc = Document()
-
-            # Add page borders to the first section
-            add_page_border(doc.sections[0])
-
-            # Add page numbers to the footer of all sections
-            for section in doc.sections:
-                footer = section.footer
-                paragraph = footer.paragraphs[0] if footer.paragraphs else footer.add_paragraph()
-                add_page_number(paragraph)
-
-            # Set default font to Times New Roman
-            style = doc.styles["Normal"]
-            font = style.font
-            font.name = "Times New Roman"
-            font.size = Pt(12)
-
-            # Title section
-            title = doc.add_paragraph()
-            title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-            run = title.add_run("A Course Based Project Report on\n")
-            run.font.size = Pt(14)
-            run.font.color.rgb = RGBColor(0, 0, 139)
-
-            run = title.add_run(title_text)
-            run.bold = True
-            run.font.size = Pt(18)
-            run.font.color.rgb = RGBColor(255, 0, 0)
-
-            run = title.add_run("Submitted to the\n")
-            run.font.size = Pt(14)
-            run.font.color.rgb = RGBColor(0, 0, 139)
-
-            run = title.add_run("Department of " + professor_department + "\n")
-            run.bold = True
-            run.font.size = Pt(16)
-            run.font.color.rgb = RGBColor(0, 0, 139)
-
-            run = title.add_run(
-                "in partial fulfilment of the requirements for the completion of course\n"
-            )
-            run.font.size = Pt(12)
-            run.font.color.rgb = RGBColor(0, 0, 139)
-
-            run = title.add_run(course + "\n\n")
-            run.font.size = Pt(12)
-            run.font.color.rgb = RGBColor(0, 0, 0)
-
-            run = title.add_run("BACHELOR OF TECHNOLOGY\n")
-            run.bold = True
-            run.font.size = Pt(14)
-            run.font.color.rgb = RGBColor(255, 0, 0)
-
-            run = title.add_run("in\n")
-            run.bold = True
-            run.font.size = Pt(12)
-            run.font.color.rgb = RGBColor(0, 0, 0)
-
-            run = title.add_run("Department of " + professor_department)
-            run.bold = True
-            run.font.size = Pt(16)
-            run.font.color.rgb = RGBColor(255, 0, 0)
-
-            # Submitted by section (Combined alignments)
-            submitted_by = doc.add_paragraph()
-            submitted_by.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER  # Center "Submitted by"
-            run = submitted_by.add_run("Submitted by\n")
-            run.font.size = Pt(14)
-            run.font.color.rgb = RGBColor(0, 0, 0)
-
-            students = []
-            for member in team_members:
-                students.append([member.name, member.rollNumber])
-
-            table = doc.add_table(rows=len(students), cols=2)
-            table.autofit = False
-            table.columns[0].width = Pt(250)
-            table.columns[1].width = Pt(100)
-            make_table_invisible(table)
-
-            # Indent the table to the right (adjust Pt value as needed)
-            # 1 inch indentation
-
-            for i, (name, roll_no) in enumerate(students):
-                row_cells = table.rows[i].cells
-                # Add spaces before the name:
-                padded_name = "                " + name  # Six spaces
-                padded_roll_no = "                   " + roll_no
-                row_cells[0].text = padded_name
-                row_cells[1].text = padded_roll_no
-
-                for cell in row_cells:
-                    paragraph = cell.paragraphs[0]
-                    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT  # Right-align cell content
-                    for run in paragraph.runs:
-                        run.font.size = Pt(12)
-                        run.font.color.rgb = RGBColor(0, 0, 139)
-
-            # Under the guidance of section
-            guidance = doc.add_paragraph()
-            guidance.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-            run = guidance.add_run("Under the guidance of\n")
-            run.font.size = Pt(14)
-            run.font.color.rgb = RGBColor(0, 0, 0)
-
-            run = guidance.add_run(main_professor + "\n")
-            run.bold = True
-            run.font.size = Pt(14)
-            run.font.color.rgb = RGBColor(0, 0, 139)
-
-            run = guidance.add_run(
-                main_professor_designation
-                + ", Department of "
-                + professor_department
-                + " VNRVJIET"
-            )
-            run.bold = True
-            run.font.size = Pt(14)
-            run.font.color.rgb = RGBColor(0, 0, 0)
-
-            image_placeholder = doc.add_paragraph()
-            image_placeholder.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-
-            # Add the image with the correct method
-            image_placeholder.add_run().add_picture(
-                "logo.jpg", width=Inches(1), height=Inches(1)
-            )
-
-            header = doc.add_paragraph()
-            header.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-
-            run = header.add_run(
-                "VALLURUPALLI NAGESWARA RAO VIGNANA JYOTHI INSTITUTE OF ENGINEERING AND TECHNOLOGY\n"
-            )
-            run.bold = True
-            run.font.size = Pt(14)
-            run.font.color.rgb = RGBColor(0, 0, 139)
-
-            run = header.add_run(
-                "An Autonomous Institute, NAAC Accredited with 'A++' Grade, NBA Accredited for CE, EEE, ME, ECE, CSE, EIE, IT B. Tech Courses, Approved by AICTE, New Delhi, Affiliated to JNTUH, Recognized as 'College with Potential for Excellence' by UGC, ISO 9001:2015 Certified, QS I GUAGE Diamond Rated\n"
-            )
-            run.font.size = Pt(10)
-            run.font.color.rgb = RGBColor(255, 0, 0)
-
-            run = header.add_run(
-                "Vignana Jyothi Nagar, Pragathi Nagar, Nizampet(SO), Hyderabad-500090, TS, India\n"
-            )
-            run.font.size = Pt(10)
-            run.font.color.rgb = RGBColor(0, 0, 139)
-
-            run = header.add_run("Department of " + professor_department)
-            run.bold = True
-            run.font.size = Pt(12)
-            run.font.color.rgb = RGBColor(255, 0, 0)
-
-            #####################################Add a page break########################################################################
-            doc.add_page_break()
-            # Certificate page
-            section = doc.sections[-1]
-            add_page_border(section)
-
-            header = doc.add_paragraph()
-            header.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-
-            run = header.add_run(
-                "VALLURUPALLI NAGESWARA RAO VIGNANA JYOTHI INSTITUTE OF ENGINEERING AND TECHNOLOGY\n"
+        async def produce(job):
+            timings = {}
+            # Load the result images while the LLM calls run; only once admitted,
+            # so queued reports do not hold prepared images in memory
+            image_tasks = image_prep.start_preparing(
+                data.result.resultImages if data.result else None, uploads_dir, memory.REPORT_IMAGE_MEMORY_BYTES
             )
-            run.bold = True
-            run.font.size = Pt(14)
-            run.font.color.rgb = RGBColor(0, 0, 139)
+            try:
+                with memory.track("generate") as usage:
+                    job["stage"] = "llm"
+                    start_report_deadline()
+                    llm_start = time.perf_counter()
+
+                    # Generate AI content if needed
+                    if data.result and isinstance(data.result.aiGeneratedContent, bool) and data.result.aiGeneratedContent:
+                        # Replace the boolean with the generated text
+                        data.result.aiGeneratedContent = await generate_code_analysis(data, model, timings)
+
+                    sections = None
+                    if prepare_token:
+                        sections = await claim_prepared_sections(prepare_token, data, model, timings)
+                    if sections is None:
+                        sections = await generate_sections(data, model, timings)
+                    timings["llm"] = round((time.perf_counter() - llm_start) * 1000, 1)
+                    GENERATION_LLM_MS.observe(timings["llm"], quality=data.quality)
+                    job["stage"] = "render"
+                    images_start = time.perf_counter()
+                    images = await image_prep.collect(image_tasks)
+                    timings["image_wait"] = round((time.perf_counter() - images_start) * 1000, 1)
+                    artifact, timings["render"] = await render_report(report_id, data, sections, images)
+                if usage is not None:
+                    timings["peak_rss_mb"] = round(usage.peak / memory.MB, 1)
+
+                # Keep the section text for editing and regeneration; the stored report
+                # keeps the session images alive until it is evicted
+                job["stage"] = "store"
+                store_generated_report(report_id, data, sections, artifact, session_id, timings, model.model_name)
+                return artifact
+            finally:
+                image_prep.cancel(image_tasks)
+
+        artifact = await run_cancellable(request, produce)
 
-            run = header.add_run(
-                "An Autonomous Institute, NAAC Accredited with 'A++' Grade, NBA Accredited for CE, EEE, ME, ECE, CSE, EIE, IT B. Tech Courses, Approved by AICTE, New Delhi, Affiliated to JNTUH, Recognized as 'College with Potential for Excellence' by UGC, ISO 9001:2015 Certified, QS I GUAGE Diamond Rated\n"
-            )
-            run.font.size = Pt(10)
-            run.font.color.rgb = RGBColor(255, 0, 0)
+        # Return the file
+        return report_response(artifact)
+
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        raise llm_unavailable(e)
+    except asyncio.TimeoutError:
+        logger.error("Report generation passed its deadline")
+        raise HTTPException(status_code=504, detail="Report generation timed out")
+    except Exception as e:
+        logger.exception(f"Error in generate_report: {str(e)}")  # Log the error
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate report: {str(e)}"
+        )
 
-            run = header.add_run(
-                "Vignana Jyothi Nagar, Pragathi Nagar, Nizampet(SO), Hyderabad-500090, TS, India\n\n"
+@app.get("/api/reports/{report_id}")
+async def get_report_draft(report_id: str):
+    """Return a stored report's input data, section texts, images and timings"""
+    draft = get_draft_or_404(report_id)
+    return {
+        "reportId": draft["id"],
+        "createdAt": draft["created_at"],
+        "updatedAt": draft["updated_at"],
+        "data": draft["data"],
+        "sections": draft["sections"],
+        "images": draft["images"],
+        "timings": draft["timings"],
+    }
+
+@app.get("/api/reports/{report_id}/preview", response_class=HTMLResponse)
+async def preview_report(report_id: str):
+    """HTML preview of a stored report's current sections; no docx is built"""
+    draft = get_draft_or_404(report_id)
+    data, sections = draft_render_inputs(draft)
+    with span("html.preview"):
+        html = render_preview_html(data, sections)
+    return HTMLResponse(html, headers={"Cache-Control": "private, no-cache"})
+
+@app.api_route("/api/reports/{report_id}/download", methods=["GET", "HEAD"])
+async def download_report(report_id: str, request: Request):
+    """
+    Download a stored report. Supports If-None-Match (304) and single
+    byte ranges (206) so dropped downloads can resume.
+    """
+    artifact = artifact_store.get(report_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Report not found or expired")
+    headers = artifact_headers(artifact)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or artifact["etag"] in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == artifact["etag"]):
+        size = artifact["size"]
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range:
+            start, end = byte_range
+            return StreamingResponse(
+                iter_file_range(artifact["path"], start, end),
+                status_code=206,
+                media_type=DOCX_MEDIA_TYPE,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)},
             )
-            run.font.size = Pt(10)
-            run.font.color.rgb = RGBColor(0, 0, 139)
-
-            run = header.add_run("Department of " + professor_department + "\n\n")
-            run.bold = True
-            run.font.size = Pt(12)
-            run.font.color.rgb = RGBColor(255, 0, 0)
 
-            # Leave space for image
-            from docx.shared import Inches
+    return report_response(artifact)
 
-            # Add a new paragraph for the image
-            image_placeholder = doc.add_paragraph()
-            image_placeholder.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-
-            # Add the image with the correct method
-            image_placeholder.add_run().add_picture(
-                "logo.jpg", width=Inches(1), height=Inches(1)
-            )  # Adjust width as necessary
-
-            # Optionally, you can set additional formatting to the image's caption if needed
-
-            run = header.add_run("CERTIFICATE\n\n")
-            run.bold = True
-            run.font.size = Pt(15)
-            run.font.color.rgb = RGBColor(0, 128, 0)
-            run.underline = True
-
-            certificate = doc.add_paragraph()
-            certificate.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-            certificate.space_after = Pt(12)  # Add space after the paragraph
-
-            run = certificate.add_run("This is to certify that the project report entitled ")
-            run.font.size = Pt(12)
-
-            run = certificate.add_run('"' + title_text + '"')
-            run.font.color.rgb = RGBColor(0, 0, 139)
-            run.bold = True
-            run.font.size = Pt(12)
+@app.put("/api/reports/{report_id}/sections/{section_name}")
+async def update_report_section(report_id: str, section_name: str, update: SectionUpdate):
+    """Replace a section's text with a user edit (no LLM call)"""
+    check_section_name(section_name)
+    if not draft_store.update_section(report_id, section_name, update.text, edited=True):
+        raise HTTPException(status_code=404, detail="Report not found")
+    return {"status": "success"}
 
-            run = certificate.add_run(
-                "is a bonafide work done under our supervision and is being submitted by "
-            )
-            run.font.size = Pt(12)
-
-            students = [
-                f"{'Mr.' if gender == 'm' else 'Miss.'} {name} ({roll})"
-                for name, roll, gender in zip(n_s, r_s, g_s)
-            ]
-
-            for i, student in enumerate(students):
-                run = certificate.add_run(student)
-                run.font.size = Pt(12)
-                run.bold = True
-                run.font.color.rgb = RGBColor(0, 128, 0)
-                if i < len(students) - 1:
-                    run = certificate.add_run(", ")
-                    run.bold = True
-                    run.font.size = Pt(12)
-
-            run = certificate.add_run(
-                "in partial fulfillment for the award of the degree of "
-            )
-            run.font.size = Pt(12)
+@app.post("/api/reports/{report_id}/render")
+async def render_report_draft(report_id: str):
+    """Re-render a stored report from its current section text without touching the LLM"""
+    draft = get_draft_or_404(report_id)
+    try:
+        data, sections = draft_render_inputs(draft)
+        artifact, render_ms = await render_report(report_id, data, sections)
+        draft_store.update_timings(report_id, {"render": render_ms})
+        return report_response(artifact)
+    except Exception as e:
+        logger.exception(f"Error rendering stored report: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to render report: {str(e)}")
 
-            run = certificate.add_run("Bachelor of Technology ")
-            run.font.size = Pt(12)
-            run.bold = True
-            run.font.color.rgb = RGBColor(0, 0, 255)  # Blue color
+@app.post("/api/reports/{report_id}/sections/{section_name}/regenerate")
+async def regenerate_report_section(report_id: str, section_name: str, request: Request):
+    """Regenerate one section of a stored report and re-render it; other sections are reused"""
+    check_section_name(section_name)
+    draft = get_draft_or_404(report_id)
 
-            run = certificate.add_run(
-                "in" + department + ", "
-            )
-            run.font.size = Pt(12)
+    try:
+        data, sections = draft_render_inputs(draft)
+        if section_name == "analysis" and data.result is None:
+            raise HTTPException(status_code=400, detail="Report has no results section")
 
-            run = certificate.add_run(
-                "of the VNR VJIET, Hyderabad during the academic year "
-                + formatted_year
-                + ".\n\n\n\n"
-            )
-            run.font.size = Pt(12)
-
-            # After acknowledgment, before TOC
-            # Determine HOD based on department
-            if department == "Computer Science & Engineering":
-                hod_name = "Dr. V. Baby"
-            elif department == "Electrical and Electronics Engineering":
-                hod_name = "Dr.V. Ramesh Babu"
-            elif department == "Electronics and Communication Engineering":
-                hod_name = "Dr L Padma Sree"
-            elif department == "Mechanical Engineering":
-                hod_name = "Dr. B.V.R. Ravi Kumar"
-            elif department == "Electronics and Instrumentation Engineering":
-                hod_name = "Dr. S. Pranavanand"
-            elif department == "Civil Engineering":
-                hod_name = "Dr. K. Ramujee"
-            elif department == "Automobile Engineering":
-                hod_name = "Dr.Shaik Amjad"
-            elif department == "Artificial Intelligence & Data Science":
-                hod_name = "Dr.T.Sunil Kumar"
-            elif department == "CSE-Cyber Security":
-                hod_name = "Dr.T.Sunil Kumar"
-            elif department == "CSE-Data Science":
-                hod_name = "Dr.T.Sunil Kumar"
-            elif department == "Computer Science and Business Systems":
-                hod_name = "Dr. V. Baby"
-            elif department == "CSE-AIML":
-                hod_name = "Dr.Sagar Yeruva"
-            elif department == "CSE-IoT":
-                hod_name = "Dr.Sagar Yeruva"
-            elif department == "Information Technology":
-                hod_name = "Dr N Mangathayaru"
-            else:
-                hod_name = "Department Head"  # Default value
-
-            # Create signatures table
-            signatures = doc.add_table(rows=4, cols=2)  # 4 rows now
-            signatures.autofit = False
-            signatures.style.paragraph_format.space_before = Pt(12)
-
-            # Set column widths
-            signatures.columns[0].width = Inches(2.5)
-            signatures.columns[1].width = Inches(2.5)
-
-            # --- Project Guide ---
-            cell = signatures.cell(0, 0)
-            cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-            p = cell.paragraphs[0]
-            p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-            run = p.add_run(main_professor)
-            run.bold = True
-            run.font.color.rgb = RGBColor(255, 0, 0)
-            run.font.size = Pt(12)
-
-            cell = signatures.cell(1, 0)
-            cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-            p = cell.paragraphs[0]
-            p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-            run = p.add_run(main_professor_designation)
-            run.font.size = Pt(11)
-
-            cell = signatures.cell(2, 0)
-            cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-            p = cell.paragraphs[0]
-            p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-            run = p.add_run("Dept of " + professor_department)
-            run.font.color.rgb = RGBColor(255, 0, 0)
-            run.font.size = Pt(11)
-
-            # --- HOD ---
-            cell = signatures.cell(0, 1)
-            cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-            p = cell.paragraphs[0]
-            p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-            run = p.add_run("          " + hod_name)
-            run.font.color.rgb = RGBColor(255, 0, 0)
-            run.bold = True
-            run.font.size = Pt(12)
-
-            cell = signatures.cell(1, 1)
-            cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-            p = cell.paragraphs[0]
-            p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-            run = p.add_run("            " + "Professor & HOD")
-            run.font.size = Pt(11)
-
-            cell = signatures.cell(2, 1)
-            cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-            p = cell.paragraphs[0]
-            p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-            run = p.add_run("            " + "Dept of " + department)
-            run.font.color.rgb = RGBColor(255, 0, 0)
-            run.font.size = Pt(11)
-
-            ########################3rd page#######################################################################################################
-            doc.add_page_break()
-            section = doc.sections[-1]
-            add_page_border(section)
-
-            # Title Section
-            title = doc.add_paragraph()
-            title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-            run = title.add_run("Course based Projects Reviewer\n")
-            run.font.size = Pt(14)
-            run.bold = True
-            run.font.color.rgb = RGBColor(0, 0, 139)
-
-            run = title.add_run(
-                "VALLURUPALLI NAGESWARA RAO VIGNANA JYOTHI INSTITUTE OF ENGINEERING AND TECHNOLOGY\n"
-            )
-            run.font.size = Pt(12)
-            run.bold = True
-            run.font.color.rgb = RGBColor(255, 0, 0)
+        llm_breaker.check()
+        model = get_model_for(data.quality)
 
-            run = title.add_run(
-                "An Autonomous Institute, NAAC Accredited with 'A++' Grade,\nVignana Jyothi Nagar, Pragathi Nagar, Nizampet(SO), Hyderabad-500090, TS, India\n\n"
-            )
-            run.font.size = Pt(10)
-            run.font.color.rgb = RGBColor(0, 0, 139)
-
-            run = title.add_run("Department of " + professor_department + "\n")
-            run.bold = True
-            run.font.size = Pt(12)
-            run.font.color.rgb = RGBColor(255, 0, 0)
-
-            # Image Placeholder
-            doc.add_picture(
-                "logo.jpg", width=Inches(1), height=Inches(1)
-            )  # Adjust path and width
-            doc.paragraphs[-1].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-
-            # Declaration Section
-            declaration_title = doc.add_paragraph()
-            declaration_title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-            run = declaration_title.add_run("DECLARATION\n")
-            run.bold = True
-            run.font.size = Pt(14)
-            run.font.color.rgb = RGBColor(255, 0, 0)
-            run.underline = True
-
-            declaration = doc.add_paragraph()
-            declaration.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-
-            # 1. Project Title (Blue)
-            run = declaration.add_run(
-                "We declare that the course-based project work entitled "
-            )
-            run.font.size = Pt(12)
-            run.font.color.rgb = RGBColor(0, 0, 0)  # Black
-
-            run = declaration.add_run('"' + title_text + '"')
-            run.font.size = Pt(12)
-            run.font.color.rgb = RGBColor(0, 0, 255)  # Blue
-            run.bold = True
-
-            run = declaration.add_run("submitted in the ")
-            run.font.size = Pt(12)
-            run.font.color.rgb = RGBColor(0, 0, 0)  # Black
-
-            # 2. Department Name (Red)
-            run = declaration.add_run("Department of " + professor_department + ", ")
-            run.font.size = Pt(12)
-            run.font.color.rgb = RGBColor(255, 0, 0)  # Red
-
-            run = declaration.add_run(
-                "Vallurupalli Nageswara Rao Vignana Jyothi Institute of Engineering and Technology, Hyderabad, in partial fulfillment of the requirement for the award of the degree of"            )
-            run.font.size = Pt(12)
-            run.font.color.rgb = RGBColor(0, 0, 0)  # Black
-
-            # 3. Degree Name (Blue)
-            run = declaration.add_run("Bachelor of Technology in " + department + ", ")
-            run.font.size = Pt(12)
-            run.font.color.rgb = RGBColor(0, 0, 255)  # Blue
-            run.bold = True
-
-            run = declaration.add_run(
-                "is a bonafide record of our own work carried out under the supervision of "
-            )
-            run.font.size = Pt(12)
-            run.font.color.rgb = RGBColor(0, 0, 0)  # Black
-
-            # Create supervisors list conditionally
-            supervisors = [f"{main_professor}, {main_professor_designation}, Department of {professor_department}, VNRVJIET"]
-            
-            # Only add secondary professor if provided and not empty
-            if secondary_professor and secondary_professor.strip():
-                supervisors.append(f"{secondary_professor}, {secondary_professor_designation}, Department of {professor_department}, VNRVJIET")
-
-            # Use supervisors list in the document
-            for i, supervisor in enumerate(supervisors):
-                run = declaration.add_run(str(supervisor))  # Convert to string explicitly
-                run.font.size = Pt(12)
-                run.font.color.rgb = RGBColor(0, 128, 0)  # Green
-                if i < len(supervisors) - 1:
-                    run = declaration.add_run(" and ")  # Add "and" between supervisors only if there are multiple
-
-            # ______________________________________________Increase Word Spacing for the entire paragraph_______________________________________________________________________________________________
-            declaration.paragraph_format.word_spacing = 2.5  # 125% of normal spacing
-
-            run = declaration.add_run(
-                ". Also, we declare that the matter embodied in this thesis has not been submitted by us in full or in any part thereof for the award of any degree of any other institution or university previously.\n\n"
-            )
-            run.font.size = Pt(12)
-            run.font.color.rgb = RGBColor(0, 0, 0)  # Black
-
-            # Place
-            place = doc.add_paragraph()
-            place.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-            run = place.add_run("Place: Hyderabad.")
-            run.font.size = Pt(12)
-
-            # Create a table
-            student_table = doc.add_table(rows=1, cols=4)
-            student_table.autofit = False
-            make_table_invisible(student_table)
-
-            # Set column widths and add student details
-            col_widths = [Inches(1.5), Inches(1.5), Inches(1.5), Inches(1.5)]
-            for col, width in zip(student_table.columns, col_widths):
-                col.width = width
-
-            students = [
-                (member.name for member in team_members),
-                (member.rollNumber for member in team_members)
-            ]
-
-            for student_row in students:
-                row = student_table.add_row()
-                for cell, text in zip(row.cells, student_row):
-                    cell.text = text
-                    for paragraph in cell.paragraphs:
-                        paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-                        for run in paragraph.runs:
-                            run.font.size = Pt(12)
-
-            # Remove table borders
-            make_table_invisible(table)
-
-            # Add some space after the table
-            doc.add_paragraph()
-
-            ###############4th page ##########################################################################################################
-
-            doc.add_page_break()
-            section = doc.sections[-1]
-            add_page_border(section)
-
-            ack_heading = doc.add_paragraph()
-            ack_heading.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-            run = ack_heading.add_run("ACKNOWLEDGEMENT")
-            run.font.bold = True
-            run.font.size = Pt(16)
-            run.font.color.rgb = RGBColor(255, 0, 0)  # Red color
-
-            # Add the acknowledgment content
-            ack_content = (
-                "We express our deep sense of gratitude to our beloved President, "
-                "Sri.D.Suresh Babu, VNR Vignana Jyothi Institute of Engineering & Technology for the "
-                "valuable guidance and for permitting us to carry out this project.\n\n"
-                "With immense pleasure, we record our deep sense of gratitude to our beloved Principal, "
-                "Dr.C.D Naidu, for permitting us to carry out this project.\n\n"
-                f"We express our deep sense of gratitude to our beloved Professor {main_professor}, "
-                f"Professor and Head, Department of {department}, VNR Vignana Jyothi "
-                "Institute of Engineering & Technology, Hyderabad-500090 for the valuable guidance and suggestions, "
-                "keen interest and through encouragement extended throughout the period of project work.\n\n"
-                "We take immense pleasure to express our deep sense of gratitude to our beloved Guide, "
-                f"{main_professor}, {main_professor_designation}, Department of {department}, "
-                "VNR Vignana Jyothi Institute of Engineering & Technology, Hyderabad, for his/her valuable suggestions "
-                "and rare insights, for constant source of encouragement and inspiration throughout my project work.\n\n"
-                "We express our thanks to all those who contributed for the successful completion of our project work."
+        async def produce(job):
+            timings = {}
+            image_tasks = image_prep.start_preparing(
+                data.result.resultImages if data.result else None, uploads_dir, memory.REPORT_IMAGE_MEMORY_BYTES
             )
-            paragraph = doc.add_paragraph(ack_content)
-            paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-            for run in paragraph.runs:
-                run.font.size = Pt(12)
-
-            # Add a table for names and roll numbers
-            names_and_roll_numbers = [["Name", "Roll Number"]] + [
-                [member.name, member.rollNumber] for member in team_members
-            ]
-
-            # Create a table with a header row
-            table = doc.add_table(rows=1, cols=2)
-
-            # Add data rows
-            for name, roll_number in names_and_roll_numbers[0:]:
-                row_cells = table.add_row().cells
-                name = "               " + name
-                roll_number = "                    " + roll_number
-                row_cells[0].text = name
-                row_cells[1].text = roll_number
-
-            # Apply styling to table rows
-            for row in table.rows:
-                for cell in row.cells:
-                    for paragraph in cell.paragraphs:
-                        paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT  # Left-align text
-                        for run in paragraph.runs:
-                            run.font.size = Pt(12)
-
-            # Remove table borders
-            tbl = table._element
-            tblBorders = tbl.xpath(".//w:tblBorders")
-            for tblBorder in tblBorders:
-                tblBorder.getparent().remove(tblBorder)
-            
-            doc.add_page_break()
-            
-            # Define styles for titles and body text
-            title_style = doc.styles["Title"]
-            title_style.font.name = "Calibri"
-            title_style.font.size = Pt(20)
-            title_style.font.bold = True
-            title_style.paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-
-            body_style = doc.styles["Body Text"]
-            body_style.font.name = "Times New Roman"
-            body_style.font.size = Pt(14)
-
-
-            # Define sections with their starting page numbers
-            sections = OrderedDict()
-            current_page = 5  # TOC will be on page 4
-            page_numbers = {}
-            
-            # Map sections to their page numbers
-            for section_name in ["Abstract", "Introduction", "Objectives", "Methodology", "Code"]:
-                page_numbers[section_name] = current_page
-                current_page += 1
-            
-            if result and (
-                (result.resultImages and len(result.resultImages) > 0) or 
-                result.codeOutput or 
-                result.aiGeneratedContent
-            ):
-                page_numbers["Results"] = current_page
-                current_page += 1
-            
-            page_numbers["Conclusion"] = current_page
-
-            # Add sections with their content
-            sections["Abstract"] = abstract
-            sections["Introduction"] = introduction
-            sections["Objectives"] = objectives
-            sections["Methodology"] = methodology
-            sections["Code"] = project_code
-            if "Results" in page_numbers:
-                sections["Results"] = result
-            sections["Conclusion"] = conclusion
-
-            # Add TOC page (Page 4)
-            section = doc.sections[-1]
-            add_page_border(section)
-            
-            # Create TOC title
-            toc_title = doc.add_paragraph()
-            toc_title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-            run = toc_title.add_run("TABLE OF CONTENTS")
-            run.font.bold = True
-            run.font.size = Pt(16)
-            run.font.color.rgb = RGBColor(255, 0, 0)
-            
-            # Add space after title
-            doc.add_paragraph()
-            
-            # Create TOC table
-            toc_table = doc.add_table(rows=len(sections) + 1, cols=3)
-            toc_table.style = 'Table Grid'
-            toc_table.alignment = WD_TABLE_ALIGNMENT.CENTER
-            
-            # Set column widths
-            toc_table.columns[0].width = Inches(1)    # Chapter number
-            toc_table.columns[1].width = Inches(4)    # Title
-            toc_table.columns[2].width = Inches(1)    # Page number
-            
-            # Add headers
-            header_cells = toc_table.rows[0].cells
-            header_cells[0].text = "Chapter"
-            header_cells[1].text = "Title"
-            header_cells[2].text = "Page"
-            
-            # Style header row
-            for cell in header_cells:
-                paragraph = cell.paragraphs[0]
-                paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-                run = paragraph.runs[0]
-                run.font.bold = True
-                run.font.size = Pt(12)
-            
-            # Add content rows with correct page numbers
-            for idx, (section_name, _) in enumerate(sections.items(), 1):
-                cells = toc_table.rows[idx].cells
-                
-                # Chapter number
-                cells[0].text = str(idx)
-                cells[0].paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-                
-                # Section name
-                cells[1].text = section_name
-                cells[1].paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-                
-                # Page number
-                cells[2].text = str(page_numbers[section_name])
-                cells[2].paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-                
-                # Style the row
-                for cell in cells:
-                    cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-                    for paragraph in cell.paragraphs:
-                        for run in paragraph.runs:
-                            run.font.size = Pt(12)
-            
-            # Add page break after TOC
-            doc.add_page_break()
-
-            # Add content sections
-            for section_name, section_text in sections.items():
-                # Add page border for new section
-                section = doc.sections[-1]
-                add_page_border(section)
-
-                if section_name != "Results":
-                    # Add section title
-                    paragraph = doc.add_paragraph()
-                    paragraph.style = title_style
-                    paragraph.add_run(section_name.upper()).bold = True
-
-                    # Add section content using our formatting function
-                    if section_text:
-                        format_text_content(doc, section_text)
-            
-                    # Add page break after each section except conclusion
-                    if section_name != "Conclusion":
-                        doc.add_page_break()
-                else:
-                    # Handle Results section
-                    _add_results_section(doc, result, title_style, project_code)
-
-            doc.save(report_path)
-
-        # Generate the report using your create_project_report function
-        create_project_report(
-            abstract,
-            introduction,
-            objectives,
-            methodology,
-            data.projectCode,
-            data.result if data.result else None,
-            conclusion,
-            data.department
-        )
-
-        # After report is generated, cleanup session images
-        if session_id:
-            cleanup_session_images(session_id)
-
-        # Return the file
-        return FileResponse(
-            report_path,
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            filename=f"output-report.docx"
-        )
-
+            try:
+                job["stage"] = "llm"
+                start_report_deadline()
+                text = await regenerate_section(data, model, section_name, sections, timings)
+                draft_store.update_section(report_id, section_name, text, model=model.model_name, prompt_version=PROMPT_VERSION)
+                sections[section_name] = text
+                if section_name == "analysis":
+                    data.result.aiGeneratedContent = text
+
+                job["stage"] = "render"
+                images = await image_prep.collect(image_tasks)
+                artifact, timings["render"] = await render_report(report_id, data, sections, images)
+                draft_store.update_timings(report_id, timings)
+                return artifact
+            finally:
+                image_prep.cancel(image_tasks)
+
+        return report_response(await run_cancellable(request, produce))
+
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        raise llm_unavailable(e)
+    except asyncio.TimeoutError:
+        logger.error(f"Regenerating {section_name} passed its deadline")
+        raise HTTPException(status_code=504, detail="Section regeneration timed out")
     except Exception as e:
-        print(f"Error in generate_report: {str(e)}")  # Log the error
+        logger.exception(f"Error regenerating {section_name}: {str(e)}")
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to generate report: {str(e)}"
+            detail=f"Failed to regenerate section: {str(e)}"
         )
 
 @app.post("/api/generate-ai-content")
 async def generate_ai_content(data: ProjectData):
     try:
-        # Configure Gemini API
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="GEMINI_API_KEY not set")
+        # Check that at least one API key is configured
+        if not configured_keys():
+            raise HTTPException(status_code=500, detail="GEMINI_API_KEYS or GEMINI_API_KEY not set")
+        check_input_limits(data)
         
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-pro')
-        chat = model.start_chat(history=[])
-
-        # Generate AI analysis
-        prompt = f"""Analyze the following code and its output, providing insights about:
-        1. The code's functionality and performance
-        2. Key patterns or interesting aspects in the output
-        3. Potential improvements or optimizations
-        4. Any notable technical achievements
-        5. within 100 words
-        Code: {data.projectCode}
-        Output: {data.result.codeOutput if data.result and data.result.codeOutput else 'No output provided'}
-        """
-        
-        ai_analysis = chat.send_message(prompt).text
+        model = get_model_for(data.quality)
+
+        # Same prompt as the report's analysis, so a report generated next reuses it
+        ai_analysis = await analyse_code(data, model)
         
         return {"aiContent": ai_analysis}
     
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        raise llm_unavailable(e)
     except Exception as e:
+        logger.exception(f"Error in generate_ai_content: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
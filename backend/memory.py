@@ -0,0 +1,202 @@
+"""
+Per-report memory budget: input size limits and peak RSS tracking.
+
+A report with a huge projectCode, a long codeOutput and many large images can
+spike a worker's memory through the python-docx tree, PIL and the zip writer.
+`check_inputs` rejects such requests before any LLM or rendering work starts.
+`track(stage)` records the process RSS high-water mark while a stage runs, by
+sampling /proc/self/statm every MEMORY_SAMPLE_MS. RSS is per process, so with
+reports running concurrently the peak of one also includes the others. The
+numbers are meant for capacity planning rather than exact attribution.
+
+Configuration (environment):
+    MAX_REQUEST_BODY_MB       request bodies larger than this are refused (default 4)
+    MAX_UPLOAD_BODY_MB        limit for multipart image uploads instead (default 60)
+    MAX_DESCRIPTION_KB        projectDescription limit (default 32)
+    MAX_PROJECT_CODE_KB       projectCode limit (default 256)
+    MAX_CODE_OUTPUT_KB        codeOutput limit (default 128)
+    MAX_RESULT_IMAGES         result images per report (default 10)
+    MAX_REPORT_IMAGES_MB      total size of a report's result images (default 40)
+    REPORT_IMAGE_MEMORY_MB    prepared image data kept in memory per report before
+                              the rest is embedded from disk (default 24)
+    MEMORY_SAMPLE_MS          RSS sampling interval while reports run (default 50)
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+MB = 1024 * 1024
+
+MAX_REQUEST_BODY_BYTES = int(float(os.getenv("MAX_REQUEST_BODY_MB", "4")) * MB)
+MAX_UPLOAD_BODY_BYTES = int(float(os.getenv("MAX_UPLOAD_BODY_MB", "60")) * MB)
+MAX_DESCRIPTION_CHARS = int(float(os.getenv("MAX_DESCRIPTION_KB", "32")) * 1024)
+MAX_PROJECT_CODE_CHARS = int(float(os.getenv("MAX_PROJECT_CODE_KB", "256")) * 1024)
+MAX_CODE_OUTPUT_CHARS = int(float(os.getenv("MAX_CODE_OUTPUT_KB", "128")) * 1024)
+MAX_RESULT_IMAGES = int(os.getenv("MAX_RESULT_IMAGES", "10"))
+MAX_REPORT_IMAGE_BYTES = int(float(os.getenv("MAX_REPORT_IMAGES_MB", "40")) * MB)
+REPORT_IMAGE_MEMORY_BYTES = int(float(os.getenv("REPORT_IMAGE_MEMORY_MB", "24")) * MB)
+
+_BYTE_BUCKETS = tuple(size * MB for size in (16, 32, 64, 128, 256, 512, 768, 1024, 1536, 2048, 4096))
+
+REJECTED = metrics.counter("zap_input_rejected_total", "Requests refused for exceeding an input size limit", ["limit"])
+PROCESS_RSS = metrics.gauge("zap_process_rss_bytes", "Resident set size at the last sample")
+PEAK_RSS = metrics.histogram(
+    "zap_report_peak_rss_bytes", "Process RSS high-water mark during a report stage", ["stage"], buckets=_BYTE_BUCKETS
+)
+RSS_GROWTH = metrics.histogram(
+    "zap_report_rss_growth_bytes", "Peak RSS above the level at the start of a report stage", ["stage"], buckets=_BYTE_BUCKETS
+)
+
+
+class InputTooLargeError(ValueError):
+    def __init__(self, limit: str, message: str):
+        super().__init__(message)
+        self.limit = limit
+
+
+def _reject(limit: str, message: str):
+    REJECTED.inc(limit=limit)
+    raise InputTooLargeError(limit, message)
+
+
+def body_limit(content_type: str):
+    """(limit name, max bytes) for a request body of this content type"""
+    if content_type.startswith("multipart/form-data"):
+        return "upload_body", MAX_UPLOAD_BODY_BYTES
+    return "request_body", MAX_REQUEST_BODY_BYTES
+
+
+def check_body_size(content_type: str, size: int) -> None:
+    """
+    Refuse a request body of `size` bytes: its declared Content-Length before
+    it is read, or the count received so far while it streams in.
+    """
+    limit, max_bytes = body_limit(content_type)
+    if size > max_bytes:
+        _reject(limit, f"Request body exceeds {max_bytes // MB} MB")
+
+
+def check_inputs(data, images_dir: str = None) -> None:
+    """
+    Raise InputTooLargeError if the text fields or result images of `data`
+    exceed their limits. Image sizes are only checked when `images_dir` is given.
+    """
+    for field, limit in (
+        ("projectDescription", MAX_DESCRIPTION_CHARS),
+        ("projectCode", MAX_PROJECT_CODE_CHARS),
+    ):
+        if len(getattr(data, field, None) or "") > limit:
+            _reject(field, f"{field} exceeds {limit // 1024} KB")
+
+    result = getattr(data, "result", None)
+    code_output = result.codeOutput if result is not None else getattr(data, "codeOutput", None)
+    if len(code_output or "") > MAX_CODE_OUTPUT_CHARS:
+        _reject("codeOutput", f"codeOutput exceeds {MAX_CODE_OUTPUT_CHARS // 1024} KB")
+    if result is None:
+        return
+    images = result.resultImages or []
+    if len(images) > MAX_RESULT_IMAGES:
+        _reject("resultImages", f"At most {MAX_RESULT_IMAGES} result images are allowed")
+    if images_dir is not None:
+        total = 0
+        for name in dict.fromkeys(images):
+            path = os.path.join(images_dir, name)
+            if os.path.isfile(path):
+                total += os.path.getsize(path)
+        if total > MAX_REPORT_IMAGE_BYTES:
+            _reject("image_bytes", f"Result images exceed {MAX_REPORT_IMAGE_BYTES // MB} MB in total")
+
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm", "rb") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class MemoryUsage:
+    """RSS at the start of a stage and the highest RSS seen since"""
+
+    def __init__(self, start: int):
+        self.start = start
+        self.peak = start
+
+    def observe(self, rss: int):
+        if rss > self.peak:
+            self.peak = rss
+
+    @property
+    def growth(self) -> int:
+        return self.peak - self.start
+
+
+class RssSampler:
+    """One background thread sampling RSS into every MemoryUsage being tracked; idle when there are none"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._active = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, usage: MemoryUsage):
+        with self._lock:
+            self._active.add(usage)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def remove(self, usage: MemoryUsage):
+        with self._lock:
+            self._active.discard(usage)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._wake.clear()
+                    continue
+            rss = current_rss()
+            if rss is not None:
+                PROCESS_RSS.set(rss)
+                for usage in active:
+                    usage.observe(rss)
+            time.sleep(self.interval)
+
+
+sampler = RssSampler(float(os.getenv("MEMORY_SAMPLE_MS", "50")) / 1000)
+
+
+@contextmanager
+def track(stage: str):
+    """
+    Track peak RSS while the block runs. Yields a MemoryUsage, or None where
+    RSS cannot be read; the result is exported per stage.
+    """
+    rss = current_rss()
+    if rss is None:
+        yield None
+        return
+    usage = MemoryUsage(rss)
+    sampler.add(usage)
+    try:
+        yield usage
+    finally:
+        sampler.remove(usage)
+        final = current_rss()
+        if final is not None:
+            usage.observe(final)
+        PEAK_RSS.observe(usage.peak, stage=stage)
+        RSS_GROWTH.observe(usage.growth, stage=stage)
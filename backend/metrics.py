@@ -0,0 +1,130 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+    CANCELLATIONS = counter("zap_generation_cancellations_total", "Cancelled generations", ["reason", "stage"])
+    CANCELLATIONS.inc(reason="client_disconnect", stage="llm")
+
+`render()` produces the text served by GET /api/metrics. Everything is kept
+in memory per process; there is no external dependency.
+"""
+import threading
+
+_registry = {}
+_lock = threading.Lock()
+
+DEFAULT_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+def _label_key(label_names, labels):
+    missing = set(label_names) - set(labels)
+    if missing:
+        raise ValueError(f"Missing labels: {', '.join(sorted(missing))}")
+    return tuple(str(labels[name]) for name in label_names)
+
+
+def _format_labels(label_names, key, extra=None):
+    pairs = list(zip(label_names, key)) + list(extra or [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    type_name = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.label_names, labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.label_names, labels), 0)
+
+    def samples(self):
+        with _lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {value}"
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        key = _label_key(self.label_names, labels)
+        with _lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.label_names, labels)
+        with _lock:
+            entry = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        # Copy under the lock: worker threads observe while this is formatted
+        with _lock:
+            values = sorted((key, list(entry)) for key, entry in self._values.items())
+        for key, entry in values:
+            for bound, count in zip(self.buckets, entry):
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, [('le', str(bound))])} {count}"
+            yield f"{self.name}_bucket{_format_labels(self.label_names, key, [('le', '+Inf')])} {entry[-1]}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, key)} {entry[-2]}"
+            yield f"{self.name}_count{_format_labels(self.label_names, key)} {entry[-1]}"
+
+
+def _register(metric_class, name, help_text, label_names, **kwargs):
+    with _lock:
+        existing = _registry.get(name)
+        if existing is not None:
+            return existing
+        metric = metric_class(name, help_text, label_names, **kwargs)
+        _registry[name] = metric
+        return metric
+
+
+def counter(name, help_text, label_names=()):
+    return _register(Counter, name, help_text, label_names)
+
+
+def gauge(name, help_text, label_names=()):
+    return _register(Gauge, name, help_text, label_names)
+
+
+def histogram(name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram, name, help_text, label_names, buckets=buckets)
+
+
+def render() -> str:
+    """All metrics in Prometheus text format"""
+    lines = []
+    for metric in list(_registry.values()):
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type_name}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,49 @@
+"""Request models shared by the API, the renderer and the batch CLI."""
+from pydantic import BaseModel
+from typing import List, Literal, Optional, Union
+
+class TeamMember(BaseModel):
+    name: str
+    rollNumber: str
+    gender: str
+
+class ProjectResult(BaseModel):
+    resultImages: Optional[List[str]] = None
+    codeOutput: Optional[str] = None
+    aiGeneratedContent: Optional[Union[str, bool]] = None
+
+class ProjectData(BaseModel):
+    projectDescription: str
+    projectCode: str
+    department: str
+    mainProfessor: str
+    mainProfessor_designation: str
+    professorDepartment: str
+    secondaryProfessor: Optional[str] = None
+    secondaryProfessor_designation: Optional[str] = None
+    course: str
+    teamMembers: List[TeamMember]
+    result: Optional[ProjectResult] = None
+    # "draft": shorter sections from the fast model, only DRAFT_SECTIONS generated
+    quality: Literal["draft", "final"] = "final"
+
+class SectionUpdate(BaseModel):
+    text: str
+
+class PrepareRequest(BaseModel):
+    projectDescription: str
+    projectCode: str
+    codeOutput: Optional[str] = None
+    quality: Literal["draft", "final"] = "final"
+
+def apply_report_defaults(data: ProjectData) -> ProjectData:
+    """Fill in defaults for required fields that were left empty"""
+    if not data.department or data.department == "":
+        data.department = "Computer Science"
+
+    if not data.professorDepartment or data.professorDepartment == "":
+        data.professorDepartment = "Computer Science & Engineering"
+
+    if not data.course or data.course == "":
+        data.course = "Technical Course"
+    return data
@@ -0,0 +1,182 @@
+"""
+Direct OOXML writer for report body content.
+
+Building the body through python-docx's object API costs a handful of lxml
+element creations and lookups per paragraph and run. For the parsed section
+content (content.Paragraph blocks) the markup is simple enough to emit from
+string templates and splice into the document in one parse, producing the
+same XML python-docx would: paragraph style IDs for "List Bullet",
+"List Bullet 2", "Heading 3" and "Title", justification, bold and font size
+runs, and tabs / line breaks inside run text.
+
+Rendered fragments of section text are kept in an in-process LRU keyed by a
+hash of the text, the style IDs and RENDERER_VERSION, so re-rendering a
+report whose sections did not change skips parsing and serialising them.
+Bump RENDERER_VERSION whenever the emitted markup changes.
+
+Configuration (environment):
+    FRAGMENT_CACHE_MB   size limit for cached fragments (default 32)
+"""
+import hashlib
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+
+import metrics
+from content import parse_text_content
+
+RENDERER_VERSION = 1
+
+_BODY_OPEN = f"<w:body {nsdecls('w')}>"
+# Every style a content block can use
+_BLOCK_STYLES = ("List Bullet", "List Bullet 2", "Heading 3", "Title")
+
+FRAGMENT_CACHE = metrics.counter(
+    "zap_fragment_cache_total", "Section fragment cache lookups by outcome", ["outcome"]
+)
+
+
+def _text_xml(text: str) -> str:
+    # Same rule as python-docx's CT_R.add_t
+    if len(text.strip()) < len(text):
+        return f'<w:t xml:space="preserve">{escape(text)}</w:t>'
+    return f"<w:t>{escape(text)}</w:t>"
+
+
+def _run_content_xml(text: str) -> str:
+    """Run content with tabs as <w:tab/> and line breaks as <w:br/>, as Run.text does"""
+    if "\t" not in text and "\n" not in text and "\r" not in text:
+        return _text_xml(text) if text else ""
+    out = []
+    pending = []
+    for char in text:
+        if char in "\t\r\n":
+            if pending:
+                out.append(_text_xml("".join(pending)))
+                pending = []
+            out.append("<w:tab/>" if char == "\t" else "<w:br/>")
+        else:
+            pending.append(char)
+    if pending:
+        out.append(_text_xml("".join(pending)))
+    return "".join(out)
+
+
+def run_xml(run) -> str:
+    props = ""
+    if run.bold:
+        props += "<w:b/>"
+    if run.size:
+        # w:sz is in half-points
+        props += f'<w:sz w:val="{int(run.size * 2)}"/>'
+    inner = (f"<w:rPr>{props}</w:rPr>" if props else "") + _run_content_xml(run.text)
+    return f"<w:r>{inner}</w:r>" if inner else "<w:r/>"
+
+
+def paragraph_xml(block, style_ids: dict) -> str:
+    props = ""
+    if block.style:
+        props += f'<w:pStyle w:val="{style_ids[block.style]}"/>'
+    if block.justify:
+        props += '<w:jc w:val="both"/>'
+    inner = (f"<w:pPr>{props}</w:pPr>" if props else "") + "".join(run_xml(run) for run in block.runs)
+    return f"<w:p>{inner}</w:p>" if inner else "<w:p/>"
+
+
+def blocks_xml(blocks, style_ids: dict) -> str:
+    """Serialized <w:p> elements for parsed content blocks (no namespace declarations)"""
+    return "".join(paragraph_xml(block, style_ids) for block in blocks)
+
+
+def style_ids(doc, names=_BLOCK_STYLES) -> dict:
+    """Map style names to the document's style IDs"""
+    return {name: doc.styles[name].style_id for name in names}
+
+
+def splice(doc, fragment: str):
+    """Insert a fragment of body-level elements at the end of the document body"""
+    if not fragment:
+        return
+    elements = list(parse_xml(_BODY_OPEN + fragment + "</w:body>"))
+    body = doc.element.body
+    sect_pr = body.sectPr
+    if sect_pr is None:
+        body.extend(elements)
+    else:
+        index = body.index(sect_pr)
+        body[index:index] = elements
+
+
+def append_blocks(doc, blocks):
+    names = {block.style for block in blocks if block.style}
+    splice(doc, blocks_xml(blocks, style_ids(doc, names)))
+
+
+class FragmentCache:
+    """Size-bounded LRU of rendered fragments"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> fragment, least recently used first
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is not None:
+                self._entries.move_to_end(key)
+            return fragment
+
+    def put(self, key: str, fragment: str):
+        size = len(fragment)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total -= len(previous)
+            self._entries[key] = fragment
+            self._total += size
+            while self._total > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._total -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total = 0
+
+
+fragment_cache = FragmentCache(int(float(os.getenv("FRAGMENT_CACHE_MB", "32")) * 1024 * 1024))
+
+
+# Style lookups walk styles.xml, so they are done once per document (keyed by its part)
+_document_style_ids = weakref.WeakKeyDictionary()
+
+
+def text_fragment(doc, text: str) -> str:
+    """Rendered paragraphs for section text, from the cache when the text was rendered before"""
+    ids = _document_style_ids.get(doc.part)
+    if ids is None:
+        ids = _document_style_ids[doc.part] = style_ids(doc)
+    digest = hashlib.sha256(f"{RENDERER_VERSION}\0{sorted(ids.items())}\0".encode())
+    digest.update(text.encode("utf-8", "surrogatepass"))
+    key = digest.hexdigest()
+    fragment = fragment_cache.get(key)
+    if fragment is not None:
+        FRAGMENT_CACHE.inc(outcome="hit")
+        return fragment
+    FRAGMENT_CACHE.inc(outcome="miss")
+    fragment = blocks_xml(parse_text_content(text), ids)
+    fragment_cache.put(key, fragment)
+    return fragment
+
+
+def append_text(doc, text: str):
+    splice(doc, text_fragment(doc, text))
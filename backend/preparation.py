@@ -0,0 +1,151 @@
+"""
+Speculative section generation ahead of /api/generate-report.
+
+The description and code are usually filled in long before the rest of the
+form. POST /api/prepare starts generating the title and body sections for
+them in the background and returns a token; /api/generate-report called with
+that token takes over the work, finished or still running, instead of asking
+the model again. A preparation is only used if the description, code, quality
+and model still match; otherwise it is cancelled and the report generates as
+usual.
+
+Unclaimed preparations are cancelled when they expire, when the same session
+prepares again (the user kept typing), or explicitly via DELETE.
+
+Preparations make the same LLM calls as a report, so they run under the
+admission controller as background jobs: they wait for a slot that no report
+is queued for. A preparation claimed before it got a slot is cancelled and the
+report generates its sections itself, in its own slot.
+
+Configuration (environment):
+    PREPARE_TTL_SECONDS    how long a preparation waits to be claimed (default 300)
+    PREPARE_MAX_PENDING    unclaimed preparations allowed at once (default 50)
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+PREPARATIONS = metrics.counter(
+    "zap_preparations_total",
+    "Speculative preparations by outcome (started, claimed, unstarted, stale, expired, replaced, cancelled, missing)",
+    ["outcome"],
+)
+PENDING = metrics.gauge("zap_preparations_pending", "Preparations waiting to be claimed")
+
+
+class PreparationLimitError(Exception):
+    pass
+
+
+def inputs_key(description: str, code: str, quality: str = "final") -> str:
+    """Identity of the inputs a preparation was started from"""
+    return hashlib.sha256(f"{quality}\0{description}\0{code}".encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class PreparationStore:
+    def __init__(self, ttl: float, max_pending: int):
+        self.ttl = ttl
+        self.max_pending = max_pending
+        # token -> {"task", "key", "model", "session_id", "created", "timer", "admitted"}
+        self._entries = {}
+
+    def start(self, key: str, model_name: str, work, session_id: str = None, slot=None) -> str:
+        """
+        Run `work()` in the background and return the token it can be claimed
+        with. With `slot` (an async context manager, e.g. an admission slot)
+        the work only starts once the slot is held.
+        """
+        if session_id:
+            for token, entry in list(self._entries.items()):
+                if entry["session_id"] == session_id:
+                    self._drop(token, "replaced")
+        if len(self._entries) >= self.max_pending:
+            raise PreparationLimitError("Too many reports are being prepared, please retry shortly")
+
+        token = secrets.token_urlsafe(16)
+        entry = {"admitted": slot is None}
+
+        async def run():
+            if slot is None:
+                return await work()
+            async with slot:
+                entry["admitted"] = True
+                return await work()
+
+        task = asyncio.create_task(run())
+        # Failures are reported to whoever claims the task; unclaimed ones only get logged
+        task.add_done_callback(self._log_failure)
+        self._entries[token] = entry
+        entry.update({
+            "task": task,
+            "key": key,
+            "model": model_name,
+            "session_id": session_id,
+            "created": time.monotonic(),
+            "timer": asyncio.get_running_loop().call_later(self.ttl, self._drop, token, "expired"),
+        })
+        PREPARATIONS.inc(outcome="started")
+        PENDING.set(len(self._entries))
+        return token
+
+    def claim(self, token: str, key: str, model_name: str):
+        """
+        Take over a preparation. Returns its task (done or running), or None if
+        the token is unknown or expired, the inputs or model changed since, or
+        it is still waiting for its slot.
+        """
+        entry = self._entries.get(token)
+        if entry is None:
+            PREPARATIONS.inc(outcome="missing")
+            return None
+        if entry["key"] != key or entry["model"] != model_name:
+            self._drop(token, "stale")
+            return None
+        if not entry["admitted"]:
+            # The claimer holds a slot of its own; waiting for a second one could deadlock
+            self._drop(token, "unstarted")
+            return None
+        self._forget(token)
+        PREPARATIONS.inc(outcome="claimed")
+        logger.info(f"Claimed preparation started {time.monotonic() - entry['created']:.1f}s ago "
+                    f"({'finished' if entry['task'].done() else 'still running'})")
+        return entry["task"]
+
+    def cancel(self, token: str) -> bool:
+        if token not in self._entries:
+            return False
+        self._drop(token, "cancelled")
+        return True
+
+    def _forget(self, token: str):
+        entry = self._entries.pop(token)
+        entry["timer"].cancel()
+        PENDING.set(len(self._entries))
+        return entry
+
+    def _drop(self, token: str, outcome: str):
+        if token not in self._entries:
+            return
+        entry = self._forget(token)
+        entry["task"].cancel()
+        PREPARATIONS.inc(outcome=outcome)
+        logger.info(f"Dropped preparation ({outcome})")
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Preparation failed: {task.exception()!r}")
+
+
+def open_default_store() -> PreparationStore:
+    return PreparationStore(
+        ttl=float(os.getenv("PREPARE_TTL_SECONDS", "300")),
+        max_pending=int(os.getenv("PREPARE_MAX_PENDING", "50")),
+    )
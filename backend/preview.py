@@ -0,0 +1,114 @@
+"""
+HTML preview of a report.
+
+Renders the title, table of contents, chapters and results from the same
+parsed content the docx renderer uses (content.parse_text_content), so a
+report can be reviewed in the browser in milliseconds instead of building and
+downloading a .docx. The front matter (certificate, declaration and
+acknowledgement pages) is summarised rather than reproduced.
+"""
+from html import escape
+from urllib.parse import quote
+
+from content import parse_text_content, report_outline
+
+_LIST_LEVELS = {"List Bullet": 1, "List Bullet 2": 2}
+
+_STYLE = """
+body { font-family: "Times New Roman", serif; font-size: 12pt; max-width: 48em; margin: 2em auto; padding: 0 1em; color: #111; }
+header { text-align: center; border-bottom: 1px solid #ccc; padding-bottom: 1em; }
+header h1 { color: #c00; font-size: 18pt; }
+h2 { font-family: Calibri, sans-serif; text-align: center; font-size: 20pt; margin-top: 2em; }
+p.justify { text-align: justify; }
+table.toc { border-collapse: collapse; margin: 1em auto; }
+table.toc td, table.toc th { border: 1px solid #888; padding: 0.2em 0.8em; }
+pre { background: #f6f6f6; padding: 0.8em; overflow-x: auto; white-space: pre-wrap; }
+#code p { white-space: pre-wrap; font-family: monospace; text-align: left; }
+.images img { max-width: 45%; margin: 0.5em; }
+"""
+
+
+def _runs_html(runs) -> str:
+    parts = []
+    for run in runs:
+        text = escape(run.text)
+        if run.size:
+            text = f'<span style="font-size:{run.size}pt">{text}</span>'
+        parts.append(f"<strong>{text}</strong>" if run.bold else text)
+    return "".join(parts)
+
+
+def blocks_html(blocks) -> str:
+    """HTML for parsed content paragraphs; consecutive bullets become (nested) lists"""
+    out = []
+    depth = 0
+    for block in blocks:
+        level = _LIST_LEVELS.get(block.style, 0)
+        while depth > level:
+            out.append("</ul>")
+            depth -= 1
+        while depth < level:
+            out.append("<ul>")
+            depth += 1
+        inner = _runs_html(block.runs)
+        if level:
+            out.append(f"<li>{inner}</li>")
+        elif block.style == "Heading 3":
+            out.append(f"<h3>{inner}</h3>")
+        else:
+            out.append(f'<p class="justify">{inner}</p>' if block.justify else f"<p>{inner}</p>")
+    out.append("</ul>" * depth)
+    return "\n".join(out)
+
+
+def _results_html(result) -> str:
+    out = []
+    if result.resultImages:
+        images = "".join(
+            f'<img src="/uploads/{quote(name)}?w=512" alt="{escape(name)}" loading="lazy">'
+            for name in result.resultImages
+        )
+        out.append(f'<div class="images">{images}</div>')
+    if result.codeOutput:
+        out.append(f"<p><strong>Code Output:</strong></p><pre>{escape(result.codeOutput)}</pre>")
+    if result.aiGeneratedContent:
+        out.append("<p><strong>Code &amp; Output Analysis:</strong></p>")
+        out.append(blocks_html(parse_text_content(str(result.aiGeneratedContent))))
+    return "\n".join(out)
+
+
+def render_preview_html(data, sections: dict) -> str:
+    """A self-contained HTML page for the report built from `data` and `sections`"""
+    outline = report_outline(data, sections)
+    team = ", ".join(f"{escape(m.name)} ({escape(m.rollNumber)})" for m in data.teamMembers)
+    guides = escape(data.mainProfessor)
+    if data.secondaryProfessor and data.secondaryProfessor.strip():
+        guides += " and " + escape(data.secondaryProfessor)
+
+    out = [
+        "<!DOCTYPE html>",
+        '<html><head><meta charset="utf-8">',
+        f"<title>{escape(sections['title'])}</title><style>{_STYLE}</style></head><body>",
+        "<header>",
+        "<p>A Course Based Project Report on</p>",
+        f"<h1>{escape(sections['title'])}</h1>",
+        f"<p>{escape(data.course)} &middot; Department of {escape(data.professorDepartment)}</p>",
+        f"<p>Submitted by {team}</p>",
+        f"<p>Under the guidance of {guides}</p>",
+        "</header>",
+        '<h2>TABLE OF CONTENTS</h2><table class="toc"><tr><th>Chapter</th><th>Title</th><th>Page</th></tr>',
+    ]
+    for idx, (name, _, page) in enumerate(outline, 1):
+        out.append(f'<tr><td>{idx}</td><td><a href="#{name.lower()}">{name}</a></td><td>{page}</td></tr>')
+    out.append("</table>")
+
+    for name, content, _ in outline:
+        out.append(f'<section id="{name.lower()}"><h2>{name.upper()}</h2>')
+        if name == "Results":
+            out.append(_results_html(content))
+        else:
+            out.append(blocks_html(parse_text_content(content)))
+        out.append("</section>")
+
+    out.append("</body></html>")
+    return "\n".join(out)
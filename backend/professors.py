@@ -0,0 +1,243 @@
+"""
+In-process professor directory with prefix/fuzzy autocomplete.
+
+Professors are loaded from a local JSON array or JSONL file (PROFESSORS_FILE,
+default proff_data.json next to this module) and can optionally be synced from
+a Mongo-compatible collection (MONGO_URI / MONGO_DB / MONGO_COLLECTION). Any
+object with a pymongo-style `find()` works as a source, so tests or local
+setups can pass a stand-in instead of a real server.
+
+Each (re)load builds a new immutable index and swaps it in with a single
+assignment, so lookups never see a half-built index and reloads do not need
+a restart. The file is also re-read automatically when its mtime changes.
+"""
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PROFESSORS_FILE = os.path.join(current_dir, "proff_data.json")
+
+# Honorifics ignored when matching names
+_HONORIFICS = {"dr", "prof", "mr", "mrs", "ms", "miss", "sri", "smt"}
+_SPLIT = re.compile(r"[^a-z0-9]+")
+
+
+def _tokens(text: str):
+    return [t for t in _SPLIT.split(text.lower()) if t and t not in _HONORIFICS]
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, drop punctuation and honorifics ("Dr. V. Baby" -> "v baby")"""
+    return " ".join(_tokens(name))
+
+
+def _trigrams(text: str):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _record(raw: dict):
+    """Map a source document onto the fields the report uses"""
+    name = (raw.get("name") or "").strip()
+    if not name:
+        return None
+    return {
+        "name": name,
+        "designation": (raw.get("designation") or "").strip(),
+        "department": (raw.get("department") or "").strip(),
+    }
+
+
+class _Index:
+    """Immutable search structures over one snapshot of the directory"""
+
+    def __init__(self, records):
+        self.records = records
+        self.normalized = [normalize_name(rec["name"]) for rec in records]
+        self.name_tokens = [n.split() for n in self.normalized]
+        self.gram_counts = []
+        self.by_name = {}
+        keys = []
+        self.trigrams = {}
+        for idx, normalized in enumerate(self.normalized):
+            self.by_name.setdefault(normalized, idx)
+            # Full normalized name plus every token, so "baby" and "v ba" both match
+            keys.append((normalized, idx))
+            for token in normalized.split():
+                keys.append((token, idx))
+            grams = _trigrams(normalized)
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                self.trigrams.setdefault(gram, []).append(idx)
+        keys.sort()
+        self.keys = [k for k, _ in keys]
+        self.key_ids = [i for _, i in keys]
+
+    def prefix(self, query: str):
+        """Record indices whose full name or any name token starts with query"""
+        start = bisect.bisect_left(self.keys, query)
+        found = {}
+        for pos in range(start, len(self.keys)):
+            key = self.keys[pos]
+            if not key.startswith(query):
+                break
+            idx = self.key_ids[pos]
+            # Rank full-name prefix matches ahead of token matches
+            rank = 0 if self.normalized[idx].startswith(query) else 1
+            found[idx] = min(rank, found.get(idx, rank))
+        return found
+
+    def fuzzy(self, query: str, exclude, limit: int, threshold: float = 0.3):
+        """Trigram-similarity matches for typos ("babby" -> "v baby")"""
+        grams = _trigrams(query)
+        counts = {}
+        for gram in grams:
+            for idx in self.trigrams.get(gram, ()):
+                counts[idx] = counts.get(idx, 0) + 1
+        scored = []
+        for idx, shared in counts.items():
+            if idx in exclude:
+                continue
+            score = shared / (len(grams) + self.gram_counts[idx] - shared)
+            if score >= threshold:
+                scored.append((-score, self.records[idx]["name"], idx))
+        scored.sort()
+        return [idx for _, _, idx in scored[:limit]]
+
+
+class ProfessorDirectory:
+    def __init__(self, path: str = None, reload_interval: float = 5.0):
+        self.path = path or os.getenv("PROFESSORS_FILE", DEFAULT_PROFESSORS_FILE)
+        self.reload_interval = reload_interval
+        self.source = None
+        self._index = _Index([])
+        self._mtime = None
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._index.records)
+
+    # Loading
+
+    def load_records(self, raw_records, source: str):
+        """Replace the directory contents with the given documents"""
+        records = [r for r in (_record(raw) for raw in raw_records) if r]
+        self._index = _Index(records)
+        self.source = source
+        logger.info(f"Loaded {len(records)} professors from {source}")
+        return len(records)
+
+    def load_file(self, path: str = None):
+        """Load a JSON array or JSONL file"""
+        path = path or self.path
+        with open(path, encoding="utf-8") as fh:
+            content = fh.read()
+        stripped = content.lstrip()
+        if stripped.startswith("["):
+            raw_records = json.loads(content)
+        else:
+            raw_records = [json.loads(line) for line in content.splitlines() if line.strip()]
+        self._mtime = os.path.getmtime(path)
+        return self.load_records(raw_records, path)
+
+    def sync_from_collection(self, collection):
+        """Load from any object with a pymongo-style find() (a real collection or a stand-in)"""
+        docs = collection.find({}, {"_id": 0, "name": 1, "designation": 1, "department": 1})
+        return self.load_records(list(docs), "mongo")
+
+    def sync_from_mongo(self, uri: str = None, db_name: str = None, collection_name: str = None):
+        """Load from MongoDB using MONGO_URI / MONGO_DB / MONGO_COLLECTION"""
+        import pymongo
+        from pymongo.server_api import ServerApi
+
+        uri = uri or os.getenv("MONGO_URI")
+        if not uri:
+            raise RuntimeError("MONGO_URI environment variable is not set")
+        client = pymongo.MongoClient(uri, server_api=ServerApi("1"), serverSelectionTimeoutMS=5000)
+        try:
+            collection = client[db_name or os.getenv("MONGO_DB", "zap")][collection_name or os.getenv("MONGO_COLLECTION", "professors")]
+            return self.sync_from_collection(collection)
+        finally:
+            client.close()
+
+    def reload(self):
+        """Reload from the configured file if present, otherwise from Mongo if configured"""
+        with self._reload_lock:
+            if os.path.exists(self.path):
+                return self.load_file()
+            if os.getenv("MONGO_URI"):
+                return self.sync_from_mongo()
+            logger.warning(f"No professor source found ({self.path} missing and MONGO_URI unset)")
+            return len(self)
+
+    def _maybe_reload(self):
+        """Pick up edits to the source file without a restart (checked at most every reload_interval)"""
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._mtime and self._reload_lock.acquire(blocking=False):
+            try:
+                self.load_file()
+            except Exception as e:
+                logger.error(f"Error reloading professor directory: {str(e)}")
+            finally:
+                self._reload_lock.release()
+
+    # Queries
+
+    def search(self, query: str, limit: int = 10):
+        """Autocomplete: prefix matches first, then fuzzy matches to fill up to limit"""
+        self._maybe_reload()
+        index = self._index
+        terms = normalize_name(query).split()
+        if not terms:
+            return []
+
+        # Candidates come from the full query and the most selective (longest) term;
+        # every query term then has to prefix-match one of the name's tokens
+        matches = index.prefix(" ".join(terms))
+        for idx, rank in index.prefix(max(terms, key=len)).items():
+            matches.setdefault(idx, rank + 1)
+        if len(terms) > 1:
+            matches = {
+                idx: rank for idx, rank in matches.items()
+                if all(any(t.startswith(term) for t in index.name_tokens[idx]) for term in terms)
+            }
+        ordered = sorted(matches, key=lambda idx: (matches[idx], index.records[idx]["name"]))[:limit]
+        if len(ordered) < limit:
+            ordered += index.fuzzy(" ".join(terms), set(ordered), limit - len(ordered))
+        return [dict(index.records[idx]) for idx in ordered]
+
+    def lookup(self, name: str):
+        """Exact (normalized) name match, or None"""
+        self._maybe_reload()
+        index = self._index
+        idx = index.by_name.get(normalize_name(name or ""))
+        return dict(index.records[idx]) if idx is not None else None
+
+    def autofill(self, data):
+        """Fill empty professor designation/department fields on a ProjectData from the directory"""
+        main = self.lookup(data.mainProfessor)
+        if main:
+            if not data.mainProfessor_designation:
+                data.mainProfessor_designation = main["designation"]
+            if not data.professorDepartment:
+                data.professorDepartment = main["department"]
+        if data.secondaryProfessor and not data.secondaryProfessor_designation:
+            secondary = self.lookup(data.secondaryProfessor)
+            if secondary:
+                data.secondaryProfessor_designation = secondary["designation"]
+        return data
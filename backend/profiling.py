@@ -0,0 +1,145 @@
+"""
+Opt-in sampling profiler for single requests.
+
+Disabled unless PROFILING_ENABLED=1 and PROFILING_TOKEN are set; main.py then
+registers a middleware that profiles a request sent with
+`X-Profile: <PROFILING_TOKEN>`. When disabled nothing is registered, so normal
+requests pay nothing.
+
+While a profiled request runs, a background thread samples the stacks of every
+thread in the process (the event loop and the worker threads that render
+reports) every PROFILING_INTERVAL_MS. Samples are written in the folded-stack
+format used by flamegraph.pl, speedscope and similar tools to
+PROFILING_DIR/<request id>-<timestamp>-<random>.folded, next to a small JSON summary. Only one
+request is profiled at a time; other requests running concurrently show up in
+the same samples, so profile on a quiet instance.
+
+Configuration (environment):
+    PROFILING_ENABLED       1 to allow profiling (default 0)
+    PROFILING_TOKEN         secret the X-Profile header must match
+    PROFILING_DIR           where profiles are written (default backend/profiles)
+    PROFILING_INTERVAL_MS   sampling interval (default 5)
+    PROFILING_MAX_SECONDS   stop sampling after this long (default 300)
+"""
+import hmac
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class StackSampler(threading.Thread):
+    """Samples every other thread's Python stack at a fixed interval"""
+
+    def __init__(self, interval: float, max_seconds: float):
+        super().__init__(name="profiler", daemon=True)
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks = Counter()
+        self.samples = 0
+        self._done = threading.Event()
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._done.wait(self.interval) and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(self._frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+class RequestProfiler:
+    def __init__(self, token: str, output_dir: str, interval_ms: float = 5, max_seconds: float = 300):
+        self.token = token
+        self.output_dir = output_dir
+        self.interval = interval_ms / 1000
+        self.max_seconds = max_seconds
+        self._busy = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def authorized(self, header_value: str) -> bool:
+        return bool(header_value) and hmac.compare_digest(header_value.encode(), self.token.encode())
+
+    def start(self):
+        """A running sampler, or None if another request is being profiled"""
+        if not self._busy.acquire(blocking=False):
+            return None
+        sampler = StackSampler(self.interval, self.max_seconds)
+        sampler.start()
+        return sampler
+
+    def abort(self, sampler: StackSampler):
+        """Stop sampling without writing anything"""
+        try:
+            sampler.stop()
+        finally:
+            self._busy.release()
+
+    def finish(self, sampler: StackSampler, request_id: str, method: str, path: str, duration_ms: float) -> str:
+        """Stop sampling and write the profile; returns the artifact name"""
+        self.abort(sampler)
+        # The suffix keeps a reused or hostile request ID from overwriting another profile
+        name = re.sub(r"[^A-Za-z0-9_-]", "_", request_id)[:64] or "request"
+        name = f"{name}-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        folded_path = os.path.join(self.output_dir, f"{name}.folded")
+        with open(folded_path, "w", encoding="utf-8") as fh:
+            for stack, count in sampler.stacks.most_common():
+                fh.write(f"{stack} {count}\n")
+
+        own = Counter()
+        for stack, count in sampler.stacks.items():
+            own[stack.rsplit(";", 1)[-1]] += count
+        summary = {
+            "request_id": request_id,
+            "method": method,
+            "path": path,
+            "duration_ms": round(duration_ms, 1),
+            "interval_ms": self.interval * 1000,
+            "samples": sampler.samples,
+            "top_frames": [{"frame": frame, "samples": count} for frame, count in own.most_common(25)],
+        }
+        with open(os.path.join(self.output_dir, f"{name}.json"), "w", encoding="utf-8") as fh:
+            json.dump(summary, fh, indent=2)
+        logger.info(f"Profiled {method} {path}: {sampler.samples} samples written to {folded_path}")
+        return name
+
+
+def open_default_profiler():
+    """The configured profiler, or None when profiling is disabled"""
+    if os.getenv("PROFILING_ENABLED", "0") != "1":
+        return None
+    token = os.getenv("PROFILING_TOKEN")
+    if not token:
+        logger.warning("PROFILING_ENABLED is set but PROFILING_TOKEN is not; profiling stays disabled")
+        return None
+    return RequestProfiler(
+        token,
+        os.getenv("PROFILING_DIR", os.path.join(current_dir, "profiles")),
+        interval_ms=float(os.getenv("PROFILING_INTERVAL_MS", "5")),
+        max_seconds=float(os.getenv("PROFILING_MAX_SECONDS", "300")),
+    )
@@ -0,0 +1,912 @@
+"""
+Docx rendering for project reports.
+
+Everything here is synchronous and free of FastAPI/LLM dependencies so it can
+be called from the API handlers (in a worker thread) or from the batch CLI
+(in a process pool).
+"""
+import datetime
+import logging
+import os
+from collections import OrderedDict
+
+from docx import Document
+from docx.shared import Pt, RGBColor, Inches
+from docx.enum.table import WD_ALIGN_VERTICAL, WD_TABLE_ALIGNMENT
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.oxml import ns
+from docx.oxml.shape import CT_Inline
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+
+import ooxml
+from content import Paragraph, Run, parse_text_content, report_outline
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+uploads_dir = os.path.join(current_dir, "uploads")
+logo_path = os.path.join(current_dir, "logo.jpg")
+
+# "xml" writes body paragraphs as OOXML strings (see ooxml.py); "docx" uses python-docx's API
+BODY_ENGINE = os.getenv("REPORT_BODY_ENGINE", "xml")
+
+def add_page_border(section):
+    """
+    Add a border around the page by modifying the section's XML.
+    """
+    sectPr = section._sectPr
+    if sectPr is None:
+        sectPr = OxmlElement('w:sectPr')
+        section._element.append(sectPr)
+
+    pgBorders = OxmlElement("w:pgBorders")
+    pgBorders.set(ns.qn('w:offsetFrom'), 'page')  # Ensure border is relative to page edge
+
+    # Set border attributes
+    for border in ["top", "left", "bottom", "right"]:
+        border_element = OxmlElement(f"w:{border}")
+        border_element.set(ns.qn("w:val"), "single")  # Single line border
+        border_element.set(ns.qn("w:sz"), "6")  # Border size (in eighths of a point)
+        border_element.set(ns.qn("w:space"), "24")  # Space between border and content in points
+        border_element.set(ns.qn("w:color"), "000000")  # Black color
+        pgBorders.append(border_element)
+
+    sectPr.append(pgBorders)
+
+def add_page_number(paragraph):
+    """
+    Add a centered page number to a paragraph.
+    """
+    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    page_num_run = paragraph.add_run()
+    fldChar1 = OxmlElement('w:fldChar')
+    fldChar1.set(qn('w:fldCharType'), 'begin')
+    instrText = OxmlElement('w:instrText')
+    instrText.set(qn('xml:space'), 'preserve')
+    instrText.text = 'PAGE'
+    fldChar2 = OxmlElement('w:fldChar')
+    fldChar2.set(qn('w:fldCharType'), 'end')
+    page_num_run._r.append(fldChar1)
+    page_num_run._r.append(instrText)
+    page_num_run._r.append(fldChar2)
+
+def add_blocks(doc, blocks):
+    """Append parsed content paragraphs (see content.parse_text_content) to the document"""
+    if BODY_ENGINE == "xml":
+        ooxml.append_blocks(doc, blocks)
+        return
+    for block in blocks:
+        paragraph = doc.add_paragraph(style=block.style)
+        if block.justify:
+            paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
+        for spec in block.runs:
+            run = paragraph.add_run(spec.text)
+            if spec.bold:
+                run.bold = True
+            if spec.size:
+                run.font.size = Pt(spec.size)
+
+def format_text_content(doc, text_content):
+    """
+    Format text content with proper styling for bullets, bold text, and headers.
+    
+    Args:
+        doc: The Document object
+        text_content: The text content to format
+    """
+    if BODY_ENGINE == "xml":
+        # Unchanged text is spliced from the fragment cache without re-parsing
+        ooxml.append_text(doc, text_content)
+        return
+    add_blocks(doc, parse_text_content(text_content))
+
+def make_table_invisible(table):
+    """Helper function to make table borders invisible"""
+    tbl = table._element
+    tblPr = tbl.xpath('w:tblPr')
+    if not tblPr:
+        tblPr = OxmlElement('w:tblPr')
+        tbl.insert(0, tblPr)
+    else:
+        tblPr = tblPr[0]
+
+    # Create border element
+    tblBorders = OxmlElement('w:tblBorders')
+
+    # Add all border types
+    for border_type in ['top', 'left', 'bottom', 'right', 'insideH', 'insideV']:
+        border = OxmlElement(f'w:{border_type}')
+        border.set(qn('w:val'), 'none')
+        border.set(qn('w:sz'), '0')
+        border.set(qn('w:space'), '0')
+        border.set(qn('w:color'), 'auto')
+        tblBorders.append(border)
+
+    # Remove any existing borders
+    existing_borders = tblPr.find(qn('w:tblBorders'))
+    if existing_borders is not None:
+        tblPr.remove(existing_borders)
+
+    # Add new border settings
+    tblPr.append(tblBorders)
+
+def add_prepared_picture(run, prepared):
+    """Run.add_picture for an image loaded and sized ahead of time (see image_prep.py)"""
+    part = run.part
+    image_parts = part.package.image_parts
+    image_part = image_parts._get_by_sha1(prepared.image.sha1) or image_parts._add_image_part(prepared.image)
+    rId = part.relate_to(image_part, RT.IMAGE)
+    # Like add_picture, name it after the image already in the package when the content repeats
+    filename = image_part.image.filename
+    run._r.add_drawing(CT_Inline.new_pic_inline(part.next_id, rId, filename, prepared.cx, prepared.cy))
+
+def _add_result_image(cell, filename, images):
+    """Embed one result image, prepared if possible, otherwise read from uploads_dir"""
+    try:
+        paragraph = cell.paragraphs[0]
+        paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+        run = paragraph.add_run()
+        prepared = images.get(filename) if images else None
+        with span("image.embed", filename=filename, prepared=prepared is not None):
+            if prepared is not None:
+                add_prepared_picture(run, prepared)
+            else:
+                run.add_picture(os.path.join(uploads_dir, filename), width=Inches(2.5))
+    except Exception as e:
+        logger.error(f"Error adding image {filename}: {str(e)}")
+
+def _add_results_section(doc, result, title_style, project_code, images=None):
+    """Helper function to add the Results section to the document"""
+    section = doc.sections[-1]
+    add_page_border(section)
+
+    # Add Results title
+    add_blocks(doc, [Paragraph([Run("RESULTS", bold=True)], "Title")])
+
+    # Add result images if they exist
+    if result and result.resultImages and len(result.resultImages) > 0:
+        # Create a table for images with 2 columns
+        image_table = doc.add_table(rows=0, cols=2)
+        image_table.autofit = False
+        image_table.columns[0].width = Inches(3)
+        image_table.columns[1].width = Inches(3)
+
+        # Add images in pairs
+        for i in range(0, len(result.resultImages), 2):
+            row = image_table.add_row()
+            _add_result_image(row.cells[0], result.resultImages[i], images)
+            # Second image (if exists)
+            if i + 1 < len(result.resultImages):
+                _add_result_image(row.cells[1], result.resultImages[i + 1], images)
+
+        # Add space after images
+        doc.add_paragraph()
+
+    # Add code output if it exists
+    if result and result.codeOutput:
+        # Add a heading for code output, then the output itself (line breaks kept)
+        add_blocks(doc, [
+            Paragraph([Run("Code Output:", bold=True)]),
+            Paragraph([Run(result.codeOutput)]),
+        ])
+
+    # Add AI content if it exists
+    if result and result.aiGeneratedContent:
+        # Add a heading for AI analysis, then the formatted AI content
+        add_blocks(doc, [Paragraph([Run("Code & Output Analysis:", bold=True)])])
+        format_text_content(doc, str(result.aiGeneratedContent))
+
+    # Add page break after Results section
+    doc.add_page_break()
+
+def create_project_report(data, sections, report_path, images=None):
+    """
+    Build the full report document and save it to report_path.
+
+    Args:
+        data: The ProjectData from the request
+        sections: Generated section text keyed by "title", "abstract",
+            "introduction", "objectives", "methodology" and "conclusion"
+        report_path: Where to write the .docx
+        images: Optional image_prep.PreparedImage by result image filename;
+            other result images are read from uploads_dir
+    """
+    #### Date
+    # Get the current year and format it as "YYYY-YYYY+1"
+    current_year = datetime.datetime.now().year
+    formatted_year = f"{current_year}-{current_year + 1}"
+
+    title_text = sections["title"]
+
+    # Extract data from the request payload
+    team_members = data.teamMembers
+    project_code = data.projectCode
+    department = data.department
+    main_professor = data.mainProfessor
+    main_professor_designation = data.mainProfessor_designation
+    professor_department = data.professorDepartment
+    secondary_professor = data.secondaryProfessor
+    secondary_professor_designation = data.secondaryProfessor_designation
+    course = data.course
+    result = data.result if data.result else None
+
+    # Combine into lists for easier processing
+    n_s = [member.name for member in team_members]
+    r_s = [member.rollNumber for member in team_members]
+    g_s = [member.gender for member in team_members]
+
+    # Create a new document
+    doc = Document()
+
+    # Add page borders to the first section
+    add_page_border(doc.sections[0])
+
+    # Add page numbers to the footer of all sections
+    for section in doc.sections:
+        footer = section.footer
+        paragraph = footer.paragraphs[0] if footer.paragraphs else footer.add_paragraph()
+        add_page_number(paragraph)
+
+    # Set default font to Times New Roman
+    style = doc.styles["Normal"]
+    font = style.font
+    font.name = "Times New Roman"
+    font.size = Pt(12)
+
+    # Title section
+    title = doc.add_paragraph()
+    title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    run = title.add_run("A Course Based Project Report on\n")
+    run.font.size = Pt(14)
+    run.font.color.rgb = RGBColor(0, 0, 139)
+
+    run = title.add_run(title_text)
+    run.bold = True
+    run.font.size = Pt(18)
+    run.font.color.rgb = RGBColor(255, 0, 0)
+
+    run = title.add_run("Submitted to the\n")
+    run.font.size = Pt(14)
+    run.font.color.rgb = RGBColor(0, 0, 139)
+
+    run = title.add_run("Department of " + professor_department + "\n")
+    run.bold = True
+    run.font.size = Pt(16)
+    run.font.color.rgb = RGBColor(0, 0, 139)
+
+    run = title.add_run(
+        "in partial fulfilment of the requirements for the completion of course\n"
+    )
+    run.font.size = Pt(12)
+    run.font.color.rgb = RGBColor(0, 0, 139)
+
+    run = title.add_run(course + "\n\n")
+    run.font.size = Pt(12)
+    run.font.color.rgb = RGBColor(0, 0, 0)
+
+    run = title.add_run("BACHELOR OF TECHNOLOGY\n")
+    run.bold = True
+    run.font.size = Pt(14)
+    run.font.color.rgb = RGBColor(255, 0, 0)
+
+    run = title.add_run("in\n")
+    run.bold = True
+    run.font.size = Pt(12)
+    run.font.color.rgb = RGBColor(0, 0, 0)
+
+    run = title.add_run("Department of " + professor_department)
+    run.bold = True
+    run.font.size = Pt(16)
+    run.font.color.rgb = RGBColor(255, 0, 0)
+
+    # Submitted by section (Combined alignments)
+    submitted_by = doc.add_paragraph()
+    submitted_by.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER  # Center "Submitted by"
+    run = submitted_by.add_run("Submitted by\n")
+    run.font.size = Pt(14)
+    run.font.color.rgb = RGBColor(0, 0, 0)
+
+    students = []
+    for member in team_members:
+        students.append([member.name, member.rollNumber])
+
+    table = doc.add_table(rows=len(students), cols=2)
+    table.autofit = False
+    table.columns[0].width = Pt(250)
+    table.columns[1].width = Pt(100)
+    make_table_invisible(table)
+
+    # Indent the table to the right (adjust Pt value as needed)
+    # 1 inch indentation
+
+    for i, (name, roll_no) in enumerate(students):
+        row_cells = table.rows[i].cells
+        # Add spaces before the name:
+        padded_name = "                " + name  # Six spaces
+        padded_roll_no = "                   " + roll_no
+        row_cells[0].text = padded_name
+        row_cells[1].text = padded_roll_no
+
+        for cell in row_cells:
+            paragraph = cell.paragraphs[0]
+            paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT  # Right-align cell content
+            for run in paragraph.runs:
+                run.font.size = Pt(12)
+                run.font.color.rgb = RGBColor(0, 0, 139)
+
+    # Under the guidance of section
+    guidance = doc.add_paragraph()
+    guidance.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    run = guidance.add_run("Under the guidance of\n")
+    run.font.size = Pt(14)
+    run.font.color.rgb = RGBColor(0, 0, 0)
+
+    run = guidance.add_run(main_professor + "\n")
+    run.bold = True
+    run.font.size = Pt(14)
+    run.font.color.rgb = RGBColor(0, 0, 139)
+
+    run = guidance.add_run(
+        main_professor_designation
+        + ", Department of "
+        + professor_department
+        + " VNRVJIET"
+    )
+    run.bold = True
+    run.font.size = Pt(14)
+    run.font.color.rgb = RGBColor(0, 0, 0)
+
+    image_placeholder = doc.add_paragraph()
+    image_placeholder.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    # Add the image with the correct method
+    image_placeholder.add_run().add_picture(
+        logo_path, width=Inches(1), height=Inches(1)
+    )
+
+    header = doc.add_paragraph()
+    header.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    run = header.add_run(
+        "VALLURUPALLI NAGESWARA RAO VIGNANA JYOTHI INSTITUTE OF ENGINEERING AND TECHNOLOGY\n"
+    )
+    run.bold = True
+    run.font.size = Pt(14)
+    run.font.color.rgb = RGBColor(0, 0, 139)
+
+    run = header.add_run(
+        "An Autonomous Institute, NAAC Accredited with 'A++' Grade, NBA Accredited for CE, EEE, ME, ECE, CSE, EIE, IT B. Tech Courses, Approved by AICTE, New Delhi, Affiliated to JNTUH, Recognized as 'College with Potential for Excellence' by UGC, ISO 9001:2015 Certified, QS I GUAGE Diamond Rated\n"
+    )
+    run.font.size = Pt(10)
+    run.font.color.rgb = RGBColor(255, 0, 0)
+
+    run = header.add_run(
+        "Vignana Jyothi Nagar, Pragathi Nagar, Nizampet(SO), Hyderabad-500090, TS, India\n"
+    )
+    run.font.size = Pt(10)
+    run.font.color.rgb = RGBColor(0, 0, 139)
+
+    run = header.add_run("Department of " + professor_department)
+    run.bold = True
+    run.font.size = Pt(12)
+    run.font.color.rgb = RGBColor(255, 0, 0)
+
+    #####################################Add a page break########################################################################
+    doc.add_page_break()
+    # Certificate page
+    section = doc.sections[-1]
+    add_page_border(section)
+
+    header = doc.add_paragraph()
+    header.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    run = header.add_run(
+        "VALLURUPALLI NAGESWARA RAO VIGNANA JYOTHI INSTITUTE OF ENGINEERING AND TECHNOLOGY\n"
+    )
+    run.bold = True
+    run.font.size = Pt(14)
+    run.font.color.rgb = RGBColor(0, 0, 139)
+
+    run = header.add_run(
+        "An Autonomous Institute, NAAC Accredited with 'A++' Grade, NBA Accredited for CE, EEE, ME, ECE, CSE, EIE, IT B. Tech Courses, Approved by AICTE, New Delhi, Affiliated to JNTUH, Recognized as 'College with Potential for Excellence' by UGC, ISO 9001:2015 Certified, QS I GUAGE Diamond Rated\n"
+    )
+    run.font.size = Pt(10)
+    run.font.color.rgb = RGBColor(255, 0, 0)
+
+    run = header.add_run(
+        "Vignana Jyothi Nagar, Pragathi Nagar, Nizampet(SO), Hyderabad-500090, TS, India\n\n"
+    )
+    run.font.size = Pt(10)
+    run.font.color.rgb = RGBColor(0, 0, 139)
+
+    run = header.add_run("Department of " + professor_department + "\n\n")
+    run.bold = True
+    run.font.size = Pt(12)
+    run.font.color.rgb = RGBColor(255, 0, 0)
+
+    # Leave space for image
+    # Add a new paragraph for the image
+    image_placeholder = doc.add_paragraph()
+    image_placeholder.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    # Add the image with the correct method
+    image_placeholder.add_run().add_picture(
+        logo_path, width=Inches(1), height=Inches(1)
+    )  # Adjust width as necessary
+
+    # Optionally, you can set additional formatting to the image's caption if needed
+
+    run = header.add_run("CERTIFICATE\n\n")
+    run.bold = True
+    run.font.size = Pt(15)
+    run.font.color.rgb = RGBColor(0, 128, 0)
+    run.underline = True
+
+    certificate = doc.add_paragraph()
+    certificate.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
+    certificate.space_after = Pt(12)  # Add space after the paragraph
+
+    run = certificate.add_run("This is to certify that the project report entitled ")
+    run.font.size = Pt(12)
+
+    run = certificate.add_run('"' + title_text + '"')
+    run.font.color.rgb = RGBColor(0, 0, 139)
+    run.bold = True
+    run.font.size = Pt(12)
+
+    run = certificate.add_run(
+        "is a bonafide work done under our supervision and is being submitted by "
+    )
+    run.font.size = Pt(12)
+
+    students = [
+        f"{'Mr.' if gender == 'm' else 'Miss.'} {name} ({roll})"
+        for name, roll, gender in zip(n_s, r_s, g_s)
+    ]
+
+    for i, student in enumerate(students):
+        run = certificate.add_run(student)
+        run.font.size = Pt(12)
+        run.bold = True
+        run.font.color.rgb = RGBColor(0, 128, 0)
+        if i < len(students) - 1:
+            run = certificate.add_run(", ")
+            run.bold = True
+            run.font.size = Pt(12)
+
+    run = certificate.add_run(
+        "in partial fulfillment for the award of the degree of "
+    )
+    run.font.size = Pt(12)
+
+    run = certificate.add_run("Bachelor of Technology ")
+    run.font.size = Pt(12)
+    run.bold = True
+    run.font.color.rgb = RGBColor(0, 0, 255)  # Blue color
+
+    run = certificate.add_run(
+        "in" + department + ", "
+    )
+    run.font.size = Pt(12)
+
+    run = certificate.add_run(
+        "of the VNR VJIET, Hyderabad during the academic year "
+        + formatted_year
+        + ".\n\n\n\n"
+    )
+    run.font.size = Pt(12)
+
+    # After acknowledgment, before TOC
+    # Determine HOD based on department
+    if department == "Computer Science & Engineering":
+        hod_name = "Dr. V. Baby"
+    elif department == "Electrical and Electronics Engineering":
+        hod_name = "Dr.V. Ramesh Babu"
+    elif department == "Electronics and Communication Engineering":
+        hod_name = "Dr L Padma Sree"
+    elif department == "Mechanical Engineering":
+        hod_name = "Dr. B.V.R. Ravi Kumar"
+    elif department == "Electronics and Instrumentation Engineering":
+        hod_name = "Dr. S. Pranavanand"
+    elif department == "Civil Engineering":
+        hod_name = "Dr. K. Ramujee"
+    elif department == "Automobile Engineering":
+        hod_name = "Dr.Shaik Amjad"
+    elif department == "Artificial Intelligence & Data Science":
+        hod_name = "Dr.T.Sunil Kumar"
+    elif department == "CSE-Cyber Security":
+        hod_name = "Dr.T.Sunil Kumar"
+    elif department == "CSE-Data Science":
+        hod_name = "Dr.T.Sunil Kumar"
+    elif department == "Computer Science and Business Systems":
+        hod_name = "Dr. V. Baby"
+    elif department == "CSE-AIML":
+        hod_name = "Dr.Sagar Yeruva"
+    elif department == "CSE-IoT":
+        hod_name = "Dr.Sagar Yeruva"
+    elif department == "Information Technology":
+        hod_name = "Dr N Mangathayaru"
+    else:
+        hod_name = "Department Head"  # Default value
+
+    # Create signatures table
+    signatures = doc.add_table(rows=4, cols=2)  # 4 rows now
+    signatures.autofit = False
+    signatures.style.paragraph_format.space_before = Pt(12)
+
+    # Set column widths
+    signatures.columns[0].width = Inches(2.5)
+    signatures.columns[1].width = Inches(2.5)
+
+    # --- Project Guide ---
+    cell = signatures.cell(0, 0)
+    cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+    p = cell.paragraphs[0]
+    p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+    run = p.add_run(main_professor)
+    run.bold = True
+    run.font.color.rgb = RGBColor(255, 0, 0)
+    run.font.size = Pt(12)
+
+    cell = signatures.cell(1, 0)
+    cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+    p = cell.paragraphs[0]
+    p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+    run = p.add_run(main_professor_designation)
+    run.font.size = Pt(11)
+
+    cell = signatures.cell(2, 0)
+    cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+    p = cell.paragraphs[0]
+    p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+    run = p.add_run("Dept of " + professor_department)
+    run.font.color.rgb = RGBColor(255, 0, 0)
+    run.font.size = Pt(11)
+
+    # --- HOD ---
+    cell = signatures.cell(0, 1)
+    cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+    p = cell.paragraphs[0]
+    p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+    run = p.add_run("          " + hod_name)
+    run.font.color.rgb = RGBColor(255, 0, 0)
+    run.bold = True
+    run.font.size = Pt(12)
+
+    cell = signatures.cell(1, 1)
+    cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+    p = cell.paragraphs[0]
+    p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+    run = p.add_run("            " + "Professor & HOD")
+    run.font.size = Pt(11)
+
+    cell = signatures.cell(2, 1)
+    cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+    p = cell.paragraphs[0]
+    p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+    run = p.add_run("            " + "Dept of " + department)
+    run.font.color.rgb = RGBColor(255, 0, 0)
+    run.font.size = Pt(11)
+
+    ########################3rd page#######################################################################################################
+    doc.add_page_break()
+    section = doc.sections[-1]
+    add_page_border(section)
+
+    # Title Section
+    title = doc.add_paragraph()
+    title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    run = title.add_run("Course based Projects Reviewer\n")
+    run.font.size = Pt(14)
+    run.bold = True
+    run.font.color.rgb = RGBColor(0, 0, 139)
+
+    run = title.add_run(
+        "VALLURUPALLI NAGESWARA RAO VIGNANA JYOTHI INSTITUTE OF ENGINEERING AND TECHNOLOGY\n"
+    )
+    run.font.size = Pt(12)
+    run.bold = True
+    run.font.color.rgb = RGBColor(255, 0, 0)
+
+    run = title.add_run(
+        "An Autonomous Institute, NAAC Accredited with 'A++' Grade,\nVignana Jyothi Nagar, Pragathi Nagar, Nizampet(SO), Hyderabad-500090, TS, India\n\n"
+    )
+    run.font.size = Pt(10)
+    run.font.color.rgb = RGBColor(0, 0, 139)
+
+    run = title.add_run("Department of " + professor_department + "\n")
+    run.bold = True
+    run.font.size = Pt(12)
+    run.font.color.rgb = RGBColor(255, 0, 0)
+
+    # Image Placeholder
+    doc.add_picture(
+        logo_path, width=Inches(1), height=Inches(1)
+    )  # Adjust path and width
+    doc.paragraphs[-1].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    # Declaration Section
+    declaration_title = doc.add_paragraph()
+    declaration_title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    run = declaration_title.add_run("DECLARATION\n")
+    run.bold = True
+    run.font.size = Pt(14)
+    run.font.color.rgb = RGBColor(255, 0, 0)
+    run.underline = True
+
+    declaration = doc.add_paragraph()
+    declaration.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
+
+    # 1. Project Title (Blue)
+    run = declaration.add_run(
+        "We declare that the course-based project work entitled "
+    )
+    run.font.size = Pt(12)
+    run.font.color.rgb = RGBColor(0, 0, 0)  # Black
+
+    run = declaration.add_run('"' + title_text + '"')
+    run.font.size = Pt(12)
+    run.font.color.rgb = RGBColor(0, 0, 255)  # Blue
+    run.bold = True
+
+    run = declaration.add_run("submitted in the ")
+    run.font.size = Pt(12)
+    run.font.color.rgb = RGBColor(0, 0, 0)  # Black
+
+    # 2. Department Name (Red)
+    run = declaration.add_run("Department of " + professor_department + ", ")
+    run.font.size = Pt(12)
+    run.font.color.rgb = RGBColor(255, 0, 0)  # Red
+
+    run = declaration.add_run(
+        "Vallurupalli Nageswara Rao Vignana Jyothi Institute of Engineering and Technology, Hyderabad, in partial fulfillment of the requirement for the award of the degree of"            )
+    run.font.size = Pt(12)
+    run.font.color.rgb = RGBColor(0, 0, 0)  # Black
+
+    # 3. Degree Name (Blue)
+    run = declaration.add_run("Bachelor of Technology in " + department + ", ")
+    run.font.size = Pt(12)
+    run.font.color.rgb = RGBColor(0, 0, 255)  # Blue
+    run.bold = True
+
+    run = declaration.add_run(
+        "is a bonafide record of our own work carried out under the supervision of "
+    )
+    run.font.size = Pt(12)
+    run.font.color.rgb = RGBColor(0, 0, 0)  # Black
+
+    # Create supervisors list conditionally
+    supervisors = [f"{main_professor}, {main_professor_designation}, Department of {professor_department}, VNRVJIET"]
+
+    # Only add secondary professor if provided and not empty
+    if secondary_professor and secondary_professor.strip():
+        supervisors.append(f"{secondary_professor}, {secondary_professor_designation}, Department of {professor_department}, VNRVJIET")
+
+    # Use supervisors list in the document
+    for i, supervisor in enumerate(supervisors):
+        run = declaration.add_run(str(supervisor))  # Convert to string explicitly
+        run.font.size = Pt(12)
+        run.font.color.rgb = RGBColor(0, 128, 0)  # Green
+        if i < len(supervisors) - 1:
+            run = declaration.add_run(" and ")  # Add "and" between supervisors only if there are multiple
+
+    # ______________________________________________Increase Word Spacing for the entire paragraph_______________________________________________________________________________________________
+    declaration.paragraph_format.word_spacing = 2.5  # 125% of normal spacing
+
+    run = declaration.add_run(
+        ". Also, we declare that the matter embodied in this thesis has not been submitted by us in full or in any part thereof for the award of any degree of any other institution or university previously.\n\n"
+    )
+    run.font.size = Pt(12)
+    run.font.color.rgb = RGBColor(0, 0, 0)  # Black
+
+    # Place
+    place = doc.add_paragraph()
+    place.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+    run = place.add_run("Place: Hyderabad.")
+    run.font.size = Pt(12)
+
+    # Create a table
+    student_table = doc.add_table(rows=1, cols=4)
+    student_table.autofit = False
+    make_table_invisible(student_table)
+
+    # Set column widths and add student details
+    col_widths = [Inches(1.5), Inches(1.5), Inches(1.5), Inches(1.5)]
+    for col, width in zip(student_table.columns, col_widths):
+        col.width = width
+
+    students = [
+        (member.name for member in team_members),
+        (member.rollNumber for member in team_members)
+    ]
+
+    for student_row in students:
+        row = student_table.add_row()
+        for cell, text in zip(row.cells, student_row):
+            cell.text = text
+            for paragraph in cell.paragraphs:
+                paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+                for run in paragraph.runs:
+                    run.font.size = Pt(12)
+
+    # Remove table borders
+    make_table_invisible(table)
+
+    # Add some space after the table
+    doc.add_paragraph()
+
+    ###############4th page ##########################################################################################################
+
+    doc.add_page_break()
+    section = doc.sections[-1]
+    add_page_border(section)
+
+    ack_heading = doc.add_paragraph()
+    ack_heading.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    run = ack_heading.add_run("ACKNOWLEDGEMENT")
+    run.font.bold = True
+    run.font.size = Pt(16)
+    run.font.color.rgb = RGBColor(255, 0, 0)  # Red color
+
+    # Add the acknowledgment content
+    ack_content = (
+        "We express our deep sense of gratitude to our beloved President, "
+        "Sri.D.Suresh Babu, VNR Vignana Jyothi Institute of Engineering & Technology for the "
+        "valuable guidance and for permitting us to carry out this project.\n\n"
+        "With immense pleasure, we record our deep sense of gratitude to our beloved Principal, "
+        "Dr.C.D Naidu, for permitting us to carry out this project.\n\n"
+        f"We express our deep sense of gratitude to our beloved Professor {main_professor}, "
+        f"Professor and Head, Department of {department}, VNR Vignana Jyothi "
+        "Institute of Engineering & Technology, Hyderabad-500090 for the valuable guidance and suggestions, "
+        "keen interest and through encouragement extended throughout the period of project work.\n\n"
+        "We take immense pleasure to express our deep sense of gratitude to our beloved Guide, "
+        f"{main_professor}, {main_professor_designation}, Department of {department}, "
+        "VNR Vignana Jyothi Institute of Engineering & Technology, Hyderabad, for his/her valuable suggestions "
+        "and rare insights, for constant source of encouragement and inspiration throughout my project work.\n\n"
+        "We express our thanks to all those who contributed for the successful completion of our project work."
+    )
+    paragraph = doc.add_paragraph(ack_content)
+    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
+    for run in paragraph.runs:
+        run.font.size = Pt(12)
+
+    # Add a table for names and roll numbers
+    names_and_roll_numbers = [["Name", "Roll Number"]] + [
+        [member.name, member.rollNumber] for member in team_members
+    ]
+
+    # Create a table with a header row
+    table = doc.add_table(rows=1, cols=2)
+
+    # Add data rows
+    for name, roll_number in names_and_roll_numbers[0:]:
+        row_cells = table.add_row().cells
+        name = "               " + name
+        roll_number = "                    " + roll_number
+        row_cells[0].text = name
+        row_cells[1].text = roll_number
+
+    # Apply styling to table rows
+    for row in table.rows:
+        for cell in row.cells:
+            for paragraph in cell.paragraphs:
+                paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT  # Left-align text
+                for run in paragraph.runs:
+                    run.font.size = Pt(12)
+
+    # Remove table borders
+    tbl = table._element
+    tblBorders = tbl.xpath(".//w:tblBorders")
+    for tblBorder in tblBorders:
+        tblBorder.getparent().remove(tblBorder)
+
+    doc.add_page_break()
+
+    # Define styles for titles and body text
+    title_style = doc.styles["Title"]
+    title_style.font.name = "Calibri"
+    title_style.font.size = Pt(20)
+    title_style.font.bold = True
+    title_style.paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    body_style = doc.styles["Body Text"]
+    body_style.font.name = "Times New Roman"
+    body_style.font.size = Pt(14)
+
+
+    # Chapters in document order with their starting page numbers
+    outline = report_outline(data, sections)
+    sections = OrderedDict((name, content) for name, content, _ in outline)
+    page_numbers = {name: page for name, _, page in outline}
+
+    # Add TOC page (Page 4)
+    section = doc.sections[-1]
+    add_page_border(section)
+
+    # Create TOC title
+    toc_title = doc.add_paragraph()
+    toc_title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    run = toc_title.add_run("TABLE OF CONTENTS")
+    run.font.bold = True
+    run.font.size = Pt(16)
+    run.font.color.rgb = RGBColor(255, 0, 0)
+
+    # Add space after title
+    doc.add_paragraph()
+
+    # Create TOC table
+    toc_table = doc.add_table(rows=len(sections) + 1, cols=3)
+    toc_table.style = 'Table Grid'
+    toc_table.alignment = WD_TABLE_ALIGNMENT.CENTER
+
+    # Set column widths
+    toc_table.columns[0].width = Inches(1)    # Chapter number
+    toc_table.columns[1].width = Inches(4)    # Title
+    toc_table.columns[2].width = Inches(1)    # Page number
+
+    # Add headers
+    header_cells = toc_table.rows[0].cells
+    header_cells[0].text = "Chapter"
+    header_cells[1].text = "Title"
+    header_cells[2].text = "Page"
+
+    # Style header row
+    for cell in header_cells:
+        paragraph = cell.paragraphs[0]
+        paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+        run = paragraph.runs[0]
+        run.font.bold = True
+        run.font.size = Pt(12)
+
+    # Add content rows with correct page numbers
+    for idx, (section_name, _) in enumerate(sections.items(), 1):
+        cells = toc_table.rows[idx].cells
+
+        # Chapter number
+        cells[0].text = str(idx)
+        cells[0].paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+        # Section name
+        cells[1].text = section_name
+        cells[1].paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+
+        # Page number
+        cells[2].text = str(page_numbers[section_name])
+        cells[2].paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+        # Style the row
+        for cell in cells:
+            cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+            for paragraph in cell.paragraphs:
+                for run in paragraph.runs:
+                    run.font.size = Pt(12)
+
+    # Add page break after TOC
+    doc.add_page_break()
+
+    # Add content sections
+    for section_name, section_text in sections.items():
+        # Add page border for new section
+        section = doc.sections[-1]
+        add_page_border(section)
+
+        if section_name != "Results":
+            # Add section title
+            add_blocks(doc, [Paragraph([Run(section_name.upper(), bold=True)], "Title")])
+
+            # Add section content using our formatting function
+            if section_text:
+                format_text_content(doc, section_text)
+
+            # Add page break after each section except conclusion
+            if section_name != "Conclusion":
+                doc.add_page_break()
+        else:
+            # Handle Results section
+            _add_results_section(doc, result, title_style, project_code, images)
+
+    with span("docx.save"):
+        doc.save(report_path)
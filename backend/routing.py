@@ -0,0 +1,220 @@
+"""
+Routing of LLM calls across a pool of API keys and models.
+
+Keys come from GEMINI_API_KEYS (comma separated), falling back to the single
+GEMINI_API_KEY. Every call picks the key with the fewest calls in the last
+minute (ties go to the lower observed latency), skipping keys that are at
+their per-minute quota or cooling down after a quota error. A quota error
+puts the key on cooldown and the call is retried on another key.
+
+Sections listed in LLM_FAST_SECTIONS are sent to LLM_FAST_MODEL; everything
+else uses the model the handle was created for (LLM_MODEL by default).
+
+Configuration (environment):
+    GEMINI_API_KEYS            pool of API keys
+    LLM_MODEL                  default model (default generation.DEFAULT_MODEL)
+    LLM_FAST_MODEL             model for cheap sections (default gemini-1.5-flash-8b)
+    LLM_FAST_SECTIONS          sections sent to the fast model (default title,objectives)
+    LLM_KEY_RPM                per-key calls per minute, 0 for no limit (default 0)
+    LLM_KEY_COOLDOWN_SECONDS   how long a key rests after a quota error (default 60)
+    LLM_BACKEND                "gemini", or "fake" for canned local responses (default gemini)
+    LLM_FAKE_LATENCY_MS        fake backend response time (default 1000)
+    LLM_FAKE_JITTER_MS         uniform +/- spread around that time (default 0)
+    LLM_FAKE_ERROR_RATE        share of fake calls that fail (default 0)
+
+Keys are only ever identified as key1, key2, ... in logs and metrics.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+
+import metrics
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+ROUTED_CALLS = metrics.counter(
+    "zap_llm_routed_calls_total", "LLM calls by API key, model and outcome", ["key", "model", "outcome"]
+)
+KEY_LATENCY = metrics.gauge("zap_llm_key_latency_ms", "Smoothed LLM latency per API key", ["key"])
+KEY_CALLS_PER_MINUTE = metrics.gauge("zap_llm_key_calls_per_minute", "LLM calls made with each key in the last minute", ["key"])
+
+
+def configured_keys():
+    keys = [k.strip() for k in os.getenv("GEMINI_API_KEYS", "").split(",") if k.strip()]
+    if not keys and os.getenv("GEMINI_API_KEY"):
+        keys = [os.getenv("GEMINI_API_KEY")]
+    if not keys and os.getenv("LLM_BACKEND") == "fake":
+        keys = ["fake"]
+    return keys
+
+
+def is_quota_error(error: Exception) -> bool:
+    """True for 429 / RESOURCE_EXHAUSTED errors from the SDK, without importing it"""
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    return getattr(error, "code", None) == 429
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+_FAKE_SECTION = """This project applies a structured approach to the problem described by the team.
+
+**Key Points**
+• The system reads its input, validates it and processes it in stages
+• Each stage is tested on its own before being combined
+* Intermediate results are logged for inspection
+1. **Design** the data flow
+2. Implement and measure each component
+### Summary
+The results show that the approach is practical, efficient and easy to extend."""
+
+
+class FakeHandle:
+    """Stand-in for genai.GenerativeModel (LLM_BACKEND=fake) for load tests and offline runs"""
+
+    def __init__(self, model_name: str, latency_ms: float, jitter_ms: float = 0, error_rate: float = 0):
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+
+    async def generate_content_async(self, prompt: str):
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        await asyncio.sleep(max(0.0, delay) / 1000)
+        if random.random() < self.error_rate:
+            raise RuntimeError("Fake LLM error")
+        if "get me a title" in prompt:
+            return FakeResponse("SMART PROJECT REPORT GENERATOR")
+        return FakeResponse(_FAKE_SECTION)
+
+
+class KeyState:
+    def __init__(self, label: str, api_key: str):
+        self.label = label
+        self.api_key = api_key
+        self.recent = deque()  # call start times within the last minute
+        self.latency_ms = None
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+
+    def calls_last_minute(self, now: float) -> int:
+        while self.recent and now - self.recent[0] > 60:
+            self.recent.popleft()
+        return len(self.recent)
+
+    def observe(self, ms: float):
+        self.latency_ms = ms if self.latency_ms is None else 0.8 * self.latency_ms + 0.2 * ms
+        KEY_LATENCY.set(round(self.latency_ms, 1), key=self.label)
+
+
+class Router:
+    def __init__(self, api_keys, default_model: str, fast_model: str = None, fast_sections=(),
+                 key_rpm: int = 0, cooldown: float = 60, backend: str = "gemini"):
+        self.keys = [KeyState(f"key{i + 1}", key) for i, key in enumerate(api_keys)]
+        self.default_model = default_model
+        self.fast_model = fast_model
+        self.fast_sections = set(fast_sections)
+        self.key_rpm = key_rpm
+        self.cooldown = cooldown
+        self.backend = backend
+        self._handles = {}
+
+    def model_for(self, model_name: str, section: str) -> str:
+        if self.fast_model and section in self.fast_sections and model_name == self.default_model:
+            return self.fast_model
+        return model_name
+
+    def pick_key(self, exclude=()):
+        """Least used available key; if every key is resting or at quota, the one that frees up first"""
+        if not self.keys:
+            raise RuntimeError("No Gemini API key configured (set GEMINI_API_KEYS or GEMINI_API_KEY)")
+        now = time.monotonic()
+        candidates = [k for k in self.keys if k not in exclude] or list(self.keys)
+        available = [
+            k for k in candidates
+            if k.cooldown_until <= now and (self.key_rpm <= 0 or k.calls_last_minute(now) < self.key_rpm)
+        ]
+        if not available:
+            return min(candidates, key=lambda k: (k.cooldown_until, k.recent[0] if k.recent else 0))
+        return min(available, key=lambda k: (k.calls_last_minute(now) + k.in_flight, k.latency_ms or 0))
+
+    def _handle(self, key: KeyState, model_name: str):
+        handle = self._handles.get((key.label, model_name))
+        if handle is None and self.backend == "fake":
+            handle = FakeHandle(
+                model_name,
+                latency_ms=float(os.getenv("LLM_FAKE_LATENCY_MS", "1000")),
+                jitter_ms=float(os.getenv("LLM_FAKE_JITTER_MS", "0")),
+                error_rate=float(os.getenv("LLM_FAKE_ERROR_RATE", "0")),
+            )
+            self._handles[(key.label, model_name)] = handle
+        elif handle is None:
+            import google.ai.generativelanguage as glm
+            import google.generativeai as genai
+
+            handle = genai.GenerativeModel(model_name)
+            # Give this handle its own client so each key is used independently of genai.configure()
+            handle._async_client = glm.GenerativeServiceAsyncClient(client_options={"api_key": key.api_key})
+            self._handles[(key.label, model_name)] = handle
+        return handle
+
+    async def generate(self, model_name: str, section: str, prompt: str):
+        """Send one prompt, failing over to another key on quota errors"""
+        model_name = self.model_for(model_name, section)
+        tried = []
+        while True:
+            key = self.pick_key(tried)
+            now = time.monotonic()
+            key.recent.append(now)
+            KEY_CALLS_PER_MINUTE.set(key.calls_last_minute(now), key=key.label)
+            key.in_flight += 1
+            start = time.perf_counter()
+            try:
+                with span("llm.route", key=key.label, model=model_name, section=section):
+                    response = await self._handle(key, model_name).generate_content_async(prompt)
+            except Exception as e:
+                if not is_quota_error(e):
+                    ROUTED_CALLS.inc(key=key.label, model=model_name, outcome="error")
+                    raise
+                ROUTED_CALLS.inc(key=key.label, model=model_name, outcome="quota")
+                key.cooldown_until = time.monotonic() + self.cooldown
+                tried.append(key)
+                if len(tried) >= len(self.keys):
+                    raise
+                logger.warning(f"Quota exhausted on {key.label}, failing over ({len(tried)}/{len(self.keys)} keys tried)")
+                continue
+            finally:
+                key.in_flight -= 1
+            key.observe((time.perf_counter() - start) * 1000)
+            ROUTED_CALLS.inc(key=key.label, model=model_name, outcome="ok")
+            return response
+
+
+class RoutedModel:
+    """Model handle passed around by the generation code; every call is routed"""
+
+    def __init__(self, router: Router, model_name: str):
+        self.router = router
+        self.model_name = model_name
+
+    async def generate_content_async(self, prompt: str, section: str = None):
+        return await self.router.generate(self.model_name, section, prompt)
+
+
+def open_default_router(default_model: str) -> Router:
+    return Router(
+        configured_keys(),
+        default_model=os.getenv("LLM_MODEL", default_model),
+        fast_model=os.getenv("LLM_FAST_MODEL", "gemini-1.5-flash-8b"),
+        fast_sections=[s.strip() for s in os.getenv("LLM_FAST_SECTIONS", "title,objectives").split(",") if s.strip()],
+        key_rpm=int(os.getenv("LLM_KEY_RPM", "0")),
+        cooldown=float(os.getenv("LLM_KEY_COOLDOWN_SECONDS", "60")),
+        backend=os.getenv("LLM_BACKEND", "gemini"),
+    )
@@ -0,0 +1,154 @@
+"""
+On-demand thumbnail variants for uploaded images.
+
+A variant is generated the first time a width is requested, written to the
+variant cache directory and served from disk afterwards. Requested widths are
+rounded up to a small fixed set so a client cannot fill the cache with
+arbitrary sizes, and the cache is kept under a size limit by evicting the
+least recently served variants.
+
+Configuration (environment):
+    THUMBNAIL_CACHE_MB   size limit for the variant cache (default 200)
+"""
+import asyncio
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WIDTHS = (128, 256, 512, 1024)
+
+# Names we generate (UUIDs) or content hashes never change content, so they can be cached forever
+_IMMUTABLE_NAME = re.compile(
+    r"^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{32}|[0-9a-f]{64})$",
+    re.IGNORECASE,
+)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=300"
+
+
+def cache_control_for(filename: str) -> str:
+    stem = os.path.splitext(filename)[0]
+    return IMMUTABLE_CACHE_CONTROL if _IMMUTABLE_NAME.match(stem) else DEFAULT_CACHE_CONTROL
+
+
+def snap_width(width: int) -> int:
+    """Round a requested width up to the nearest supported variant width"""
+    for allowed in THUMBNAIL_WIDTHS:
+        if width <= allowed:
+            return allowed
+    return THUMBNAIL_WIDTHS[-1]
+
+
+def _render_variant(source_path: str, variant_path: str, width: int):
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as img:
+        image_format = img.format
+        img = ImageOps.exif_transpose(img)
+        if img.width > width:
+            # Bounding box as tall as the original, so only the width constrains the resize
+            img.thumbnail((width, img.height))
+        save_kwargs = {"optimize": True}
+        if image_format == "JPEG":
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            save_kwargs.update(quality=85, progressive=True)
+        temp_path = variant_path + ".part"
+        img.save(temp_path, format=image_format, **save_kwargs)
+    os.replace(temp_path, variant_path)
+
+
+class ThumbnailCache:
+    def __init__(self, source_dir: str, cache_dir: str, max_bytes: int):
+        self.source_dir = source_dir
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._entries = OrderedDict()  # variant path -> size, least recently used first
+        self._total = 0
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._load_existing()
+
+    def _load_existing(self):
+        """Seed the LRU from variants left by a previous run, oldest first"""
+        existing = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".part") or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            existing.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(existing):
+            self._entries[path] = size
+            self._total += size
+        self._evict()
+
+    def variant_path(self, filename: str, width: int) -> str:
+        stem, ext = os.path.splitext(filename)
+        return os.path.join(self.cache_dir, f"{stem}.w{width}{ext}")
+
+    def _touch(self, path: str):
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+
+    def _add(self, path: str):
+        size = os.path.getsize(path)
+        with self._lock:
+            self._total += size - self._entries.pop(path, 0)
+            self._entries[path] = size
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                path, size = self._entries.popitem(last=False)
+                self._total -= size
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    async def get(self, filename: str, width: int) -> str:
+        """Path to the variant of `filename` at `width`, generating it on first use"""
+        width = snap_width(width)
+        path = self.variant_path(filename, width)
+        if os.path.exists(path):
+            self._touch(path)
+            return path
+
+        # Concurrent requests for the same missing variant share one render. It
+        # is shielded so a request that goes away does not cancel it for the
+        # others, and registered from its callback whether or not anyone waits.
+        pending = self._pending.get(path)
+        if pending is None:
+            source_path = os.path.join(self.source_dir, filename)
+            pending = asyncio.ensure_future(asyncio.to_thread(_render_variant, source_path, path, width))
+            self._pending[path] = pending
+            pending.add_done_callback(lambda task: self._finish(task, path, filename, width))
+        await asyncio.shield(pending)
+        return path
+
+    def _finish(self, task: asyncio.Future, path: str, filename: str, width: int):
+        self._pending.pop(path, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._add(path)
+        logger.info(f"Generated {width}px thumbnail for {filename}")
+
+    def discard(self, filename: str):
+        """Remove every variant of an upload (called when the original is deleted)"""
+        for width in THUMBNAIL_WIDTHS:
+            path = self.variant_path(filename, width)
+            with self._lock:
+                size = self._entries.pop(path, None)
+                if size is not None:
+                    self._total -= size
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,312 @@
+"""
+Request-scoped tracing and structured JSON logging.
+
+Every HTTP request gets a request ID (taken from the X-Request-ID header or
+generated) that is stored in a context variable, so it follows the request
+through handlers, LLM calls, image loading and docx rendering without being
+passed around by hand. Stages are wrapped in `span(...)` blocks which time the
+work, log a structured record and hand the finished span to the configured
+exporter.
+
+Configuration (environment):
+    LOG_FORMAT                    "json" (default) or "text"
+    TRACE_EXPORT                  "none" (default), "file" or "otlp"
+    TRACE_FILE                    JSONL file for the file exporter (default traces.jsonl)
+    OTEL_EXPORTER_OTLP_ENDPOINT   collector base URL for the otlp exporter (default http://localhost:4318)
+"""
+import asyncio
+import contextvars
+import datetime
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+
+SERVICE_NAME = "zap-backend"
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+session_id_var = contextvars.ContextVar("session_id", default=None)
+_trace_id_var = contextvars.ContextVar("trace_id", default=None)
+_span_id_var = contextvars.ContextVar("span_id", default=None)
+
+logger = logging.getLogger("tracing")
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+# Client-supplied request IDs end up in logs, job keys and file names
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def start_request(request_id: str = None, session_id: str = None):
+    """
+    Bind a request (and optionally a session) to the current context. A
+    client-supplied ID is kept only if it is 1-64 letters, digits, "_" or "-";
+    otherwise one is generated.
+    """
+    if not request_id or not _REQUEST_ID.match(request_id):
+        request_id = new_request_id()
+    request_id_var.set(request_id)
+    _trace_id_var.set(uuid.uuid4().hex)
+    _span_id_var.set(None)
+    if session_id:
+        session_id_var.set(session_id)
+    return request_id
+
+
+def bind_session(session_id: str):
+    """Attach a session ID to the current request context"""
+    if session_id:
+        session_id_var.set(session_id)
+
+
+def current_request_id():
+    return request_id_var.get()
+
+
+class JsonFormatter(logging.Formatter):
+    """Render log records as one JSON object per line with request context"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": request_id_var.get(),
+            "session_id": session_id_var.get(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=logging.INFO):
+    """Install the JSON formatter on the root logger (unless LOG_FORMAT=text)"""
+    handler = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+    else:
+        handler.setFormatter(JsonFormatter())
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+
+
+class FileExporter:
+    """
+    Append finished spans to a local JSONL file. Spans are queued and written
+    in batches by a background thread, so request handling never waits on disk.
+    """
+
+    def __init__(self, path, batch_size=256, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=10000)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="file-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span_record):
+        try:
+            self._queue.put_nowait(span_record)
+        except queue.Full:
+            pass  # Drop spans rather than block request handling
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._drain(timeout=self.flush_interval)
+            if batch:
+                self._write(batch)
+
+    def _drain(self, timeout):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _write(self, batch):
+        lines = "".join(json.dumps(s, default=str) + "\n" for s in batch)
+        try:
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(lines)
+        except OSError as e:
+            logger.warning(f"Failed to write {len(batch)} spans to {self.path}: {e}")
+
+    def shutdown(self):
+        self._stopped.set()
+        self._thread.join(timeout=self.flush_interval + 1)
+        while True:
+            batch = self._drain(timeout=0)
+            if not batch:
+                break
+            self._write(batch)
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpExporter:
+    """
+    Batch spans and POST them to an OTLP/HTTP collector as JSON.
+    Any collector (or local stand-in) that accepts POST {endpoint}/v1/traces works.
+    """
+
+    def __init__(self, endpoint, batch_size=64, flush_interval=2.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=10000)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span_record):
+        try:
+            self._queue.put_nowait(span_record)
+        except queue.Full:
+            pass  # Drop spans rather than block request handling
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._drain(timeout=self.flush_interval)
+            if batch:
+                self._send(batch)
+
+    def _drain(self, timeout):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _send(self, batch):
+        spans = []
+        for s in batch:
+            attributes = [{"key": k, "value": _otlp_value(v)} for k, v in s["attributes"].items() if v is not None]
+            for key in ("request_id", "session_id"):
+                if s.get(key):
+                    attributes.append({"key": key, "value": {"stringValue": s[key]}})
+            spans.append({
+                "traceId": s["trace_id"],
+                "spanId": s["span_id"],
+                "parentSpanId": s["parent_span_id"] or "",
+                "name": s["name"],
+                "kind": 1,
+                "startTimeUnixNano": str(s["start_ns"]),
+                "endTimeUnixNano": str(s["end_ns"]),
+                "attributes": attributes,
+                "status": {"code": 2 if s["status"] == "error" else 1, "message": s.get("error") or ""},
+            })
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{"scope": {"name": "zap"}, "spans": spans}],
+            }]
+        }
+        req = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=5):
+                pass
+        except Exception as e:
+            logger.warning(f"Failed to export {len(spans)} spans: {e}")
+
+    def shutdown(self):
+        self._stopped.set()
+        batch = self._drain(timeout=0)
+        if batch:
+            self._send(batch)
+
+
+def _make_exporter():
+    kind = os.getenv("TRACE_EXPORT", "none").lower()
+    if kind == "file":
+        return FileExporter(os.getenv("TRACE_FILE", "traces.jsonl"))
+    if kind == "otlp":
+        return OtlpExporter(os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318"))
+    return None
+
+
+exporter = _make_exporter()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a stage of the current request.
+
+    Yields the attribute dict so callers can attach results (sizes, counts)
+    before the span closes. Exceptions are recorded and re-raised; a
+    cancelled task is recorded with status "cancelled" rather than as an error.
+    """
+    trace_id = _trace_id_var.get() or uuid.uuid4().hex
+    parent_id = _span_id_var.get()
+    span_id = uuid.uuid4().hex[:16]
+    token = _span_id_var.set(span_id)
+    start_ns = time.time_ns()
+    start = time.perf_counter()
+    status, error = "ok", None
+    try:
+        yield attributes
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    except BaseException as e:
+        status, error = "error", f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        _span_id_var.reset(token)
+        record = {
+            "name": name,
+            "trace_id": trace_id,
+            "span_id": span_id,
+            "parent_span_id": parent_id,
+            "request_id": request_id_var.get(),
+            "session_id": session_id_var.get(),
+            "start_ns": start_ns,
+            "end_ns": start_ns + int(duration_ms * 1_000_000),
+            "duration_ms": round(duration_ms, 2),
+            "status": status,
+            "error": error,
+            "attributes": attributes,
+        }
+        logger.log(
+            logging.ERROR if status == "error" else logging.INFO,
+            f"span {name} {status} in {duration_ms:.1f}ms",
+            extra={"fields": {"span": name, "duration_ms": record["duration_ms"], "status": status,
+                              "error": error, **attributes}},
+        )
+        if exporter is not None:
+            exporter.export(record)
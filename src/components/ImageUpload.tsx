@@ -194,7 +194,7 @@ export function ImageUpload({ onImagesSelected }: ImageUploadProps) {
           {images.map((image, index) => (
             <div key={index} className="relative group">
               <img
-                src={`${API_URL}/uploads/${image}`}
+                src={`${API_URL}/uploads/${image}?w=256`}
                 alt={`Upload ${index + 1}`}
                 className="w-full h-32 object-cover rounded-lg"
                 onError={(e) => {
@@ -1,5 +1,7 @@
-import React, { useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import { Button } from "@/components/ui/button";
+import { Checkbox } from "@/components/ui/checkbox";
+import { Label } from "@/components/ui/label";
 import { useToast } from "@/hooks/use-toast";
 import { ProjectDetailsSection } from "./project/ProjectDetailsSection";
 import { TeamMembersSection } from "./project/TeamMembersSection";
@@ -36,9 +38,43 @@ export function ProjectForm() {
       codeOutput: "",
       resultImages: [],
       aiGeneratedContent: false
-    }
+    },
+    quality: "final"
   });
   const [isLoading, setIsLoading] = useState(false);
+  const prepareToken = useRef<string | null>(null);
+
+  // Start generating sections once the description and code stop changing;
+  // the report request then reuses that work
+  useEffect(() => {
+    const { projectDescription, projectCode } = formData;
+    if (!projectDescription.trim() || !projectCode.trim()) return;
+    const timer = setTimeout(async () => {
+      // The inputs changed, so an earlier preparation can no longer be used
+      if (prepareToken.current) {
+        fetch(`${API_URL}/api/prepare/${encodeURIComponent(prepareToken.current)}`, { method: "DELETE" }).catch(() => {});
+        prepareToken.current = null;
+      }
+      try {
+        const response = await fetch(`${API_URL}/api/prepare`, {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({
+            projectDescription,
+            projectCode,
+            codeOutput: formData.result?.codeOutput || null,
+            quality: formData.quality,
+          }),
+        });
+        if (response.ok) {
+          prepareToken.current = (await response.json()).token;
+        }
+      } catch (error) {
+        console.warn("Could not prepare report sections:", error);
+      }
+    }, 2000);
+    return () => clearTimeout(timer);
+  }, [formData.projectDescription, formData.projectCode, formData.result?.codeOutput, formData.quality]);
 
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
@@ -46,7 +82,10 @@ export function ProjectForm() {
     
     try {
       console.log("Submitting data to backend:", formData);
-      const response = await fetch(`${API_URL}/api/generate-report`, {
+      const token = prepareToken.current;
+      prepareToken.current = null;
+      const query = token ? `?prepare_token=${encodeURIComponent(token)}` : "";
+      const response = await fetch(`${API_URL}/api/generate-report${query}`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -183,6 +222,14 @@ export function ProjectForm() {
           onUpdateResult={handleUpdateResult}
         />
 
+        <div className="flex items-center space-x-2">
+          <Checkbox
+            checked={formData.quality === "draft"}
+            onCheckedChange={(checked) => handleUpdateField("quality", checked ? "draft" : "final")}
+          />
+          <Label className="text-xl">Quick draft (shorter sections, generated faster)</Label>
+        </div>
+
         <Button type="submit" className="w-full text-xl py-6">
           Generate Report
         </Button>
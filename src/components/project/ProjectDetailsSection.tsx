@@ -1,3 +1,4 @@
+import { useState } from "react";
 import { Label } from "@/components/ui/label";
 import { Input } from "@/components/ui/input";
 import { Textarea } from "@/components/ui/textarea";
@@ -5,6 +6,14 @@ import { Card } from "@/components/ui/card";
 import { CodeEditor } from "../CodeEditor";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select";
 
+const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+
+interface Professor {
+  name: string;
+  designation: string;
+  department: string;
+}
+
 const DEPARTMENTS = [
   "Computer Science & Engineering",
   "Electrical and Electronics Engineering",
@@ -47,6 +56,38 @@ export function ProjectDetailsSection({
   course,
   onUpdate,
 }: ProjectDetailsProps) {
+  const [professorSuggestions, setProfessorSuggestions] = useState<Professor[]>([]);
+
+  const fetchProfessorSuggestions = async (query: string) => {
+    if (query.trim().length < 2) {
+      setProfessorSuggestions([]);
+      return;
+    }
+    try {
+      const response = await fetch(`${API_URL}/api/professors/search?q=${encodeURIComponent(query)}&limit=8`);
+      if (response.ok) {
+        const data = await response.json();
+        setProfessorSuggestions(data.results);
+      }
+    } catch (error) {
+      console.error('Error fetching professor suggestions:', error);
+    }
+  };
+
+  // Picking a suggestion fills in the designation (and department for the main professor)
+  const handleProfessorChange = (nameField: string, designationField: string, value: string, fillDepartment: boolean) => {
+    onUpdate(nameField, value);
+    const match = professorSuggestions.find((professor) => professor.name === value);
+    if (match) {
+      onUpdate(designationField, match.designation);
+      if (fillDepartment && !professorDepartment) {
+        onUpdate('professorDepartment', match.department);
+      }
+    } else {
+      fetchProfessorSuggestions(value);
+    }
+  };
+
   return (
     <Card className="glass-card p-6 space-y-6">
       <h2 className="text-3xl font-bold text-primary">Project Details</h2>
@@ -104,7 +145,8 @@ export function ProjectDetailsSection({
           <Label className="text-xl">Main Professor</Label>
           <Input
             value={mainProfessor}
-            onChange={e => onUpdate('mainProfessor', e.target.value)}
+            list="professor-suggestions"
+            onChange={e => handleProfessorChange('mainProfessor', 'mainProfessor_designation', e.target.value, true)}
             placeholder="Enter main professor's name..."
             className="text-lg"
           />
@@ -125,7 +167,8 @@ export function ProjectDetailsSection({
           <Label className="text-xl">Secondary Professor</Label>
           <Input
             value={secondaryProfessor}
-            onChange={e => onUpdate('secondaryProfessor', e.target.value)}
+            list="professor-suggestions"
+            onChange={e => handleProfessorChange('secondaryProfessor', 'secondaryProfessor_designation', e.target.value, false)}
             placeholder="Enter secondary professor's name..."
             className="text-lg"
           />
@@ -141,6 +184,14 @@ export function ProjectDetailsSection({
         </div>
       </div>
 
+      <datalist id="professor-suggestions">
+        {professorSuggestions.map((professor) => (
+          <option key={professor.name} value={professor.name}>
+            {professor.designation}
+          </option>
+        ))}
+      </datalist>
+
       <div>
         <Label className="text-xl">Course Code</Label>
         <Input
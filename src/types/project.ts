@@ -22,4 +22,5 @@ export interface ProjectData {
   course: string;
   teamMembers: TeamMember[];
   result?: ProjectResult;
+  quality?: "draft" | "final";
 }
\ No newline at end of file